@@ -3,12 +3,16 @@
 #   Принимает ответы клиента и возвращает результат расчёта.
 
 from fastapi import APIRouter, Request, Body
-from fastapi.responses import StreamingResponse
+from starlette.datastructures import Headers
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
 from datetime import datetime
-from io import BytesIO
+import asyncio
+import logging
 import os
-import shutil
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from urllib.parse import quote
 from .models.input import ChecklistInput
 from .models.output import ChecklistResult
@@ -17,31 +21,35 @@ from .rules.support import calculate_support
 from .packages.selector import select_package
 
 # v5 (красивый UI) расчёт
-from .v5.models import V5Input, V5Result
-from .v5.calc import calculate_v5
-from .v5.docx_gen import build_docx_bytes, suggest_filename
-from .v5.data import load_data_from_frontend
-from .v5.services_matrix import get_package_preset, load_services_matrix
+from .v5.models import ServicesQuoteInput, V5Input, V5Result, dump_v5_result
+from .v5.calc import rebuild_compiled_pricing
+from .v5.calc_memo import calculate_v5_memo, get_calc_memo
+from .v5.batch import NDJSON_MEDIA_TYPE, BatchInputError, iter_batch_results, parse_batch, resolve_pricing
+from .v5.docx_pool import DocxPoolBusy, get_docx_pool
+from .v5.docx_jobs import DocxJobsFull, get_docx_jobs
+from .v5.output_writer import get_output_writer
+from .v5.data import DataSnapshot, get_data_snapshots, load_data_version
+from .v5.data_history import content_hash, get_data_history
+from .v5.docx_cache import docx_cache_key, get_docx_cache
+from .v5.docx_template import suggest_filename
+from .v5.services_matrix import get_compiled_matrix, get_package_preset_body
+from .v5.services_quote import ServicesQuoteError, quote_services
+from .static_cache import REVALIDATE
+from .metrics import PROMETHEUS_MEDIA_TYPE, attach_spans, get_metrics, span
 from .admin_utils import require_admin
+from .file_lock import FileLockTimeout
+from .json_patch import JsonPatchConflict, JsonPatchError, Pointer, apply_patch, patch_paths
 
 import json
 import difflib
 
+log = logging.getLogger(__name__)
 
-def _append_admin_diff_log(project_dir: Path, request: Request, old_text: str, new_text: str) -> None:
-    """Пишем лог изменений data.json.
 
-    Формат: timestamp + IP + unified diff.
-    Это нужно, чтобы было понятно «когда/что/кем» меняли, даже если
-    правки делались через админку без Git.
-
-    Лог: ./logs/data_changes.log
-    """
+def _append_admin_log(project_dir: Path, request: Request, body: str) -> None:
+    """Одна запись в ./logs/data_changes.log: timestamp + IP + путь + body."""
 
     try:
-        if old_text == new_text:
-            return
-
         logs_dir = project_dir / "logs"
         logs_dir.mkdir(parents=True, exist_ok=True)
         log_path = logs_dir / "data_changes.log"
@@ -49,49 +57,75 @@ def _append_admin_diff_log(project_dir: Path, request: Request, old_text: str, n
         client = request.client.host if request.client else ""
         stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        diff = "\n".join(
-            difflib.unified_diff(
-                old_text.splitlines(),
-                new_text.splitlines(),
-                fromfile="data.json (before)",
-                tofile="data.json (after)",
-                lineterm="",
-            )
-        )
-
         with log_path.open("a", encoding="utf-8") as f:
             f.write("\n" + "=" * 90 + "\n")
-            f.write(f"[{stamp}] ip={client} path=/api/admin/data\n")
-            f.write(diff + "\n")
+            f.write(f"[{stamp}] ip={client} path={request.url.path} method={request.method}\n")
+            f.write(body + "\n")
     except Exception:
         # Логи не должны ломать админку.
         pass
 
 
-def _backup_file(path: Path, backup_dir: Path, limit: int = 20) -> None:
-    if not path.exists():
-        return
-    backup_dir.mkdir(parents=True, exist_ok=True)
-    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    backup_path = backup_dir / f"{path.stem}_{stamp}{path.suffix}"
-    try:
-        shutil.copy2(path, backup_path)
-    except Exception:
+def _append_admin_diff_log(project_dir: Path, request: Request, old_text: str, new_text: str) -> None:
+    """Пишем лог изменений data.json.
+
+    Формат: timestamp + IP + unified diff.
+    Это нужно, чтобы было понятно «когда/что/кем» меняли, даже если
+    правки делались через админку без Git.
+
+    Лог: ./logs/data_changes.log
+    """
+
+    if old_text == new_text:
         return
-    backups = sorted(backup_dir.glob(f"{path.stem}_*{path.suffix}"), key=os.path.getmtime, reverse=True)
-    for extra in backups[limit:]:
-        try:
-            extra.unlink()
-        except Exception:
-            pass
+    diff = "\n".join(
+        difflib.unified_diff(
+            old_text.splitlines(),
+            new_text.splitlines(),
+            fromfile="data.json (before)",
+            tofile="data.json (after)",
+            lineterm="",
+        )
+    )
+    _append_admin_log(project_dir, request, diff)
+
+
+def _append_admin_patch_log(project_dir: Path, request: Request, ops: list) -> None:
+    """PATCH: в лог пишем сами операции JSON Patch (по одной на строку), а не diff файла."""
+    _append_admin_log(project_dir, request, "\n".join(json.dumps(op, ensure_ascii=False) for op in ops))
 
 
-def _write_json_atomic(path: Path, payload: dict, backup_dir: Path) -> None:
+def _write_bytes_atomic(path: Path, raw: bytes) -> None:
+    """Запись через временный файл + os.replace.
+
+    Имя временного файла своё у каждой записи (pid + случайная часть):
+    одновременные сохранения не пишут в один и тот же data.json.tmp.
+    """
     path.parent.mkdir(parents=True, exist_ok=True)
-    _backup_file(path, backup_dir)
-    tmp_path = path.with_suffix(path.suffix + ".tmp")
-    tmp_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-    tmp_path.replace(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    try:
+        tmp_path.write_bytes(raw)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def _save_admin_file(path: Path, raw: bytes, request: Request, action: str, before: Optional[bytes]) -> None:
+    """Записать файл данных и положить новую версию в историю (см. data_history.py).
+
+    before — что лежало в файле до записи (None — файла не было).
+    Вызывается под блокировкой _locked_admin_write.
+    """
+    _write_bytes_atomic(path, raw)
+    parent = content_hash(before) if before is not None else None
+    try:
+        get_data_history().record(path.name, raw, parent, request.client.host if request.client else "", action,
+                                  read_parent=lambda: before)
+    except OSError:
+        # История не должна ломать сохранение (как раньше резервные копии).
+        log.exception("admin: не удалось записать историю %s", path.name)
+
 
 router = APIRouter()
 
@@ -119,57 +153,240 @@ def calculate(data: ChecklistInput):
 
 
 @router.post("/api/v5/calculate", response_model=V5Result)
-def calculate_ui_v5(data: V5Input):
-    """Расчёт для демо-UI v5 (тот самый красивый HTML)."""
-    return calculate_v5(data)
+def calculate_ui_v5(data: V5Input, fast: bool = False, compact: bool = False, fields: str | None = None):
+    """Расчёт для демо-UI v5 (тот самый красивый HTML).
+
+    UI зовёт его на каждую правку, поэтому результат берём из памяти
+    расчётов, если ценовые поля не менялись (см. backend/v5/calc_memo.py).
+
+    Быстрый режим (по запросу): ?fast=1, ?compact=1 или ?fields=costs,calc —
+    результат сразу сериализуется в JSON-байты, без повторной проверки
+    через response_model. compact — без package.groups/detail (они есть в
+    data.json), fields — только перечисленные поля верхнего уровня.
+    """
+    res = calculate_v5_memo(data)
+    if not (fast or compact or fields):
+        return res
+
+    names = [f.strip() for f in (fields or "").split(",") if f.strip()]
+    unknown = [f for f in names if f not in V5Result.model_fields]
+    if unknown:
+        return JSONResponse(
+            {"detail": f"unknown fields: {', '.join(unknown)}; allowed: {', '.join(V5Result.model_fields)}"},
+            status_code=400,
+        )
+    return Response(dump_v5_result(res, fields=names, compact=compact), media_type="application/json")
+
+
+@router.get("/api/v5/calculate/stats")
+def calculate_stats():
+    """Попадания/промахи памяти расчётов (для мониторинга)."""
+    return get_calc_memo().stats()
+
+
+@router.post("/api/v5/calculate/batch")
+async def calculate_ui_v5_batch(request: Request, full: bool = False):
+    """Пакетный пересчёт чек-листов (+ необязательные цены для симуляции).
+
+    Форматы входа и выхода — см. backend/v5/batch.py. Ответ — NDJSON,
+    строки отдаются по мере расчёта.
+    """
+    body = await request.body()
+    try:
+        rows, override = await run_in_threadpool(parse_batch, body, request.headers.get("content-type", ""))
+        pricing = await run_in_threadpool(resolve_pricing, override)
+    except BatchInputError as exc:
+        return JSONResponse({"detail": str(exc)}, status_code=400)
+    return StreamingResponse(iter_batch_results(rows, pricing, full), media_type=NDJSON_MEDIA_TYPE)
+
+
+def _pricing_changed(base: Optional[DataSnapshot] = None, changed: Optional[List[Pointer]] = None) -> None:
+    """Админка сохранила цены/пакеты: сбрасываем всё, что от них зависит.
+
+    base + changed — правка пришла патчем (PATCH): снимок уже подменён через
+    install(), а цены пересобираются только там, куда патч попал.
+    """
+    # Этот процесс перечитывает файлы сразу; остальные воркеры uvicorn
+    # увидят новые данные сами — не позже AURORA_DATA_CHECK_INTERVAL.
+    # Процессы пула Word сверят файлы на следующей выгрузке: версия данных
+    # уходит вместе с задачей (см. docx_pool).
+    if base is None:
+        get_data_snapshots().refresh()
+        rebuild_compiled_pricing()
+    else:
+        rebuild_compiled_pricing(base.data, changed)
+    get_calc_memo().clear()
+    get_docx_cache().clear()
 
 
 @router.post("/api/v5/docx")
-def export_docx(data: V5Input):
-    """Скачать Word (.docx) по текущему состоянию чек-листа."""
-    res = calculate_v5(data)
-    payload = build_docx_bytes(data, res)
-    buf = BytesIO(payload)
+async def export_docx(data: V5Input):
+    """Скачать Word (.docx) по текущему состоянию чек-листа.
+
+    Сборка идёт в пуле процессов (docx_pool), чтобы не тормозить расчёт
+    и статику. Если очередь выгрузок заполнена — 503 + Retry-After.
+    Повторная выгрузка того же чек-листа берётся из кеша (docx_cache).
+    """
+    cache = get_docx_cache()
+    version = load_data_version()
+    key = await run_in_threadpool(docx_cache_key, data, version)
+    with span("docx.cache"):
+        archive = await run_in_threadpool(cache.get, key)
+    if archive is None:
+        try:
+            future = get_docx_pool().submit(data.model_dump(), version)
+        except DocxPoolBusy as exc:
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Слишком много выгрузок Word одновременно, повторите позже"},
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+        # Архив из заранее сжатых частей шаблона + свежий document.xml.
+        # Целиком в bytes не собираем — отдаём кусками.
+        with span("docx.pool"):
+            archive, spans, rendered = await asyncio.wrap_future(future)
+        attach_spans(spans)
+        if rendered == version:
+            await run_in_threadpool(cache.put, key, archive)
+        else:
+            # Воркер собрал документ на других данных: в кеш не кладём,
+            # ETag — по версии, на которой он собран на самом деле.
+            key = await run_in_threadpool(docx_cache_key, data, rendered)
+
     filename = suggest_filename(data)
 
-    # Параллельно сохраняем копию рядом с проектом — чтобы можно было
+    # Параллельно сохраняем копию рядом с проектом (./output) — чтобы можно было
     # автоматически складывать ЛТ/КП в папку без ручного «Скачать».
-    # Папка: ./output
-    try:
-        out_dir = Path(__file__).resolve().parent.parent / "output"
-        out_dir.mkdir(parents=True, exist_ok=True)
-        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_name = filename.replace("/", "_").replace("\\", "_")
-        out_path = out_dir / f"{stamp}__{safe_name}"
-        out_path.write_bytes(payload)
-    except Exception:
-        # Если нет прав на запись — просто продолжаем отдавать файл в браузер.
-        pass
+    # Пишет фоновый поток: выгрузка не ждёт диск.
+    get_output_writer().submit(filename, archive)
+
+    headers = {
+        "Content-Disposition": _docx_disposition(filename),
+        "Content-Length": str(archive.size),
+        "ETag": f'"{key}"',
+    }
+    return StreamingResponse(archive.iter_chunks(), media_type=DOCX_MEDIA_TYPE, headers=headers)
+
+
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def _docx_disposition(filename: str) -> str:
     # ВАЖНО: Starlette кодирует заголовки как latin-1, поэтому
     # Content-Disposition должен быть ASCII. Для русских букв
     # используем RFC5987 (percent-encoding) через quote(...).
     # Дополнительно даём ASCII fallback filename="KP_Aurora.docx".
     quoted = quote(filename, safe='')
-    headers = {
-        "Content-Disposition": f"attachment; filename=\"KP_Aurora.docx\"; filename*=UTF-8''{quoted}"
-    }
-    return StreamingResponse(
-        buf,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        headers=headers,
+    return f"attachment; filename=\"KP_Aurora.docx\"; filename*=UTF-8''{quoted}"
+
+
+# -----------------------------
+# Фоновые выгрузки Word (задания в SQLite, см. v5/docx_jobs.py)
+# -----------------------------
+
+
+def _docx_job_body(job: dict) -> dict:
+    body = dict(job)
+    body["status_url"] = f"/api/v5/docx/jobs/{job['id']}"
+    if job["status"] == "done":
+        body["download_url"] = f"/api/v5/docx/jobs/{job['id']}/document"
+    return body
+
+
+@router.post("/api/v5/docx/jobs", status_code=202)
+def create_docx_job(data: V5Input):
+    """Поставить выгрузку Word в очередь: сразу отвечаем id задания (202)."""
+    try:
+        job = get_docx_jobs().submit(data)
+    except DocxJobsFull:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Очередь фоновых выгрузок Word заполнена, повторите позже"},
+            headers={"Retry-After": "30"},
+        )
+    return JSONResponse(
+        status_code=202,
+        content=_docx_job_body(job),
+        headers={"Location": f"/api/v5/docx/jobs/{job['id']}"},
     )
 
 
+@router.get("/api/v5/docx/jobs/{job_id}")
+def get_docx_job(job_id: str):
+    """Статус задания: queued (с местом в очереди) / running / done / failed."""
+    job = get_docx_jobs().get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"detail": "Задание не найдено"})
+    return _docx_job_body(job)
+
+
+@router.get("/api/v5/docx/jobs/{job_id}/document")
+def get_docx_job_document(job_id: str):
+    """Готовый документ задания (409, пока не готов)."""
+    jobs = get_docx_jobs()
+    found = jobs.document(job_id)
+    if found is None:
+        job = jobs.get(job_id)
+        if job is None:
+            return JSONResponse(status_code=404, content={"detail": "Задание не найдено"})
+        return JSONResponse(
+            status_code=409,
+            content={"detail": "Документ ещё не готов", "status": job["status"], "error": job["error"]},
+        )
+    filename, etag, body = found
+    headers = {"Content-Disposition": _docx_disposition(filename), "ETag": etag}
+    return Response(body, media_type=DOCX_MEDIA_TYPE, headers=headers)
+
+
+@router.get("/api/v5/docx/stats")
+def docx_stats():
+    """Очередь и задержки выгрузки Word, кеш и копии в ./output (для мониторинга)."""
+    return {
+        **get_docx_pool().stats(),
+        "cache": get_docx_cache().stats(),
+        "output": get_output_writer().stats(),
+        "jobs": get_docx_jobs().stats(),
+    }
+
+
+@router.get("/metrics")
+def prometheus_metrics():
+    """Гистограммы этапов и запросов в формате Prometheus (см. backend/metrics.py)."""
+    return Response(get_metrics().render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+
+@router.get("/api/v5/data/version")
+def data_version():
+    """Какая версия данных (цены + матрица услуг) активна в этом процессе."""
+    return get_data_snapshots().stats()
+
+
 @router.get("/api/v5/services-matrix")
-def get_services_matrix():
-    """Единый источник матрицы услуг (v5) для фронта."""
-    return load_services_matrix()
+def get_services_matrix(request: Request):
+    """Единый источник матрицы услуг (v5) для фронта.
+
+    Отдаём заранее сериализованные байты с ETag (304, если не менялась).
+    """
+    return get_compiled_matrix().full.respond(Headers(scope=request.scope), REVALIDATE, head=False)
 
 
 @router.get("/api/v5/services-matrix/{package_id}")
-def get_services_matrix_package(package_id: str):
+def get_services_matrix_package(request: Request, package_id: str):
     """Пресет услуг для выбранного пакета (v5)."""
-    return get_package_preset(package_id)
+    return get_package_preset_body(package_id).respond(Headers(scope=request.scope), REVALIDATE, head=False)
+
+
+@router.post("/api/v5/services-quote")
+def services_quote(data: ServicesQuoteInput):
+    """Часы × ставка по матрице услуг для одного или нескольких пакетов (v5).
+
+    Количество «авто» услуг считается от оборудования каждого пакета
+    (см. services_quote.py). Неизвестный package_id — 400.
+    """
+    try:
+        return quote_services(data)
+    except ServicesQuoteError as exc:
+        return JSONResponse({"detail": str(exc)}, status_code=400)
 
 
 # -----------------------------
@@ -177,72 +394,276 @@ def get_services_matrix_package(package_id: str):
 # -----------------------------
 
 
-@router.get("/api/admin/data")
-def admin_get_data(request: Request):
+def _check_data(payload) -> Optional[str]:
+    if not isinstance(payload, dict):
+        return "payload must be an object"
+    if "segments" not in payload:
+        return "missing key: segments"
+    return None
+
+
+def _check_core_packages(payload) -> Optional[str]:
+    if not isinstance(payload, dict):
+        return "payload must be an object"
+    if "packages" not in payload or not isinstance(payload.get("packages"), list):
+        return "missing key: packages (list)"
+    return None
+
+
+# Файлы, которые админка умеет сохранять: проверка содержимого и где документ
+# лежит внутри data (для пересборки цен).
+_ADMIN_FILES: Dict[str, Tuple[Callable[[object], Optional[str]], Pointer]] = {
+    "data.json": (_check_data, ()),
+    "core_packages.json": (_check_core_packages, ("core_packages",)),
+}
+
+
+def _admin_path(name: str) -> Path:
+    return Path(__file__).resolve().parents[1] / "frontend_shared" / "data" / name
+
+
+def _etag(digest: str) -> str:
+    return f'"{digest}"'
+
+
+def _read_current(path: Path) -> Tuple[Optional[bytes], str]:
+    """Содержимое файла на диске и его sha256 ("" — файла нет)."""
+    try:
+        raw = path.read_bytes()
+    except FileNotFoundError:
+        return None, ""
+    return raw, content_hash(raw)
+
+
+def _precondition_failed(request: Request, digest: str) -> Optional[JSONResponse]:
+    """Проверка If-Match против текущей версии файла (оптимистичная блокировка).
+
+    Без If-Match — 428: сохранять «вслепую» поверх чужой правки нельзя.
+    If-Match: * — осознанно перезаписать любую версию.
+    """
+    header = request.headers.get("if-match")
+    if header is None:
+        return JSONResponse({"detail": "If-Match required (ETag from GET)"}, status_code=428)
+    if header.strip() == "*" or _etag(digest) in (t.strip() for t in header.split(",")):
+        return None
+    return JSONResponse(
+        {"detail": "file was changed since it was loaded", "etag": _etag(digest)},
+        status_code=412,
+        headers={"ETag": _etag(digest)},
+    )
+
+
+def _locked_admin_write(request: Request, name: str, write: Callable[[Optional[bytes], DataSnapshot], Any]):
+    """Общая рамка сохранения из админки.
+
+    Под межпроцессной блокировкой (file_lock.py): читаем текущий файл,
+    сверяем If-Match, берём снимок данных той же версии и вызываем
+    write(текущие байты, снимок). Два сохранения — из разных вкладок или
+    разных воркеров uvicorn — идут строго по очереди, и второе получит 412,
+    если правило не ту версию.
+    """
+    path = _admin_path(name)
+    try:
+        with get_data_history().lock():
+            before, digest = _read_current(path)
+            failed = _precondition_failed(request, digest)
+            if failed is not None:
+                return failed
+            snapshots = get_data_snapshots()
+            base = snapshots.refresh()
+            if base.digest(name) != digest:
+                # Файл заменили так быстро, что stat() этого не заметил.
+                base = snapshots.refresh(force=True)
+            return write(before, base)
+    except FileLockTimeout:
+        return JSONResponse({"detail": "another admin save is in progress"}, status_code=503,
+                            headers={"Retry-After": "1"})
+
+
+def _saved(name: str, raw: bytes, body: dict) -> JSONResponse:
+    digest = content_hash(raw)
+    return JSONResponse({**body, "etag": _etag(digest)}, headers={"ETag": _etag(digest)})
+
+
+def _admin_get(request: Request, name: str):
     require_admin(request)
-    project_dir = Path(__file__).resolve().parents[1]
-    data_json = project_dir / "frontend_shared" / "data" / "data.json"
-    if not data_json.exists():
-        return {"ok": False, "error": "data.json not found"}
-    return json.loads(data_json.read_text(encoding="utf-8"))
+    raw, digest = _read_current(_admin_path(name))
+    if raw is None:
+        return {"ok": False, "error": f"{name} not found"}
+    return Response(raw, media_type="application/json", headers={"ETag": _etag(digest)})
 
 
-@router.put("/api/admin/data")
-def admin_put_data(request: Request, payload: dict = Body(...)):
-    """Сохраняет новый data.json (принимаем JSON целиком)."""
+def _admin_put(request: Request, name: str, payload: dict):
     require_admin(request)
+    check, _prefix = _ADMIN_FILES[name]
+    # Минимальная валидация, чтобы случайно не сохранить мусор.
+    error = check(payload)
+    if error:
+        return {"ok": False, "error": error}
 
     project_dir = Path(__file__).resolve().parents[1]
-    data_json = project_dir / "frontend_shared" / "data" / "data.json"
+    path = _admin_path(name)
+    new_text = json.dumps(payload, ensure_ascii=False, indent=2)
+    raw = new_text.encode("utf-8")
+
+    def write(before: Optional[bytes], base: DataSnapshot):
+        with span("admin.write"):
+            _save_admin_file(path, raw, request, "put", before)
+        if name == "data.json":
+            # Старый текст нужен, чтобы сохранить diff в logs/data_changes.log
+            with span("admin.diff_log"):
+                old_text = before.decode("utf-8", errors="replace") if before is not None else ""
+                _append_admin_diff_log(project_dir, request, old_text, new_text)
+        # Сбрасываем кеш данных, чтобы расчёты сразу увидели изменения.
+        with span("admin.reload"):
+            _pricing_changed()
+        return _saved(name, raw, {"ok": True})
+
+    return _locked_admin_write(request, name, write)
+
+
+def _admin_patch(request: Request, ops: list, name: str):
+    """Общая часть PATCH /api/admin/data и /api/admin/core-packages.
+
+    Патч применяется к документу из текущего снимка данных (а не к файлу с
+    диска), проверяется так же, как PUT, записывается атомарно; в лог идут
+    сами операции. prefix — где документ лежит внутри data (для
+    частичной пересборки цен).
+    """
+    require_admin(request)
+    check, prefix = _ADMIN_FILES[name]
+    project_dir = Path(__file__).resolve().parents[1]
+    path = _admin_path(name)
 
-    # Минимальная валидация, чтобы случайно не сохранить мусор.
-    if not isinstance(payload, dict):
-        return {"ok": False, "error": "payload must be an object"}
+    def write(before: Optional[bytes], base: DataSnapshot):
+        try:
+            payload = apply_patch(base.document(name), ops)
+        except JsonPatchConflict as exc:
+            return JSONResponse({"detail": str(exc)}, status_code=409)
+        except JsonPatchError as exc:
+            return JSONResponse({"detail": str(exc)}, status_code=400)
+        error = check(payload)
+        if error:
+            return {"ok": False, "error": error}
+        if not ops:
+            return _saved(name, before or b"", {"ok": True, "version": base.version})
+
+        raw = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+        with span("admin.write"):
+            _save_admin_file(path, raw, request, "patch", before)
+        with span("admin.diff_log"):
+            _append_admin_patch_log(project_dir, request, ops)
+        with span("admin.reload"):
+            snap = get_data_snapshots().install(name, raw, payload, base)
+            _pricing_changed(base, [prefix + p for p in patch_paths(ops)])
+        return _saved(name, raw, {"ok": True, "version": snap.version})
+
+    return _locked_admin_write(request, name, write)
+
+
+@router.get("/api/admin/data")
+def admin_get_data(request: Request):
+    """data.json как есть; ETag — версия для If-Match при сохранении."""
+    return _admin_get(request, "data.json")
+
+
+@router.put("/api/admin/data")
+def admin_put_data(request: Request, payload: dict = Body(...)):
+    """Сохраняет новый data.json (принимаем JSON целиком).
+
+    Нужен If-Match с ETag из GET: 412 — файл успели изменить.
+    """
     # В актуальной версии данные лежат в payload.segments (а не packages).
-    if "segments" not in payload:
-        return {"ok": False, "error": "missing key: segments"}
+    return _admin_put(request, "data.json", payload)
 
-    # Старый текст нужен, чтобы сохранить diff в logs/data_changes.log
-    old_text = ""
-    try:
-        old_text = data_json.read_text(encoding="utf-8")
-    except Exception:
-        old_text = ""
 
-    new_text = json.dumps(payload, ensure_ascii=False, indent=2)
+@router.patch("/api/admin/data")
+def admin_patch_data(request: Request, ops: list = Body(...)):
+    """Правка data.json списком операций JSON Patch (RFC 6902).
 
-    backup_dir = project_dir / "frontend_shared" / "data" / "_backups"
-    _write_json_atomic(data_json, payload, backup_dir)
-    _append_admin_diff_log(project_dir, request, old_text, new_text)
-    # Сбрасываем кеш данных, чтобы расчёты сразу увидели изменения.
-    load_data_from_frontend.cache_clear()
-    return {"ok": True}
+    Размер работы — по размеру правки, а не всего файла: нет полного
+    текстового diff, цены пересобираются только для задетых сегментов.
+    400 — кривой патч, 409 — не прошла операция "test", 412 — If-Match
+    не совпал с текущей версией.
+    """
+    return _admin_patch(request, ops, "data.json")
 
 
 @router.get("/api/admin/core-packages")
 def admin_get_core_packages(request: Request):
-    require_admin(request)
-    project_dir = Path(__file__).resolve().parents[1]
-    core_json = project_dir / "frontend_shared" / "data" / "core_packages.json"
-    if not core_json.exists():
-        return {"ok": False, "error": "core_packages.json not found"}
-    return json.loads(core_json.read_text(encoding="utf-8"))
+    return _admin_get(request, "core_packages.json")
 
 
 @router.put("/api/admin/core-packages")
 def admin_put_core_packages(request: Request, payload: dict = Body(...)):
-    """Сохраняет core_packages.json (принимаем JSON целиком)."""
+    """Сохраняет core_packages.json (принимаем JSON целиком, нужен If-Match)."""
+    return _admin_put(request, "core_packages.json", payload)
+
+
+@router.patch("/api/admin/core-packages")
+def admin_patch_core_packages(request: Request, ops: list = Body(...)):
+    """Правка core_packages.json списком операций JSON Patch (как PATCH /api/admin/data)."""
+    return _admin_patch(request, ops, "core_packages.json")
+
+
+@router.get("/api/admin/history")
+def admin_history(request: Request, file: Optional[str] = None, limit: int = 100):
+    """История сохранений из админки (новые сверху): время, файл, хеш, parent, IP, действие."""
     require_admin(request)
+    history = get_data_history()
+    items = history.history(file, min(max(limit, 0), 1000))
+    for item in items:
+        item["available"] = history.has(str(item.get("hash") or ""))
+    return {"items": items}
 
-    project_dir = Path(__file__).resolve().parents[1]
-    core_json = project_dir / "frontend_shared" / "data" / "core_packages.json"
 
-    if not isinstance(payload, dict):
-        return {"ok": False, "error": "payload must be an object"}
-    if "packages" not in payload or not isinstance(payload.get("packages"), list):
-        return {"ok": False, "error": "missing key: packages (list)"}
+@router.get("/api/admin/history/{digest}")
+def admin_history_content(request: Request, digest: str):
+    """Содержимое версии по хешу (как лежало в файле)."""
+    require_admin(request)
+    raw = get_data_history().get(digest)
+    if raw is None:
+        return JSONResponse({"detail": "version not found"}, status_code=404)
+    return Response(raw, media_type="application/json")
+
+
+@router.post("/api/admin/history/{digest}/restore")
+def admin_history_restore(request: Request, digest: str):
+    """Вернуть файл к версии из истории (сам откат тоже попадает в историю).
 
-    backup_dir = project_dir / "frontend_shared" / "data" / "_backups"
-    _write_json_atomic(core_json, payload, backup_dir)
-    load_data_from_frontend.cache_clear()
-    return {"ok": True}
+    If-Match — ETag текущей версии файла (или *), как у PUT.
+    """
+    require_admin(request)
+    history = get_data_history()
+    entry = history.find(digest)
+    raw = history.get(digest) if entry is not None else None
+    if raw is None:
+        return JSONResponse({"detail": "version not found"}, status_code=404)
+    name = str(entry.get("file") or "")
+    if name not in _ADMIN_FILES:
+        return JSONResponse({"detail": f"cannot restore {name!r}"}, status_code=400)
+    check, prefix = _ADMIN_FILES[name]
+    try:
+        payload = json.loads(raw.decode("utf-8"))
+    except ValueError:
+        return JSONResponse({"detail": "stored version is not valid JSON"}, status_code=400)
+    error = check(payload)
+    if error:
+        return {"ok": False, "error": error}
+
+    project_dir = Path(__file__).resolve().parents[1]
+    path = _admin_path(name)
+
+    def write(before: Optional[bytes], base: DataSnapshot):
+        if base.digest(name) == digest:
+            return _saved(name, raw, {"ok": True, "file": name, "hash": digest, "version": base.version})
+        with span("admin.write"):
+            _save_admin_file(path, raw, request, "restore", before)
+        with span("admin.diff_log"):
+            _append_admin_log(project_dir, request, f"restore {name} -> {digest}")
+        with span("admin.reload"):
+            snap = get_data_snapshots().install(name, raw, payload, base)
+            _pricing_changed(base, [prefix])
+        return _saved(name, raw, {"ok": True, "file": name, "hash": digest, "version": snap.version})
+
+    return _locked_admin_write(request, name, write)
@@ -0,0 +1,144 @@
+# ФАЙЛ: backend/asgi_middleware.py
+# ЗАЧЕМ НУЖЕН:
+#   Один «чистый» ASGI-middleware вместо @app.middleware("http"):
+#     - BasicAuth (если заданы AURORA_USER / AURORA_PASS);
+#     - Cache-Control по умолчанию для /api/* (no-store, если ручка сама
+#       ничего не поставила — ответы API с ценами/контактами не кешируем);
+#     - Server-Timing: app;dur=<мс до отправки заголовков> + этапы запроса
+#       (span'ы из backend/metrics.py), а в конце запроса — гистограммы
+#       для /metrics.
+#
+#   @app.middleware("http") — это BaseHTTPMiddleware: на каждый запрос он
+#   заводит задачу и перекладывает тело ответа через поток памяти. Для
+#   потоковой выдачи Word и NDJSON это лишняя работа на каждый кусок.
+#   Здесь мы просто подменяем send() и правим заголовки, тело идёт как есть.
+#
+# КЕШ ПРОВЕРКИ ПАРОЛЯ:
+#   Браузер присылает один и тот же заголовок Authorization на каждый
+#   запрос (в том числе на каждый скрипт и стиль). Декодировать base64 и
+#   сравнивать логин/пароль каждый раз незачем: после успешной проверки
+#   запоминаем sha256 заголовка (не сам заголовок) и дальше сверяем только его.
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import secrets
+import time
+from typing import Iterable, Optional, Set
+
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import collect_spans, get_metrics, server_timing
+
+_MAX_VERIFIED = 256
+
+
+def _route_label(scope: Scope, root_path: str) -> str:
+    """Шаблон маршрута для метрик (не сам путь — иначе меток будет бесконечно много)."""
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    # Статика (Mount): роутер дописывает префикс монтирования в root_path.
+    mounted = scope.get("root_path", "")
+    if mounted != root_path:
+        return mounted[len(root_path):] or "/"
+    return "<unmatched>"
+
+
+class AuroraMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        public_paths: Iterable[str] = ("/health", "/ready"),
+    ):
+        self.app = app
+        self.user = user or ""
+        self.password = password or ""
+        self.public_paths = frozenset(public_paths)
+        self._verified: Set[bytes] = set()
+
+    @property
+    def auth_enabled(self) -> bool:
+        return bool(self.user and self.password)
+
+    # --- BasicAuth ---
+
+    def _check_credentials(self, header: bytes) -> bool:
+        try:
+            scheme, _, value = header.decode("latin-1").partition(" ")
+            if scheme.lower() != "basic":
+                return False
+            user, pwd = base64.b64decode(value.strip()).decode("utf-8").split(":", 1)
+        except Exception:
+            return False
+        ok_user = secrets.compare_digest(user.encode("utf-8"), self.user.encode("utf-8"))
+        ok_pass = secrets.compare_digest(pwd.encode("utf-8"), self.password.encode("utf-8"))
+        return ok_user and ok_pass
+
+    def _authorized(self, scope: Scope) -> bool:
+        header = b""
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                header = value
+                break
+        if not header:
+            return False
+        digest = hashlib.sha256(header).digest()
+        if digest in self._verified:
+            return True
+        if not self._check_credentials(header):
+            return False
+        if len(self._verified) >= _MAX_VERIFIED:
+            self._verified.clear()
+        self._verified.add(digest)
+        return True
+
+    # --- ASGI ---
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        path = scope["path"]
+
+        # /health и /ready оставим без пароля, чтобы удобно проверять, что сервер жив и прогрет.
+        if self.auth_enabled and path not in self.public_paths and not self._authorized(scope):
+            response = JSONResponse(
+                status_code=401,
+                content={"detail": "Unauthorized"},
+                headers={"WWW-Authenticate": "Basic"},
+            )
+            await response(scope, receive, send)
+            return
+
+        is_api = path.startswith("/api/")
+        root_path = scope.get("root_path", "")
+        status = 500
+
+        async def send_with_headers(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                if is_api and "cache-control" not in headers:
+                    headers["Cache-Control"] = "no-store"
+                timing = f"app;dur={(time.perf_counter() - started) * 1000:.1f}"
+                if spans:
+                    timing += ", " + server_timing(spans)
+                headers.append("Server-Timing", timing)
+            await send(message)
+
+        with collect_spans() as spans:
+            try:
+                await self.app(scope, receive, send_with_headers)
+            finally:
+                metrics = get_metrics()
+                metrics.observe_stages(spans)
+                metrics.observe_http(_route_label(scope, root_path), scope["method"], status, time.perf_counter() - started)
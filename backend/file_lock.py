@@ -0,0 +1,72 @@
+# ФАЙЛ: backend/file_lock.py
+# ЗАЧЕМ НУЖЕН:
+#   Межпроцессная блокировка на файле: сохранения из админки в разных
+#   воркерах uvicorn (и в разных потоках одного воркера) идут строго по
+#   очереди — проверка версии, запись файла, история правок.
+#
+# КАК УСТРОЕНО:
+#   - Linux/macOS: fcntl.flock на отдельном файле-замке. flock держится на
+#     открытом файле, поэтому два потока одного процесса тоже ждут друг друга.
+#   - Windows: msvcrt.locking на первом байте файла-замка.
+#   - Ждём не дольше timeout секунд, дальше FileLockTimeout (API отвечает
+#     503 + Retry-After, а не висит).
+#   - Процесс упал с блокировкой — ОС снимает её сама, «вечных» замков нет.
+
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+    import msvcrt
+
+_POLL_S = 0.02
+
+
+class FileLockTimeout(TimeoutError):
+    pass
+
+
+def _try_lock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path: Path, timeout: float = 30.0) -> Iterator[None]:
+    """Эксклюзивная блокировка на файле path (создаётся, если его нет)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        deadline = time.monotonic() + timeout
+        while not _try_lock(fd):
+            if time.monotonic() >= deadline:
+                raise FileLockTimeout(f"не дождались блокировки {path} за {timeout:g} с")
+            time.sleep(_POLL_S)
+        try:
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
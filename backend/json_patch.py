@@ -0,0 +1,216 @@
+# ФАЙЛ: backend/json_patch.py
+# ЗАЧЕМ НУЖЕН:
+#   PATCH /api/admin/data и /api/admin/core-packages принимают не файл
+#   целиком, а список правок JSON Patch (RFC 6902), например:
+#     [{"op": "replace", "path": "/rub_per_point", "value": 1500},
+#      {"op": "add", "path": "/segments/Опт/-", "value": {...}}]
+#   Путь — JSON Pointer (RFC 6901): "/a/b/0", "~1" означает "/", "~0" — "~".
+#
+# КАК УСТРОЕНО:
+#   - Исходный документ не меняется (это словарь из снимка данных, его
+#     читают другие запросы). Копируются только словари/списки на пути к
+#     правке, всё остальное новый документ делит со старым. Правка одной
+#     цены стоит O(глубина пути), а не O(размер каталога).
+#   - patch_paths() — какие пути патч меняет (по ним calc.py решает, что из
+#     скомпилированных цен пересобрать).
+#   - JsonPatchError — кривой патч или путь, которого нет;
+#     JsonPatchConflict — не прошла операция "test" (документ уже другой).
+
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, List, Sequence, Tuple
+
+Pointer = Tuple[str, ...]
+
+_OPS = ("add", "remove", "replace", "move", "copy", "test")
+
+
+class JsonPatchError(ValueError):
+    pass
+
+
+class JsonPatchConflict(JsonPatchError):
+    pass
+
+
+def parse_pointer(pointer: Any) -> Pointer:
+    """JSON Pointer -> кортеж ключей ("" — весь документ)."""
+    if not isinstance(pointer, str):
+        raise JsonPatchError(f"путь должен быть строкой: {pointer!r}")
+    if pointer == "":
+        return ()
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"путь должен начинаться с '/': {pointer!r}")
+    return tuple(t.replace("~1", "/").replace("~0", "~") for t in pointer[1:].split("/"))
+
+
+def format_pointer(tokens: Sequence[str]) -> str:
+    return "".join("/" + t.replace("~", "~0").replace("/", "~1") for t in tokens)
+
+
+def _list_index(container: List[Any], token: str, pointer: Pointer, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise JsonPatchError(f"{format_pointer(pointer)}: ожидали номер элемента списка, а не {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"{format_pointer(pointer)}: нет элемента {index} (в списке {len(container)})")
+    return index
+
+
+def _child(container: Any, token: str, pointer: Pointer) -> Any:
+    if isinstance(container, dict):
+        if token not in container:
+            raise JsonPatchError(f"{format_pointer(pointer)}: нет ключа {token!r}")
+        return container[token]
+    if isinstance(container, list):
+        return container[_list_index(container, token, pointer)]
+    raise JsonPatchError(f"{format_pointer(pointer)}: {token!r} — не внутри объекта или списка")
+
+
+def _get(doc: Any, pointer: Pointer) -> Any:
+    node = doc
+    for i, token in enumerate(pointer):
+        node = _child(node, token, pointer[: i + 1])
+    return node
+
+
+def _json_equal(a: Any, b: Any) -> bool:
+    # В JSON true и 1 — разные значения, а в Python True == 1.
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_json_equal(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_json_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+class _Patcher:
+    """Копирование при записи: контейнеры, скопированные этим патчем, правим на месте."""
+
+    def __init__(self, doc: Any):
+        self.doc = doc
+        self._owned: Dict[int, Any] = {}  # id -> объект (держим ссылку, чтобы id не переиспользовался)
+
+    def _own(self, node: Any) -> Any:
+        if id(node) in self._owned:
+            return node
+        copied = dict(node) if isinstance(node, dict) else list(node)
+        self._owned[id(copied)] = copied
+        return copied
+
+    def _parent(self, pointer: Pointer) -> Any:
+        """Контейнер, в котором лежит pointer[-1]; весь путь к нему — свои копии."""
+        if not isinstance(self.doc, (dict, list)):
+            raise JsonPatchError(f"{format_pointer(pointer)}: документ не объект и не список")
+        self.doc = node = self._own(self.doc)
+        for i, token in enumerate(pointer[:-1]):
+            child = _child(node, token, pointer[: i + 1])
+            if not isinstance(child, (dict, list)):
+                raise JsonPatchError(f"{format_pointer(pointer[: i + 1])}: не объект и не список")
+            child = self._own(child)
+            if isinstance(node, dict):
+                node[token] = child
+            else:
+                node[int(token)] = child
+            node = child
+        return node
+
+    def add(self, pointer: Pointer, value: Any) -> None:
+        if not pointer:
+            self.doc = value
+            return
+        parent, token = self._parent(pointer), pointer[-1]
+        if isinstance(parent, dict):
+            parent[token] = value
+        else:
+            parent.insert(_list_index(parent, token, pointer, allow_end=True), value)
+
+    def remove(self, pointer: Pointer) -> Any:
+        if not pointer:
+            raise JsonPatchError("нельзя удалить документ целиком")
+        parent, token = self._parent(pointer), pointer[-1]
+        value = _child(parent, token, pointer)
+        if isinstance(parent, dict):
+            del parent[token]
+        else:
+            del parent[int(token)]
+        return value
+
+    def replace(self, pointer: Pointer, value: Any) -> None:
+        if not pointer:
+            self.doc = value
+            return
+        parent, token = self._parent(pointer), pointer[-1]
+        _child(parent, token, pointer)  # путь обязан существовать
+        if isinstance(parent, dict):
+            parent[token] = value
+        else:
+            parent[int(token)] = value
+
+
+def _operation(op: Any, n: int) -> Tuple[str, Pointer]:
+    if not isinstance(op, dict):
+        raise JsonPatchError(f"операция #{n}: ожидали объект")
+    name = op.get("op")
+    if name not in _OPS:
+        raise JsonPatchError(f"операция #{n}: неизвестная op {name!r}")
+    if name in ("add", "replace", "test") and "value" not in op:
+        raise JsonPatchError(f"операция #{n} ({name}): нет value")
+    if name in ("move", "copy") and "from" not in op:
+        raise JsonPatchError(f"операция #{n} ({name}): нет from")
+    return name, parse_pointer(op.get("path"))
+
+
+def apply_patch(doc: Any, ops: Any) -> Any:
+    """Применить JSON Patch и вернуть новый документ (doc не меняется).
+
+    Операции применяются по порядку; если любая не проходит — исключение,
+    и результата нет (RFC 6902: патч применяется целиком или никак).
+    """
+    if not isinstance(ops, list):
+        raise JsonPatchError("JSON Patch — это список операций")
+    patcher = _Patcher(doc)
+    for n, op in enumerate(ops):
+        name, pointer = _operation(op, n)
+        try:
+            if name == "add":
+                patcher.add(pointer, op["value"])
+            elif name == "remove":
+                patcher.remove(pointer)
+            elif name == "replace":
+                patcher.replace(pointer, op["value"])
+            elif name == "move":
+                source = parse_pointer(op["from"])
+                if pointer[: len(source)] == source and pointer != source:
+                    raise JsonPatchError("нельзя переместить значение внутрь самого себя")
+                if pointer != source:
+                    patcher.add(pointer, patcher.remove(source))
+            elif name == "copy":
+                # Глубокая копия: источник может быть уже «своим» контейнером
+                # патча (_owned), и правки копии поменяли бы его на месте.
+                patcher.add(pointer, copy.deepcopy(_get(patcher.doc, parse_pointer(op["from"]))))
+            else:
+                if not _json_equal(_get(patcher.doc, pointer), op["value"]):
+                    raise JsonPatchConflict(f"операция #{n} (test): {format_pointer(pointer)} не совпадает")
+        except JsonPatchConflict:
+            raise
+        except JsonPatchError as exc:
+            raise JsonPatchError(f"операция #{n} ({name}): {exc}") from None
+    return patcher.doc
+
+
+def patch_paths(ops: Sequence[Dict[str, Any]]) -> List[Pointer]:
+    """Пути, которые патч меняет (для move — и откуда, и куда; test ничего не меняет)."""
+    paths: List[Pointer] = []
+    for op in ops:
+        name = op.get("op")
+        if name == "test":
+            continue
+        paths.append(parse_pointer(op.get("path")))
+        if name == "move":
+            paths.append(parse_pointer(op.get("from")))
+    return paths
@@ -11,20 +11,49 @@
 #     /admin    — админка (свои ассеты)
 #     /data     — общие данные (data.json)
 
+from contextlib import asynccontextmanager
 from pathlib import Path
 import os
-import secrets
-import base64
 import mimetypes
 
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from fastapi import Request
-from fastapi.responses import JSONResponse, FileResponse, RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse
+from starlette.concurrency import run_in_threadpool
 
 from .api_routes import router
-
-app = FastAPI(title="Aurora Checklist")
+from .asgi_middleware import AuroraMiddleware
+from .static_cache import CachedStaticFiles
+from .v5.docx_jobs import get_docx_jobs
+from .v5.docx_pool import get_docx_pool
+from .v5.output_writer import get_output_writer
+from .warmup import get_warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Прогрев (см. warmup.py): данные, матрица услуг, статика, процессы пула
+    # Word. По умолчанию в фоне (запросы принимаются сразу, /ready — 503 до
+    # конца прогрева); AURORA_STARTUP=full — дождаться прогрева.
+    warmup = get_warmup()
+    await run_in_threadpool(warmup.start)
+    # Исполнители фоновых выгрузок Word (задания в SQLite, см. v5/docx_jobs.py).
+    jobs = get_docx_jobs()
+    await run_in_threadpool(jobs.start)
+    pool = get_docx_pool()
+    try:
+        yield
+    finally:
+        # Фоновый прогрев мог ещё поднимать пул — дожидаемся, прежде чем гасить.
+        await run_in_threadpool(warmup.wait)
+        # Сначала исполнители заданий (дособирают текущие), потом пул.
+        await run_in_threadpool(jobs.shutdown)
+        await run_in_threadpool(pool.shutdown)
+        # Дописываем копии Word, которые ещё стоят в очереди на ./output.
+        await run_in_threadpool(get_output_writer().shutdown)
+
+
+app = FastAPI(title="Aurora Checklist", lifespan=lifespan)
 app.include_router(router)
 
 # -----------------------------
@@ -35,61 +64,23 @@ mimetypes.add_type("text/javascript", ".mjs")
 mimetypes.add_type("text/css", ".css")
 
 # -----------------------------
-# Опциональная защита паролем (BasicAuth)
+# Опциональная защита паролем (BasicAuth) + заголовки кеша/таймингов
 # -----------------------------
+# Один чистый ASGI-middleware (см. backend/asgi_middleware.py) вместо
+# @app.middleware("http"): не оборачивает тело ответа (важно для потоковой
+# выдачи Word) и не проверяет пароль заново на каждом скрипте/стиле.
 AUTH_USER = os.getenv("AURORA_USER")
 AUTH_PASS = os.getenv("AURORA_PASS")
 
-
-def _check_basic_auth(request: Request) -> bool:
-    if not AUTH_USER or not AUTH_PASS:
-        return True
-    hdr = request.headers.get("authorization") or ""
-    if not hdr.lower().startswith("basic "):
-        return False
-    try:
-        raw = base64.b64decode(hdr.split(" ", 1)[1]).decode("utf-8")
-        user, pwd = raw.split(":", 1)
-    except Exception:
-        return False
-    return secrets.compare_digest(user, AUTH_USER) and secrets.compare_digest(pwd, AUTH_PASS)
-
-
-@app.middleware("http")
-async def basic_auth_middleware(request: Request, call_next):
-    # /health оставим без пароля, чтобы удобно проверять, что сервер жив.
-    if request.url.path == "/health":
-        return await call_next(request)
-
-    if not _check_basic_auth(request):
-        return JSONResponse(
-            status_code=401,
-            content={"detail": "Unauthorized"},
-            headers={"WWW-Authenticate": "Basic"},
-        )
-    return await call_next(request)
-
-
-# -----------------------------
-# Отключаем агрессивный кэш для статики (полезно при частых пересборках)
-# -----------------------------
-@app.middleware("http")
-async def no_cache_static(request: Request, call_next):
-    response = await call_next(request)
-    p = request.url.path
-    if (
-        p.startswith("/data/")
-        or "/assets/" in p
-        or p.endswith(".html")
-        or p in ("/", "/client", "/client/", "/manager", "/manager/", "/admin", "/admin/")
-    ):
-        response.headers["Cache-Control"] = "no-store, max-age=0"
-    return response
+app.add_middleware(AuroraMiddleware, user=AUTH_USER, password=AUTH_PASS)
 
 
 # -----------------------------
 # Статика и маршруты модулей
 # -----------------------------
+# Кеширование статики — см. backend/static_cache.py: ETag + 304, gzip/br,
+# ассеты по URL с ?v=<версия> (immutable), HTML и /data/*.json — no-cache
+# (браузер каждый раз сверяет ETag, так что свежесть после правок гарантирована).
 BASE_DIR = Path(__file__).resolve().parent.parent
 FRONTEND_ROOT_DIR = BASE_DIR / "frontend_root"
 FRONTEND_CLIENT_DIR = BASE_DIR / "frontend_client"
@@ -98,12 +89,15 @@ FRONTEND_ADMIN_DIR = BASE_DIR / "frontend_admin"
 DATA_DIR = BASE_DIR / "frontend_shared" / "data"
 
 # Общие данные
-app.mount("/data", StaticFiles(directory=DATA_DIR), name="data")
+app.mount("/data", CachedStaticFiles(directory=DATA_DIR), name="data")
 
 # Модули (каждый со своими ассетами)
-app.mount("/client", StaticFiles(directory=FRONTEND_CLIENT_DIR, html=True), name="client")
-app.mount("/manager", StaticFiles(directory=FRONTEND_MANAGER_DIR, html=True), name="manager")
-app.mount("/admin", StaticFiles(directory=FRONTEND_ADMIN_DIR, html=True), name="admin")
+app.mount("/client", CachedStaticFiles(directory=FRONTEND_CLIENT_DIR, html=True), name="client")
+app.mount("/manager", CachedStaticFiles(directory=FRONTEND_MANAGER_DIR, html=True), name="manager")
+app.mount("/admin", CachedStaticFiles(directory=FRONTEND_ADMIN_DIR, html=True), name="admin")
+
+# Стартовая страница — не mount (иначе перекроет всё), но кешируется так же.
+ROOT_STATIC = CachedStaticFiles(directory=FRONTEND_ROOT_DIR)
 
 
 @app.get("/client")
@@ -125,10 +119,20 @@ def admin_redirect(request: Request):
 
 
 @app.get("/")
-def landing():
-    return FileResponse(FRONTEND_ROOT_DIR / "index.html")
+async def landing(request: Request):
+    return await ROOT_STATIC.get_response("index.html", request.scope)
 
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    """Прогрев закончен без ошибок (200); идёт или упал шаг (503); по шагам — см. warmup.py.
+
+    /health — «процесс жив», /ready — «можно слать трафик».
+    """
+    status = get_warmup().status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
@@ -0,0 +1,170 @@
+# ФАЙЛ: backend/metrics.py
+# ЗАЧЕМ НУЖЕН:
+#   Понять, на что ушло время медленного запроса: загрузка шаблона, поиск
+#   таблиц, заполнение задач, протокол, шрифты, сохранение архива Word;
+#   загрузка данных или сам расчёт в calculate_v5; запись из админки.
+#
+# КАК УСТРОЕНО:
+#   - Этап меряется через span("docx.fonts") (или record_span, если
+#     таймер уже есть) по time.perf_counter() — монотонные часы.
+#   - Внутри HTTP-запроса этапы копятся в «сборщике» запроса (contextvar;
+#     потоки run_in_threadpool видят тот же сборщик). Один и тот же этап,
+#     вызванный много раз (пакетный расчёт), суммируется.
+#   - AuroraMiddleware (asgi_middleware.py) в конце запроса кладёт этапы в
+#     гистограммы, а то, что успело посчитаться до отправки заголовков,
+#     пишет в Server-Timing (видно во вкладке Network браузера).
+#   - Вне запроса (прогрев, фоновые потоки) этап сразу идёт в гистограмму.
+#   - Процессы-воркеры Word меряют свои этапы через collect_spans() и
+#     возвращают их вместе с архивом (см. docx_pool.py).
+#   - GET /metrics — всё в текстовом формате Prometheus:
+#       aurora_stage_seconds{stage}                — этапы (за запрос);
+#       aurora_http_request_seconds{route,method,status} — запросы целиком.
+#
+#   Гистограммы свои у каждого процесса uvicorn: при --workers N каждый
+#   scrape попадает в один из процессов.
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+# Границы корзин, секунды (от 0.1 мс до 10 с).
+BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Этапы текущего запроса: имя -> суммарные секунды (None — вне запроса).
+Spans = Dict[str, float]
+_current: "contextvars.ContextVar[Optional[Spans]]" = contextvars.ContextVar("aurora_spans", default=None)
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.total += seconds
+        self.count += 1
+
+
+def _label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Histogram] = {}
+        self._http: Dict[Tuple[str, str, str], Histogram] = {}
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = Histogram()
+            hist.observe(seconds)
+
+    def observe_stages(self, spans: Mapping[str, float]) -> None:
+        for stage, seconds in spans.items():
+            self.observe_stage(stage, seconds)
+
+    def observe_http(self, route: str, method: str, status: int, seconds: float) -> None:
+        key = (route, method, str(status))
+        with self._lock:
+            hist = self._http.get(key)
+            if hist is None:
+                hist = self._http[key] = Histogram()
+            hist.observe(seconds)
+
+    def render(self) -> str:
+        """Всё в текстовом формате Prometheus (exposition format 0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            families = (
+                ("aurora_stage_seconds", "Время этапов обработки за запрос, секунды.",
+                 [((("stage", s),), h) for s, h in sorted(self._stages.items())]),
+                ("aurora_http_request_seconds", "Время HTTP-запросов, секунды.",
+                 [((("route", r), ("method", m), ("status", st)), h) for (r, m, st), h in sorted(self._http.items())]),
+            )
+            for name, help_text, series in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, hist in series:
+                    base = ",".join(f'{k}="{_label_value(v)}"' for k, v in labels)
+                    cumulative = 0
+                    for bound, n in zip(BUCKETS, hist.counts):
+                        cumulative += n
+                        lines.append(f'{name}_bucket{{{base},le="{bound:g}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{base},le="+Inf"}} {hist.count}')
+                    lines.append(f"{name}_sum{{{base}}} {hist.total:.6f}")
+                    lines.append(f"{name}_count{{{base}}} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
+
+
+# --- этапы ---
+
+
+def record_span(stage: str, seconds: float) -> None:
+    """Учесть этап, время которого уже измерено."""
+    spans = _current.get()
+    if spans is None:
+        get_metrics().observe_stage(stage, seconds)
+    else:
+        spans[stage] = spans.get(stage, 0.0) + seconds
+
+
+def attach_spans(spans: Mapping[str, float]) -> None:
+    """Добавить этапы, измеренные в другом процессе (воркер Word)."""
+    for stage, seconds in spans.items():
+        record_span(stage, seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - started)
+
+
+@contextmanager
+def collect_spans() -> Iterator[Spans]:
+    """Собрать этапы блока кода в словарь (запрос целиком или работа воркера)."""
+    spans: Spans = {}
+    token = _current.set(spans)
+    try:
+        yield spans
+    finally:
+        _current.reset(token)
+
+
+def server_timing(spans: Mapping[str, float]) -> str:
+    """Значение заголовка Server-Timing для этапов (мс)."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in spans.items())
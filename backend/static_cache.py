@@ -0,0 +1,280 @@
+# ФАЙЛ: backend/static_cache.py
+# ЗАЧЕМ НУЖЕН:
+#   Раздача статики (/data, /client, /manager, /admin) с нормальным кешем.
+#
+#   Раньше middleware ставил `Cache-Control: no-store` на всё подряд, а
+#   data.js грузил JSON с `cache: 'no-store'` — каждое открытие страницы
+#   заново качало все скрипты, стили и данные целиком.
+#
+# КАК УСТРОЕНО:
+#   - У каждого файла — сильный ETag (sha256 содержимого). Пришёл
+#     If-None-Match с тем же ETag — отвечаем 304 без тела.
+#   - Сжатые варианты (gzip, и brotli — если установлен пакет `brotli`)
+#     готовятся один раз на версию файла и лежат в памяти; отдаём тот,
+#     что понимает браузер (Accept-Encoding), с Vary: Accept-Encoding.
+#   - Версия ассетов: sha256 всех .js/.css папки модуля. В HTML и в
+#     import'ах JS относительные ссылки на .js/.css получают `?v=<версия>`.
+#     Запрос с актуальной версией отдаём как immutable на год, всё
+#     остальное (HTML, JSON, старые версии) — `no-cache`: браузер хранит
+#     копию, но каждый раз сверяет ETag (обычно это 304).
+#     Версия одна на всю папку, а не на файл: у ES-модулей бывают
+#     циклические импорты, и каждый модуль должен грузиться по ОДНОМУ URL
+#     (иначе браузер создаст два экземпляра модуля с разным состоянием).
+#   - Свежесть: при каждом запросе сверяем stat() файла (mtime/размер/inode),
+#     поэтому после сохранения из админки ETag /data/*.json меняется сразу.
+#     Список ассетов для версии пересматривается не чаще раза в секунду.
+#
+# НАСТРОЙКА:
+#   AURORA_STATIC_CACHE_MAX_KB — файлы больше этого размера отдаём как есть,
+#                                без кеша в памяти (1024).
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Scope
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # необязательная зависимость
+    brotli = None
+
+_ASSET_SUFFIXES = (".js", ".mjs", ".css")
+_REWRITE_SUFFIXES = (".html", ".js", ".mjs")
+_COMPRESS_MIN_BYTES = 512
+_VERSION_CHECK_S = 1.0
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# src="assets/app.js", href="assets/styles.css" (только относительные ссылки)
+_HTML_REF = re.compile(r"""(\b(?:src|href)\s*=\s*)(["'])((?![a-z]+:|/|#)[^"'?#]+\.(?:m?js|css))\2""", re.I)
+# import x from './a.js' · export * from '../b.js' · import './c.js' · import('./d.js')
+_JS_REF = re.compile(r"""(\b(?:from|import)\s*\(?\s*)(["'])(\.{1,2}/[^"'?#]+\.m?js)\2""")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _is_text(media_type: str) -> bool:
+    return media_type.startswith("text/") or media_type in (
+        "application/json",
+        "application/javascript",
+        "application/xml",
+        "image/svg+xml",
+    )
+
+
+def _stat_sig(st: os.stat_result) -> Tuple[int, int, int]:
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _accepts(headers: Headers, coding: str) -> bool:
+    for part in headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def _etag_matches(headers: Headers, etags: Tuple[str, ...]) -> bool:
+    inm = headers.get("if-none-match")
+    if not inm:
+        return False
+    if inm.strip() == "*":
+        return True
+    wanted = {t.strip().removeprefix("W/") for t in inm.split(",")}
+    return any(e in wanted for e in etags)
+
+
+@dataclass(frozen=True)
+class PreparedBody:
+    """Готовое к отдаче тело: все варианты сжатия + ETag.
+
+    Используется и для файлов, и для JSON API, которые отдают одно и то же
+    (см. prepare_body и v5/services_matrix.py).
+    """
+
+    signature: Tuple[int, int, int]
+    version: str  # версия ассетов, под которую переписаны ссылки ("" — не переписывали)
+    media_type: str
+    etag: str
+    bodies: Dict[str, bytes]  # "identity" / "gzip" / "br"
+
+    @property
+    def etags(self) -> Tuple[str, ...]:
+        return tuple(self._etag_for(c) for c in self.bodies)
+
+    def _etag_for(self, coding: str) -> str:
+        return self.etag if coding == "identity" else f'{self.etag[:-1]}-{coding}"'
+
+    def respond(self, headers: Headers, cache_control: str, head: bool) -> Response:
+        coding = "identity"
+        if "br" in self.bodies and _accepts(headers, "br"):
+            coding = "br"
+        elif "gzip" in self.bodies and _accepts(headers, "gzip"):
+            coding = "gzip"
+
+        out = {"Cache-Control": cache_control, "ETag": self._etag_for(coding)}
+        if len(self.bodies) > 1:
+            out["Vary"] = "Accept-Encoding"
+        if _etag_matches(headers, self.etags):
+            return Response(status_code=304, headers=out)
+        if coding != "identity":
+            out["Content-Encoding"] = coding
+        body = self.bodies[coding]
+        if head:
+            out["Content-Length"] = str(len(body))
+            return Response(b"", media_type=self.media_type, headers=out)
+        return Response(body, media_type=self.media_type, headers=out)
+
+
+def prepare_body(
+    raw: bytes,
+    media_type: str,
+    signature: Tuple[int, int, int] = (0, 0, 0),
+    version: str = "",
+) -> PreparedBody:
+    """Считает ETag (sha256) и сжатые варианты для готового тела ответа."""
+    bodies = {"identity": raw}
+    if _is_text(media_type) and len(raw) >= _COMPRESS_MIN_BYTES:
+        bodies["gzip"] = gzip.compress(raw, compresslevel=6, mtime=0)
+        if brotli is not None:
+            bodies["br"] = brotli.compress(raw)
+    etag = '"' + hashlib.sha256(raw).hexdigest()[:32] + '"'
+    return PreparedBody(signature, version, media_type, etag, bodies)
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles с ETag/304, сжатыми вариантами и версионными URL ассетов."""
+
+    def __init__(self, *, directory: os.PathLike | str, html: bool = False):
+        super().__init__(directory=directory, html=html)
+        self.root = Path(directory).resolve()
+        self.max_bytes = _env_int("AURORA_STATIC_CACHE_MAX_KB", 1024) * 1024
+        self._lock = threading.Lock()
+        self._entries: Dict[str, PreparedBody] = {}
+        self._version = ""
+        self._version_sig: Tuple = ()
+        self._version_checked = 0.0
+        _registry.append(self)
+
+    # --- версия ассетов папки ---
+
+    def _asset_files(self) -> List[Path]:
+        return sorted(
+            p for p in self.root.rglob("*")
+            if p.suffix in _ASSET_SUFFIXES and p.is_file()
+        )
+
+    def asset_version(self) -> str:
+        if time.monotonic() - self._version_checked < _VERSION_CHECK_S and self._version:
+            return self._version
+        with self._lock:
+            files = self._asset_files()
+            sig = tuple((str(p), _stat_sig(p.stat())) for p in files)
+            if sig != self._version_sig:
+                h = hashlib.sha256()
+                for p in files:
+                    h.update(str(p.relative_to(self.root)).encode("utf-8") + b"\0")
+                    h.update(p.read_bytes())
+                self._version = h.hexdigest()[:12]
+                self._version_sig = sig
+            self._version_checked = time.monotonic()
+            return self._version
+
+    # --- файлы ---
+
+    def _rewrite(self, full_path: Path, raw: bytes, version: str) -> bytes:
+        text = raw.decode("utf-8")
+        pattern = _HTML_REF if full_path.suffix == ".html" else _JS_REF
+
+        def add_version(m: "re.Match[str]") -> str:
+            target = (full_path.parent / m.group(3)).resolve()
+            if not target.is_relative_to(self.root) or not target.is_file():
+                return m.group(0)
+            return f"{m.group(1)}{m.group(2)}{m.group(3)}?v={version}{m.group(2)}"
+
+        return pattern.sub(add_version, text).encode("utf-8")
+
+    def _build(self, full_path: Path, st: os.stat_result, media_type: str, version: str) -> PreparedBody:
+        raw = full_path.read_bytes()
+        if version:
+            raw = self._rewrite(full_path, raw, version)
+        return prepare_body(raw, media_type, signature=_stat_sig(st), version=version)
+
+    def _entry(self, full_path: str, st: os.stat_result, media_type: str) -> Optional[PreparedBody]:
+        if st.st_size > self.max_bytes:
+            return None
+        path = Path(full_path)
+        version = self.asset_version() if path.suffix in _REWRITE_SUFFIXES else ""
+        entry = self._entries.get(full_path)
+        if entry is not None and entry.signature == _stat_sig(st) and entry.version == version:
+            return entry
+        entry = self._build(path, st, media_type, version)
+        with self._lock:
+            self._entries[full_path] = entry
+        return entry
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if not isinstance(response, FileResponse) or response.stat_result is None:
+            return response
+
+        full_path = str(response.path)
+        st = response.stat_result
+        entry = self._entries.get(full_path)
+        if entry is None or entry.signature != _stat_sig(st) or (
+            entry.version and time.monotonic() - self._version_checked >= _VERSION_CHECK_S
+        ):
+            # Промах или пора перепроверить версию ассетов — читаем диск в потоке.
+            entry = await anyio.to_thread.run_sync(self._entry, full_path, st, response.media_type)
+        if entry is None:
+            return response
+
+        headers = Headers(scope=scope)
+        cache_control = REVALIDATE
+        if Path(full_path).suffix in _ASSET_SUFFIXES:
+            query = scope.get("query_string", b"").decode("latin-1")
+            if f"v={self._version}" in query.split("&") and self._version:
+                cache_control = IMMUTABLE
+        resp = entry.respond(headers, cache_control, head=scope["method"] == "HEAD")
+        if response.status_code != 200 and resp.status_code == 200:
+            resp.status_code = response.status_code  # 404.html в html-режиме
+        return resp
+
+    def warm(self) -> int:
+        """Заранее прочитать и сжать все файлы папки (при старте сервера)."""
+        count = 0
+        for p in self.root.rglob("*"):
+            if not p.is_file():
+                continue
+            media_type = mimetypes.guess_type(str(p))[0] or "application/octet-stream"
+            if self._entry(str(p), p.stat(), media_type) is not None:
+                count += 1
+        return count
+
+
+_registry: List[CachedStaticFiles] = []
+
+
+def warm_static() -> int:
+    """Прогрев всех CachedStaticFiles (зовётся из lifespan)."""
+    return sum(s.warm() for s in _registry)
@@ -0,0 +1,183 @@
+"""backend/v5/batch.py
+
+ПАКЕТНЫЙ ПЕРЕСЧЁТ ЧЕК-ЛИСТОВ (POST /api/v5/calculate/batch)
+
+ЗАЧЕМ
+  Продажам нужно пересчитать тысячи старых чек-листов, когда меняется
+  rub_per_point или points_model («а что будет, если...»). Тысяча запросов
+  к /api/v5/calculate — это тысяча HTTP-кругов. Здесь — один запрос.
+
+ФОРМАТЫ ВХОДА
+  1) JSON-массив V5Input:             [{...}, {...}]
+  2) JSON-объект:                     {"items": [{...}, ...], "pricing": {...}}
+  3) Колонки (columnar JSON):         {"columns": {"segments": [[...], ...],
+                                                   "org_count": [1, 3, ...]},
+                                       "pricing": {...}}
+     Все колонки одной длины; поле, которого нет, берётся по умолчанию.
+  4) NDJSON (Content-Type: application/x-ndjson): по V5Input на строку.
+     Первая строка может быть {"pricing": {...}} — тогда это цены.
+
+ЦЕНЫ ДЛЯ СИМУЛЯЦИИ (pricing)
+  Необязательно. Накладывается поверх текущего data.json и НЕ сохраняется:
+  ключи верхнего уровня заменяются, points_model — по ключам. Можно
+  передать и core_packages (целиком, как в core_packages.json).
+
+КАК СЧИТАЕМ
+  Цены компилируются один раз на весь пакет (CompiledPricing из calc.py),
+  дальше каждая строка — поиски по таблицам + линейные слагаемые.
+  NumPy в проекте нет и для этих формул не нужен: узкое место — разбор
+  входа, а не арифметика.
+
+ВЫХОД
+  NDJSON, строка на каждую входную строку, отдаётся по мере расчёта:
+    {"i": 0, "ok": true, "package": "...", "points": 6, "costs": {...}}
+    {"i": 1, "ok": false, "error": [...]}      — строка не прошла валидацию
+  С ?full=1 вместо краткой сводки — весь V5Result в поле "result".
+
+НАСТРОЙКА
+  AURORA_BATCH_MAX_ROWS — максимум строк в одном запросе (100000).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from .calc import CompiledPricing, calculate_v5, compile_pricing, get_compiled_pricing
+from .data import load_data_from_frontend
+from .models import V5Input
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+_FLUSH_ROWS = 256
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+class BatchInputError(ValueError):
+    """Вход пакета не разобрать целиком (а не одна плохая строка)."""
+
+
+def max_rows() -> int:
+    return max(1, _env_int("AURORA_BATCH_MAX_ROWS", 100000))
+
+
+def _columns_to_rows(columns: Any) -> List[Dict[str, Any]]:
+    if not isinstance(columns, dict) or not columns:
+        raise BatchInputError("columns must be a non-empty object of equal-length arrays")
+    lengths = {len(v) for v in columns.values() if isinstance(v, list)}
+    if len(lengths) != 1 or any(not isinstance(v, list) for v in columns.values()):
+        raise BatchInputError("columns must be arrays of the same length")
+    (n,) = lengths
+    names = list(columns)
+    return [{name: columns[name][i] for name in names} for i in range(n)]
+
+
+def parse_batch(body: bytes, content_type: str) -> Tuple[List[Any], Optional[Dict[str, Any]]]:
+    """Разбирает тело запроса: (строки как dict, переопределение цен или None)."""
+    # application/x-ndjson и application/ndjson
+    if "ndjson" in (content_type or ""):
+        rows: List[Any] = []
+        pricing = None
+        for n, line in enumerate(body.decode("utf-8").splitlines()):
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise BatchInputError(f"line {n + 1}: {exc}") from exc
+            if not rows and pricing is None and isinstance(obj, dict) and "pricing" in obj and "segments" not in obj:
+                pricing = obj["pricing"]
+                continue
+            rows.append(obj)
+    else:
+        try:
+            payload = json.loads(body or b"null")
+        except json.JSONDecodeError as exc:
+            raise BatchInputError(str(exc)) from exc
+        if isinstance(payload, list):
+            rows, pricing = payload, None
+        elif isinstance(payload, dict) and "columns" in payload:
+            rows, pricing = _columns_to_rows(payload["columns"]), payload.get("pricing")
+        elif isinstance(payload, dict) and isinstance(payload.get("items"), list):
+            rows, pricing = payload["items"], payload.get("pricing")
+        else:
+            raise BatchInputError("expected an array of V5Input, {items: [...]}, {columns: {...}} or NDJSON")
+
+    if pricing is not None and not isinstance(pricing, dict):
+        raise BatchInputError("pricing must be an object")
+    if len(rows) > max_rows():
+        raise BatchInputError(f"too many rows: {len(rows)} > {max_rows()} (AURORA_BATCH_MAX_ROWS)")
+    return rows, pricing
+
+
+def _check_override(override: Dict[str, Any]) -> None:
+    """Форма переопределения цен: иначе compile_pricing падает на нём с 500."""
+    if "points_model" in override and not isinstance(override["points_model"], dict):
+        raise BatchInputError("pricing.points_model must be an object")
+    if "segments" in override:
+        segments = override["segments"]
+        if not isinstance(segments, dict):
+            raise BatchInputError("pricing.segments must be an object {segment: [packages]}")
+        for seg, pkgs in segments.items():
+            if not isinstance(pkgs, list) or not all(isinstance(p, dict) for p in pkgs):
+                raise BatchInputError(f"pricing.segments[{seg!r}] must be a list of objects")
+
+
+def resolve_pricing(override: Optional[Dict[str, Any]]) -> CompiledPricing:
+    """Текущие цены или текущие + переопределение (без сохранения)."""
+    if not override:
+        return get_compiled_pricing()
+    _check_override(override)
+    data = dict(load_data_from_frontend())
+    for key, value in override.items():
+        if key == "points_model":
+            data["points_model"] = {**(data.get("points_model") or {}), **value}
+        else:
+            data[key] = value
+    try:
+        return compile_pricing(data)
+    except (AttributeError, KeyError, TypeError, ValueError) as exc:
+        raise BatchInputError(f"pricing: cannot compile ({exc!r})") from exc
+
+
+def _summary(i: int, inp: V5Input, pricing: CompiledPricing, full: bool) -> Dict[str, Any]:
+    res = calculate_v5(inp, pricing)
+    if full:
+        return {"i": i, "ok": True, "result": res.model_dump()}
+    return {
+        "i": i,
+        "ok": True,
+        "package": res.package.name,
+        "points": res.calc.points,
+        "costs": res.costs.model_dump(),
+    }
+
+
+def iter_batch_results(rows: List[Any], pricing: CompiledPricing, full: bool = False) -> Iterator[bytes]:
+    """NDJSON-строки результатов, по одной на входную строку (в том же порядке).
+
+    Отдаём пачками по _FLUSH_ROWS строк: клиент видит результаты сразу,
+    но без отдельного чанка на каждую строку.
+    """
+    buf: List[bytes] = []
+    for i, row in enumerate(rows):
+        try:
+            inp = V5Input.model_validate(row)
+        except ValidationError as exc:
+            item = {"i": i, "ok": False, "error": exc.errors(include_url=False, include_context=False)}
+        else:
+            item = _summary(i, inp, pricing, full)
+        buf.append(json.dumps(item, ensure_ascii=False, default=str).encode("utf-8"))
+        if len(buf) >= _FLUSH_ROWS:
+            yield b"\n".join(buf) + b"\n"
+            buf = []
+    if buf:
+        yield b"\n".join(buf) + b"\n"
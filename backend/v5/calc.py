@@ -1,7 +1,12 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Tuple
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
 
+from ..metrics import record_span
 from .data import load_data_from_frontend
 from .models import (
     CalcBlock,
@@ -15,6 +20,13 @@ from .models import (
 
 CORE_PRICE_PER_POINT = 4950
 
+log = logging.getLogger(__name__)
+
+# Сегменты как битовая маска (см. _segment_mask).
+SEG_RETAIL = 1
+SEG_WHOLESALE = 2
+SEG_PRODUCER = 4
+
 def _points_to_rub(points: int, rub_per_point: int) -> int:
     """Переводим "баллы сложности" в рубли.
 
@@ -57,17 +69,25 @@ def _need_diagnostics(state: V5Input) -> bool:
     return False
 
 
-def _seg_flags(state: V5Input) -> Tuple[bool, bool, bool]:
-    """Какие сегменты выбрал пользователь."""
-    segs = state.segments or []
-    low = [s.lower() for s in segs]
-    is_retail = any('розниц' in s for s in low)
-    is_wholesale = any('опт' in s for s in low)
-    is_producer = any('производ' in s for s in low)
-    return is_retail, is_wholesale, is_producer
+def _segment_mask(seg: str) -> int:
+    """Один сегмент (название из UI) -> биты SEG_*."""
+    s = (seg or '').lower()
+    mask = 0
+    if 'розниц' in s:
+        mask |= SEG_RETAIL
+    if 'опт' in s:
+        mask |= SEG_WHOLESALE
+    if 'производ' in s:
+        mask |= SEG_PRODUCER
+    return mask
+
+
+def _seg_flags(mask: int) -> Tuple[bool, bool, bool]:
+    """Какие сегменты выбрал пользователь: (розница, опт, производитель)."""
+    return bool(mask & SEG_RETAIL), bool(mask & SEG_WHOLESALE), bool(mask & SEG_PRODUCER)
 
 
-def _calc_services_and_licenses(state: V5Input, data: Dict[str, Any]) -> Tuple[List[ServiceItem], List[LicenseItem], int, int, int]:
+def _calc_services_and_licenses(state: V5Input, cp: "CompiledPricing", mask: int) -> Tuple[List[ServiceItem], List[LicenseItem], int, int, int]:
     """Считаем "доп.услуги" (в баллах) и "лицензии" (в рублях).
 
     Возвращаем:
@@ -78,22 +98,20 @@ def _calc_services_and_licenses(state: V5Input, data: Dict[str, Any]) -> Tuple[L
       - lic_rub: сумма лицензий в рублях
 
     ВАЖНО ДЛЯ ПРАВОК:
-      - Сколько баллов даёт каждая опция — см. DATA.points_model в frontend/index.html
-      - rub_per_point тоже лежит в DATA
+      - Сколько баллов даёт каждая опция — см. points_model в frontend_shared/data/data.json
+      - rub_per_point тоже лежит там же
+      - Коэффициенты уже приведены к int в CompiledPricing (один раз на версию данных)
     """
-    pm = data['points_model']
-    rub_per_point = int(data['rub_per_point'])
-
     service_items: List[ServiceItem] = []
     lic_items: List[LicenseItem] = []
 
     def add_svc(label: str, pts: int) -> None:
         if pts > 0:
-            service_items.append(ServiceItem(label=label, pts=int(pts)))
+            service_items.append(ServiceItem.model_construct(label=label, pts=int(pts)))
 
     def add_lic(label: str, rub: int) -> None:
         if rub > 0:
-            lic_items.append(LicenseItem(label=label, rub=int(rub)))
+            lic_items.append(LicenseItem.model_construct(label=label, rub=int(rub)))
 
     # --- ККТ ---
     kkt_count = _kkt_count(state)
@@ -101,72 +119,138 @@ def _calc_services_and_licenses(state: V5Input, data: Dict[str, Any]) -> Tuple[L
     if state.kkt_rereg and extra_kkt > 0:
         add_svc(
             f"Доп.кассы: перерегистрация/подготовка ККТ (+{extra_kkt})",
-            extra_kkt * int(pm['kkt_rereg_points_per_kkt']),
+            extra_kkt * cp.kkt_rereg_points_per_kkt,
         )
     if state.needs_rr and extra_kkt > 0:
         add_svc(
             f"Доп.кассы: Разрешительный режим (РР) (+{extra_kkt})",
-            extra_kkt * int(pm['rr_points_per_kkt']),
+            extra_kkt * cp.rr_points_per_kkt,
         )
 
     # --- Юрлица ---
     extra_org = max(0, int(state.org_count) - 1)
     if extra_org > 0:
-        add_svc(f"Доп.юрлица (+{extra_org})", extra_org * int(pm['org_points_per_extra']))
+        add_svc(f"Доп.юрлица (+{extra_org})", extra_org * cp.org_points_per_extra)
 
     # --- Устройства (можно мешать сканеры и ТСД) ---
     scanners, tsd = _device_counts(state)
     extra_scanner = max(0, scanners - 1)
     if extra_scanner > 0:
-        add_svc(f"Доп.сканеры (+{extra_scanner})", extra_scanner * int(pm['scanner_setup_points_per_scanner']))
+        add_svc(f"Доп.сканеры (+{extra_scanner})", extra_scanner * cp.scanner_setup_points_per_scanner)
 
     if tsd > 0:
-        rub = tsd * int(pm['tsd_license_rub'])
+        rub = tsd * cp.tsd_license_rub
         if state.tsd_collective:
-            rub += tsd * int(pm['collective_tsd_license_rub'])
+            rub += tsd * cp.collective_tsd_license_rub
         add_lic(
             f"Клеверенс: лицензия ТСД ×{tsd}" + (" + коллективная работа" if state.tsd_collective else ""),
             rub,
         )
 
     # --- Сегменты и сценарии ---
-    is_retail, is_wholesale, is_producer = _seg_flags(state)
+    is_retail, is_wholesale, is_producer = _seg_flags(mask)
 
     if (not state.has_edo) and (is_wholesale or is_producer):
-        add_svc("Нет ЭДО (опт/производство)", int(pm['no_edo_wholesale_points']))
+        add_svc("Нет ЭДО (опт/производство)", cp.no_edo_wholesale_points)
     if state.needs_rework:
-        add_svc("Остатки/перемаркировка/вывод из оборота", int(pm['rework_points']))
+        add_svc("Остатки/перемаркировка/вывод из оборота", cp.rework_points)
     if state.needs_aggregation:
-        add_svc("Агрегация/КИТУ", int(pm['aggregation_points']))
+        add_svc("Агрегация/КИТУ", cp.aggregation_points)
     if state.big_volume:
-        add_svc("Большие объёмы/автоматизация", int(pm['big_volume_points']))
+        add_svc("Большие объёмы/автоматизация", cp.big_volume_points)
     if is_producer and state.producer_codes:
-        add_svc("Заказ кодов/нанесение", int(pm['producer_codes_points']))
+        add_svc("Заказ кодов/нанесение", cp.producer_codes_points)
     if state.custom_integration:
-        add_svc("Нестандарт/интеграции (маркер проекта)", int(pm['custom_project_marker_points']))
+        add_svc("Нестандарт/интеграции (маркер проекта)", cp.custom_project_marker_points)
 
     points = sum(x.pts for x in service_items)
-    rub = _points_to_rub(points, rub_per_point)
+    rub = _points_to_rub(points, cp.rub_per_point)
     lic_rub = sum(x.rub for x in lic_items)
     return service_items, lic_items, points, rub, lic_rub
 
 
-def _find_pkg(data: Dict[str, Any], seg: str, prefer_keywords: List[str]) -> Dict[str, Any] | None:
-    """Ищем пакет внутри DATA.segments[seg].
+# Что предпочитать для сегмента: (до порога баллов, начиная с порога).
+_PREFER_PRODUCER = (['Запуск', 'Старт', 'Оптим'], ['Премиум', 'Оптим', 'Запуск'])
+_PREFER_WHOLESALE = (['Приемка+Отгрузка', 'Старт', 'Оптим', 'Комбо', 'Приемка', 'Отгрузка'], ['Комбо', 'Оптим'])
+_PREFER_RETAIL = (['Старт', 'Оптим'], ['Оптим'])
+_PREFER_OTHER = (['Старт', 'Оптим', 'Комбо', 'Запуск'], ['Старт', 'Оптим', 'Комбо', 'Запуск'])
+
+_PREFER_KEYWORDS = frozenset(
+    kw.lower()
+    for lists in (_PREFER_PRODUCER, _PREFER_WHOLESALE, _PREFER_RETAIL, _PREFER_OTHER)
+    for prefer in lists
+    for kw in prefer
+    if kw
+)
+
+
+@dataclass(frozen=True)
+class _PackageIndex:
+    """Индекс пакетов: строится один раз на версию данных (в compile_pricing).
+
+    Каталоги дилеров — сотни пакетов на сегмент, поэтому названия приводим
+    к нижнему регистру и ключи core-пакетов вычисляем один раз, а не на
+    каждое ключевое слово / каждую комбинацию сегментов.
+    """
+
+    # сегмент -> ключевое слово (lower) -> первый пакет с ним в названии
+    by_keyword: Dict[str, Dict[str, Dict[str, Any]]]
+    # сегмент -> первый пакет (если по ключевым словам ничего не нашли)
+    first: Dict[str, Dict[str, Any]]
+    # segment_key -> первый core-пакет с этим ключом
+    core_by_key: Dict[str, Dict[str, Any]]
+    # (сегменты пакета, цена, пакет) — для выбора «ближайшего» комбо
+    core_ranked: Tuple[Tuple[FrozenSet[str], int, Dict[str, Any]], ...]
+
+
+def _build_package_index(data: Dict[str, Any], segments: Optional[Iterable[str]] = None) -> _PackageIndex:
+    """segments — проиндексировать только эти сегменты (None — все)."""
+    by_keyword: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    first: Dict[str, Dict[str, Any]] = {}
+    all_segments = data.get('segments') or {}
+    for seg in (all_segments if segments is None else segments):
+        pkgs = all_segments.get(seg) or []
+        if pkgs:
+            first[seg] = pkgs[0]
+        names = [(p.get('name') or '').lower() for p in pkgs]
+        found: Dict[str, Dict[str, Any]] = {}
+        for kw in _PREFER_KEYWORDS:
+            for p, name in zip(pkgs, names):
+                if kw in name:
+                    found[kw] = p
+                    break
+        by_keyword[seg] = found
+
+    core_by_key: Dict[str, Dict[str, Any]] = {}
+    core_ranked = []
+    for pkg in _get_core_packages(data):
+        key = _resolve_core_segment_key(pkg)
+        core_by_key.setdefault(key, pkg)
+        core_ranked.append((frozenset(_core_key_segments(key)), _core_pkg_price(pkg), pkg))
+
+    return _PackageIndex(
+        by_keyword=by_keyword,
+        first=first,
+        core_by_key=core_by_key,
+        core_ranked=tuple(core_ranked),
+    )
+
+
+def _find_pkg(index: _PackageIndex, seg: str, prefer_keywords: List[str]) -> Dict[str, Any] | None:
+    """Ищем пакет внутри DATA.segments[seg] (через индекс).
 
     prefer_keywords — список "что предпочитать" (например, сначала "Комбо").
     Если ничего не нашли по ключам — берём первый пакет.
     """
-    pkgs = (data.get('segments') or {}).get(seg) or []
-    low = lambda s: (s or '').lower()
+    found = index.by_keyword.get(seg) or {}
     for kw in prefer_keywords:
-        for p in pkgs:
-            if kw and (low(kw) in low(p.get('name'))):
-                return p
-    return pkgs[0] if pkgs else None
+        p = found.get((kw or '').lower())
+        if p is not None:
+            return p
+    return index.first.get(seg)
 
 
-def _choose_package_for_segment(data: Dict[str, Any], seg: str, points: int) -> Dict[str, Any] | None:
+def _choose_package_for_segment(index: _PackageIndex, seg: str, points: int) -> Dict[str, Any] | None:
     """Выбираем пакет для ОДНОГО сегмента.
 
     Сейчас логика простая: по названию пакета (prefer list) + по баллам.
@@ -175,21 +259,24 @@ def _choose_package_for_segment(data: Dict[str, Any], seg: str, points: int) ->
       - завести в DATA у пакетов поле min_points/max_points
       - и здесь фильтровать по ним.
     """
-    s = (seg or '').lower()
-    is_retail = 'розниц' in s
-    is_wholesale = 'опт' in s
-    is_producer = 'производ' in s
+    is_retail, is_wholesale, is_producer = _seg_flags(_segment_mask(seg))
+    high = points >= _segment_points_threshold(seg)
 
     if is_producer:
-        prefer = ['Премиум', 'Оптим', 'Запуск'] if points >= 8 else ['Запуск', 'Старт', 'Оптим']
+        prefer = _PREFER_PRODUCER[high]
     elif is_wholesale:
-        prefer = ['Комбо', 'Оптим'] if points >= 6 else ['Приемка+Отгрузка', 'Старт', 'Оптим', 'Комбо', 'Приемка', 'Отгрузка']
+        prefer = _PREFER_WHOLESALE[high]
     elif is_retail:
-        prefer = ['Оптим'] if points >= 6 else ['Старт', 'Оптим']
+        prefer = _PREFER_RETAIL[high]
     else:
-        prefer = ['Старт', 'Оптим', 'Комбо', 'Запуск']
+        prefer = _PREFER_OTHER[high]
+
+    return _find_pkg(index, seg, prefer)
 
-    return _find_pkg(data, seg, prefer)
+
+def _segment_points_threshold(seg: str) -> int:
+    """С какого числа баллов для сегмента предлагаем «старший» пакет."""
+    return 8 if _segment_mask(seg) & SEG_PRODUCER else 6
 
 
 def _get_core_packages(data: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -198,8 +285,8 @@ def _get_core_packages(data: Dict[str, Any]) -> List[Dict[str, Any]]:
     return pkgs if isinstance(pkgs, list) else []
 
 
-def _core_pkg_segments(pkg: Dict[str, Any]) -> List[str]:
-    key = str(_resolve_core_segment_key(pkg))
+def _core_key_segments(key: str) -> List[str]:
+    key = str(key)
     if key == "retail_only":
         return ["retail"]
     if key == "wholesale_only":
@@ -246,12 +333,11 @@ def _core_pkg_price(pkg: Dict[str, Any]) -> int:
     return total_points * CORE_PRICE_PER_POINT
 
 
-def _choose_core_package(data: Dict[str, Any], state: V5Input) -> Tuple[Dict[str, Any] | None, str]:
-    core_pkgs = _get_core_packages(data)
-    if not core_pkgs:
+def _choose_core_package(index: _PackageIndex, mask: int) -> Tuple[Dict[str, Any] | None, str]:
+    if not index.core_ranked:
         return None, ""
 
-    is_retail, is_wholesale, is_producer = _seg_flags(state)
+    is_retail, is_wholesale, is_producer = _seg_flags(mask)
     selected = set()
     if is_retail:
         selected.add("retail")
@@ -274,8 +360,7 @@ def _choose_core_package(data: Dict[str, Any], state: V5Input) -> Tuple[Dict[str
         exact_key = "producer_retail"
 
     if exact_key:
-        match = next((p for p in core_pkgs if _resolve_core_segment_key(p) == exact_key), None)
-        return match, ""
+        return index.core_by_key.get(exact_key), ""
 
     # Если комбо нестандартное, берём «ближайший» пакет:
     # максимум пересечения сегментов → больше сегментов → более дорогой.
@@ -283,11 +368,9 @@ def _choose_core_package(data: Dict[str, Any], state: V5Input) -> Tuple[Dict[str
     best_score = -1
     best_size = -1
     best_price = -1
-    for pkg in core_pkgs:
-        segs = _core_pkg_segments(pkg)
-        overlap = len([s for s in segs if s in selected])
+    for segs, price, pkg in index.core_ranked:
+        overlap = len(segs & selected)
         size = len(segs)
-        price = _core_pkg_price(pkg)
         if overlap > best_score or (overlap == best_score and size > best_size) or (overlap == best_score and size == best_size and price > best_price):
             best = pkg
             best_score = overlap
@@ -308,64 +391,312 @@ def _core_pkg_detail(pkg: Dict[str, Any]) -> str:
     return "\n".join(lines)
 
 
-def _choose_package(data: Dict[str, Any], state: V5Input, points: int) -> Tuple[Dict[str, Any] | None, str]:
-    """Выбираем "главный" пакет.
+@dataclass(frozen=True)
+class _ResolvedPackage:
+    """Пакет, уже приведённый к виду PackageBlock (цена посчитана)."""
+
+    base: int
+    block: Dict[str, Any]
+
+
+_NO_PACKAGE = _ResolvedPackage(base=0, block={'name': '—', 'price': 0, 'inc': '', 'who': '', 'detail': '', 'groups': []})
+
+
+def _resolve_package(pkg: Dict[str, Any]) -> _ResolvedPackage:
+    base = int(pkg.get('price_rub') or pkg.get('price') or 0)
+    if base == 0 and int(pkg.get("total_points") or 0) > 0:
+        base = int(pkg.get("total_points") or 0) * CORE_PRICE_PER_POINT
+
+    if pkg.get("groups"):
+        block = dict(
+            name=_normalize_core_display_name(str(pkg.get("title") or pkg.get("name") or '—')),
+            price=base,
+            inc='',
+            who='',
+            detail=_core_pkg_detail(pkg),
+            groups=pkg.get("groups") or [],
+        )
+    else:
+        block = dict(
+            name=str(pkg.get('name') or '—'),
+            price=base,
+            inc=str(pkg.get('inc') or ''),
+            who=str(pkg.get('who') or ''),
+            detail=str(pkg.get('detail') or ''),
+            groups=[],
+        )
+    return _ResolvedPackage(base=base, block=block)
+
+
+@dataclass(frozen=True)
+class _SegmentChoice:
+    """Пакет ОДНОГО сегмента: до порога баллов и начиная с порога."""
+
+    threshold: int
+    low: Optional[_ResolvedPackage]
+    high: Optional[_ResolvedPackage]
+    low_price: int
+    high_price: int
 
-    По твоему правилу (Вариант 2):
-      - если сегментов несколько, мы подбираем пакет для каждого сегмента
-      - и берём самый ДОРОГОЙ из найденных.
 
-    Почему так:
-      - сегменты могут быть выбраны вместе (например, розница + опт)
-      - а людям нужно видеть один пакет в рекомендации.
+@dataclass(frozen=True)
+class CompiledPricing:
+    """data.json + core_packages.json, «скомпилированные» под calculate_v5.
+
+    Собирается один раз на версию данных (см. get_compiled_pricing):
+      - коэффициенты points_model уже int;
+      - названия сегментов уже разложены в битовые маски SEG_*;
+      - основной пакет (core_packages) выбран заранее для всех 8 комбинаций
+        розница/опт/производитель;
+      - пакет каждого сегмента из data.segments выбран заранее для обеих
+        сторон порога баллов.
+    На запрос остаются только поиски в таблицах и линейные слагаемые
+    (кассы, юрлица, сканеры, ТСД).
     """
-    core_pkg, warning = _choose_core_package(data, state)
-    if core_pkg:
-        return core_pkg, warning
 
-    segs = state.segments or []
-    if not segs:
-        return None, ""
+    source: Dict[str, Any]
+
+    rub_per_point: int
+    diag_price_rub: int
+    support_rub: int
+
+    kkt_rereg_points_per_kkt: int
+    rr_points_per_kkt: int
+    org_points_per_extra: int
+    scanner_setup_points_per_scanner: int
+    tsd_license_rub: int
+    collective_tsd_license_rub: int
+    no_edo_wholesale_points: int
+    rework_points: int
+    aggregation_points: int
+    big_volume_points: int
+    producer_codes_points: int
+    custom_project_marker_points: int
+
+    segment_masks: Dict[str, int]
+    core_by_mask: Tuple[Tuple[Optional[_ResolvedPackage], str], ...]
+    segment_choices: Dict[str, _SegmentChoice]
+
+    def segments_mask(self, segments: List[str]) -> int:
+        mask = 0
+        for seg in segments or []:
+            m = self.segment_masks.get(seg)
+            mask |= _segment_mask(seg) if m is None else m
+        return mask
+
+    def choose_package(self, segments: List[str], mask: int, points: int) -> Tuple[_ResolvedPackage | None, str]:
+        """Выбираем "главный" пакет.
+
+        По твоему правилу (Вариант 2):
+          - если сегментов несколько, мы подбираем пакет для каждого сегмента
+          - и берём самый ДОРОГОЙ из найденных.
+
+        Почему так:
+          - сегменты могут быть выбраны вместе (например, розница + опт)
+          - а людям нужно видеть один пакет в рекомендации.
+
+        Сначала — пакет из core_packages.json (таблица по маске сегментов).
+        """
+        core_pkg, warning = self.core_by_mask[mask]
+        if core_pkg:
+            return core_pkg, warning
+
+        best: _ResolvedPackage | None = None
+        best_price = -1
+        for seg in segments or []:
+            choice = self.segment_choices.get(seg)
+            if choice is None:
+                continue
+            if points >= choice.threshold:
+                pkg, price = choice.high, choice.high_price
+            else:
+                pkg, price = choice.low, choice.low_price
+            # При равной цене остаётся первый по порядку сегмент.
+            if pkg is not None and price > best_price:
+                best, best_price = pkg, price
+        return best, ""
+
+
+def _changed_parts(paths: Iterable[Sequence[str]]) -> Tuple[bool, Optional[Set[str]]]:
+    """Что из пакетов задела правка: (core_packages, сегменты; None — все сегменты).
+
+    paths — пути JSON Patch (см. backend/json_patch.py) в документе data.
+    """
+    core = False
+    segments: Optional[Set[str]] = set()
+    for path in paths:
+        if not path:
+            return True, None
+        if path[0] == 'core_packages':
+            core = True
+        elif path[0] == 'segments':
+            if len(path) == 1:
+                segments = None
+            elif segments is not None:
+                segments.add(path[1])
+    return core, segments
+
+
+def compile_pricing(
+    data: Dict[str, Any],
+    previous: Optional[CompiledPricing] = None,
+    changed: Optional[Iterable[Sequence[str]]] = None,
+) -> CompiledPricing:
+    """Собирает CompiledPricing из словаря load_data_from_frontend().
+
+    previous + changed — пересобрать частично: data получен из previous.source
+    правками по путям changed (PATCH из админки). Тогда core-пакеты и пакеты
+    сегментов, которых правка не касалась, берутся из previous как есть —
+    правка одной цены не перебирает весь каталог. Коэффициенты (points_model
+    и т.п.) дешёвые и считаются всегда.
+    """
+    pm = data['points_model']
+    all_segments = list(data.get('segments') or {})
 
-    candidates: List[Dict[str, Any]] = []
-    for seg in segs:
-        pkg = _choose_package_for_segment(data, seg, points)
-        if pkg:
-            candidates.append(pkg)
+    if previous is None or changed is None:
+        core_changed, seg_changed = True, None
+    else:
+        core_changed, seg_changed = _changed_parts(changed)
+    to_compile = all_segments if seg_changed is None else [seg for seg in all_segments if seg in seg_changed]
+    index = _build_package_index(data, to_compile)
+
+    resolved: Dict[int, _ResolvedPackage] = {}
+
+    def resolve(pkg: Dict[str, Any] | None) -> _ResolvedPackage | None:
+        if not pkg:
+            return None
+        key = id(pkg)
+        if key not in resolved:
+            resolved[key] = _resolve_package(pkg)
+        return resolved[key]
+
+    if core_changed or previous is None:
+        core_by_mask = []
+        for mask in range((SEG_RETAIL | SEG_WHOLESALE | SEG_PRODUCER) + 1):
+            pkg, warning = _choose_core_package(index, mask)
+            core_by_mask.append((resolve(pkg), warning))
+    else:
+        core_by_mask = list(previous.core_by_mask)
+
+    segment_choices: Dict[str, _SegmentChoice] = {}
+    for seg in all_segments:
+        if seg_changed is not None and seg not in seg_changed and previous is not None and seg in previous.segment_choices:
+            segment_choices[seg] = previous.segment_choices[seg]
+            continue
+        threshold = _segment_points_threshold(seg)
+        low = _choose_package_for_segment(index, seg, 0)
+        high = _choose_package_for_segment(index, seg, threshold)
+        segment_choices[seg] = _SegmentChoice(
+            threshold=threshold,
+            low=resolve(low),
+            high=resolve(high),
+            low_price=int((low or {}).get('price') or 0),
+            high_price=int((high or {}).get('price') or 0),
+        )
 
-    if not candidates:
-        return None, ""
+    return CompiledPricing(
+        source=data,
+        rub_per_point=int(data['rub_per_point']),
+        diag_price_rub=int(data.get('diag_price_rub') or 0),
+        support_rub=_points_to_rub(int(data.get('support_points') or 0), int(data.get('rub_per_point') or 0)),
+        kkt_rereg_points_per_kkt=int(pm['kkt_rereg_points_per_kkt']),
+        rr_points_per_kkt=int(pm['rr_points_per_kkt']),
+        org_points_per_extra=int(pm['org_points_per_extra']),
+        scanner_setup_points_per_scanner=int(pm['scanner_setup_points_per_scanner']),
+        tsd_license_rub=int(pm['tsd_license_rub']),
+        collective_tsd_license_rub=int(pm['collective_tsd_license_rub']),
+        no_edo_wholesale_points=int(pm['no_edo_wholesale_points']),
+        rework_points=int(pm['rework_points']),
+        aggregation_points=int(pm['aggregation_points']),
+        big_volume_points=int(pm['big_volume_points']),
+        producer_codes_points=int(pm['producer_codes_points']),
+        custom_project_marker_points=int(pm['custom_project_marker_points']),
+        segment_masks={seg: _segment_mask(seg) for seg in all_segments},
+        core_by_mask=tuple(core_by_mask),
+        segment_choices=segment_choices,
+    )
 
-    # max by price
-    candidates.sort(key=lambda p: int(p.get('price') or 0), reverse=True)
-    return candidates[0], ""
 
+_compiled: Optional[CompiledPricing] = None
+_compiled_lock = threading.Lock()
 
-def calculate_v5(state: V5Input) -> V5Result:
+
+def get_compiled_pricing() -> CompiledPricing:
+    """CompiledPricing для текущего load_data_from_frontend().
+
+    Пересобирается, как только сбрасывается кеш данных (админка, пул Word):
+    сравниваем, что собран он из того же самого словаря.
+    """
+    global _compiled
+    data = load_data_from_frontend()
+    compiled = _compiled
+    if compiled is not None and compiled.source is data:
+        return compiled
+    with _compiled_lock:
+        if _compiled is None or _compiled.source is not data:
+            _compiled = compile_pricing(data)
+        return _compiled
+
+
+def rebuild_compiled_pricing(
+    base: Optional[Dict[str, Any]] = None,
+    changed: Optional[Iterable[Sequence[str]]] = None,
+) -> None:
+    """Сразу пересобрать цены (после сохранения в админке).
+
+    base + changed — данные получены из base правками по путям changed
+    (PATCH): если текущие цены собраны именно из base, пересобираем только
+    задетое (см. compile_pricing). Иначе — как обычно, целиком.
+
+    Если новые данные не собираются — только пишем в лог: ошибка всплывёт
+    на ближайшем расчёте, как и раньше.
+    """
+    global _compiled
+    try:
+        if base is None or changed is None:
+            get_compiled_pricing()
+            return
+        data = load_data_from_frontend()
+        with _compiled_lock:
+            previous = _compiled
+            if previous is not None and previous.source is data:
+                return
+            if previous is None or previous.source is not base:
+                previous, changed = None, None
+            _compiled = compile_pricing(data, previous, changed)
+    except Exception:
+        log.exception("calc: не удалось собрать цены из новых данных")
+
+
+def calculate_v5(state: V5Input, pricing: Optional[CompiledPricing] = None) -> V5Result:
     """Основной расчёт для красивого UI (v7).
 
     Как устроено по шагам (по‑простому):
-      1) Берём DATA из frontend/index.html (чтобы всё совпадало с UI)
+      1) Берём DATA из frontend_shared/data (уже «скомпилированные», см. CompiledPricing)
       2) Считаем доп.услуги (баллы -> рубли) и лицензии (рубли)
       3) Выбираем пакет по сегментам (самый дорогой)
       4) Складываем итог
+
+    pricing — другие (например, ещё не сохранённые) цены, см. batch.py.
+    По умолчанию — текущие данные.
     """
 
-    data = load_data_from_frontend()
+    started = time.perf_counter()
+    cp = pricing or get_compiled_pricing()
+    loaded = time.perf_counter()
     prelim = _need_diagnostics(state)
     kkt_confirmed = _kkt_count(state) > 0
 
-    service_items, lic_items, pts, svc_rub, lic_rub = _calc_services_and_licenses(state, data)
-    pkg, warning = _choose_package(data, state, pts)
+    mask = cp.segments_mask(state.segments)
+    service_items, lic_items, pts, svc_rub, lic_rub = _calc_services_and_licenses(state, cp, mask)
+    pkg, warning = cp.choose_package(state.segments, mask, pts)
     if not pkg:
-        pkg = {'name': '—', 'price': 0, 'inc': '', 'who': '', 'detail': ''}
+        pkg = _NO_PACKAGE
         warning = ""
 
-    base = int(pkg.get('price_rub') or pkg.get('price') or 0)
-    if base == 0 and int(pkg.get("total_points") or 0) > 0:
-        base = int(pkg.get("total_points") or 0) * CORE_PRICE_PER_POINT
-    diag = int(data.get('diag_price_rub') or 0) if prelim else 0
-    support_rub = _points_to_rub(int(data.get('support_points') or 0), int(data.get('rub_per_point') or 0)) if state.support else 0
+    base = pkg.base
+    diag = cp.diag_price_rub if prelim else 0
+    support_rub = cp.support_rub if state.support else 0
     total = base + diag + support_rub + svc_rub + lic_rub
 
     hint = 'Пакет и сумма рассчитаны по чек-листу.'
@@ -374,36 +705,22 @@ def calculate_v5(state: V5Input) -> V5Result:
     if state.custom_integration:
         hint += ' (Включён маркер проекта: возможны доп. работы/интеграции.)'
 
-    if pkg.get("groups"):
-        pkg_block = PackageBlock(
-            name=_normalize_core_display_name(str(pkg.get("title") or pkg.get("name") or '—')),
-            price=base,
-            inc='',
-            who='',
-            detail=_core_pkg_detail(pkg),
-            groups=pkg.get("groups") or [],
-        )
-    else:
-        pkg_block = PackageBlock(
-            name=str(pkg.get('name') or '—'),
-            price=base,
-            inc=str(pkg.get('inc') or ''),
-            who=str(pkg.get('who') or ''),
-            detail=str(pkg.get('detail') or ''),
-            groups=[],
-        )
+    # Все значения уже приведены к нужным типам (int/str, см. _resolve_package),
+    # поэтому собираем модели без повторной валидации: результат строится
+    # один раз и дальше только сериализуется.
+    pkg_block = PackageBlock.model_construct(**pkg.block)
 
-    return V5Result(
+    result = V5Result.model_construct(
         prelim=prelim,
         package=pkg_block,
-        calc=CalcBlock(
+        calc=CalcBlock.model_construct(
             points=pts,
             rub=svc_rub,
             licRub=lic_rub,
             serviceItems=service_items,
             licItems=lic_items,
         ),
-        costs=CostsBlock(
+        costs=CostsBlock.model_construct(
             base_rub=base,
             diag_rub=diag,
             support_rub=support_rub,
@@ -414,3 +731,8 @@ def calculate_v5(state: V5Input) -> V5Result:
         hint=hint,
         kkt_confirmed=kkt_confirmed,
     )
+    # Этапы для /metrics и Server-Timing (backend/metrics.py).
+    finished = time.perf_counter()
+    record_span("calc.data", loaded - started)
+    record_span("calc.compute", finished - loaded)
+    return result
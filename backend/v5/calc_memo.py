@@ -0,0 +1,136 @@
+"""backend/v5/calc_memo.py
+
+ПАМЯТЬ РАСЧЁТОВ /api/v5/calculate (LRU по «ценовым» полям)
+
+ЗАЧЕМ
+  UI шлёт весь state на каждую правку — в том числе на каждую букву в
+  контактах. Цена от контактов, комментария к продукции и названий касс
+  не зависит, а пересчитывать одно и то же незачем.
+
+КЛЮЧ
+  - версия данных цен (load_data_version);
+  - сегменты (в исходном порядке — от него зависит выбор при равной цене);
+  - число касс, число сканеров и ТСД;
+  - число юрлиц и все галочки из _PRICING_FLAGS.
+  Добавили в расчёт новое поле V5Input — добавьте его и в _pricing_key,
+  иначе память будет отдавать старый результат.
+
+ВАЖНО
+  Возвращается один и тот же объект V5Result на все попадания — его нельзя
+  менять после calculate_v5_memo (эндпоинт только сериализует его).
+
+НАСТРОЙКА
+  AURORA_CALC_MEMO_ITEMS — сколько результатов помнить (4096; 0 = выключено).
+
+Админка при сохранении цен зовёт clear() (см. api_routes._pricing_changed).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from .calc import _device_counts, _kkt_count, calculate_v5
+from .data import load_data_version
+from .models import V5Input, V5Result
+
+_PRICING_FLAGS = (
+    "uses_kkt",
+    "kkt_rereg",
+    "needs_rr",
+    "tsd_collective",
+    "multi_orgs",
+    "has_edo",
+    "needs_rework",
+    "needs_aggregation",
+    "big_volume",
+    "producer_codes",
+    "custom_integration",
+    "support",
+)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _pricing_key(state: V5Input) -> Tuple[Hashable, ...]:
+    return (
+        load_data_version(),
+        tuple(state.segments or ()),
+        _kkt_count(state),
+        _device_counts(state),
+        int(state.org_count),
+        tuple(bool(getattr(state, name)) for name in _PRICING_FLAGS),
+    )
+
+
+class CalcMemo:
+    def __init__(self, max_items: int):
+        self.max_items = max(0, max_items)
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[Tuple[Hashable, ...], V5Result]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    @classmethod
+    def from_env(cls) -> "CalcMemo":
+        return cls(max_items=_env_int("AURORA_CALC_MEMO_ITEMS", 4096))
+
+    def calculate(self, state: V5Input) -> V5Result:
+        if self.max_items == 0:
+            return calculate_v5(state)
+
+        key = _pricing_key(state)
+        with self._lock:
+            res = self._items.get(key)
+            if res is not None:
+                self._items.move_to_end(key)
+                self._hits += 1
+                return res
+            self._misses += 1
+
+        res = calculate_v5(state)
+        with self._lock:
+            self._items[key] = res
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return res
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "enabled": self.max_items > 0,
+                "items": len(self._items),
+                "max_items": self.max_items,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / total, 3) if total else 0.0,
+            }
+
+
+_memo: Optional[CalcMemo] = None
+_memo_lock = threading.Lock()
+
+
+def get_calc_memo() -> CalcMemo:
+    global _memo
+    with _memo_lock:
+        if _memo is None:
+            _memo = CalcMemo.from_env()
+        return _memo
+
+
+def calculate_v5_memo(state: V5Input) -> V5Result:
+    """calculate_v5 с памятью по ценовым полям (для /api/v5/calculate)."""
+    return get_calc_memo().calculate(state)
@@ -1,12 +1,257 @@
+"""backend/v5/data.py
+
+ДАННЫЕ ЦЕН И МАТРИЦЫ УСЛУГ (снимки с горячей перезагрузкой)
+
+Источник правды — файлы в frontend_shared/data:
+  data.json              — цены, баллы, пакеты по сегментам (DATA для UI);
+  core_packages.json     — основные пакеты (кладём в data["core_packages"]);
+  manager_matrix_v5.json — матрица услуг менеджерского UI.
+
+ЗАЧЕМ СНИМКИ
+  Раньше это были lru_cache(maxsize=1): админка сбрасывала кеш только в
+  том процессе uvicorn, который обработал PUT, а матрица услуг не
+  сбрасывалась никогда. С несколькими воркерами остальные процессы
+  продолжали считать по старым ценам.
+
+КАК УСТРОЕНО
+  - DataSnapshot — неизменяемый снимок всех трёх файлов + version
+    (sha256 содержимого). Потребители берут его целиком, поэтому цены и
+    матрица внутри одного запроса всегда из одной версии.
+  - DataSnapshotManager.current() не чаще раза в AURORA_DATA_CHECK_INTERVAL
+    секунд смотрит stat() файлов (mtime/размер/inode). Поменялись — читает
+    заново и атомарно подменяет ссылку на снимок. Так КАЖДЫЙ процесс видит
+    новые данные не позже, чем через интервал проверки.
+  - Если содержимое по факту то же (файл «потрогали») — остаётся старый
+    объект снимка, и зависящие от него кеши не пересобираются.
+  - Если новый файл не читается (битый JSON после ручной правки) — пишем в
+    лог и продолжаем работать на предыдущем снимке.
+  - refresh() — проверить прямо сейчас.
+  - install() — админка сама записала файл (PATCH): новый снимок собирается
+    из уже разобранного документа, без повторного чтения и json.loads всех
+    файлов. Остальные воркеры перечитают файл по stat(), как обычно.
+
+НАСТРОЙКА
+  AURORA_DATA_CHECK_INTERVAL — как часто проверять файлы, секунд (1.0;
+                               0 = на каждом обращении).
+"""
+
 from __future__ import annotations
 
+import hashlib
 import json
-from functools import lru_cache
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "frontend_shared" / "data"  # .../backend/v5 -> project root
+
+_DATA_FILE = "data.json"
+_CORE_FILE = "core_packages.json"
+_MATRIX_FILE = "manager_matrix_v5.json"
+_FILES = (_DATA_FILE, _CORE_FILE, _MATRIX_FILE)
+
+_EMPTY_DIGEST = hashlib.sha256(b"").hexdigest()
+
+# (st_mtime_ns, st_size, st_ino) по каждому файлу; None — файла нет.
+_Signature = Tuple[Optional[Tuple[int, int, int]], ...]
+
+
+@dataclass(frozen=True)
+class DataSnapshot:
+    version: str
+    data: Dict[str, Any]
+    matrix: Optional[Dict[str, Any]]
+    signature: _Signature
+    loaded_at: float
+    # sha256 каждого файла (в порядке _FILES); version считается из них.
+    digests: Tuple[str, ...] = ()
+
+    def digest(self, name: str) -> str:
+        """sha256 содержимого файла name ("" — снимок собран без хешей)."""
+        return self.digests[_FILES.index(name)] if self.digests else ""
+
+    def document(self, name: str) -> Any:
+        """Содержимое одного файла (как в нём лежит; не менять на месте)."""
+        core_on_disk = self.digests[1] != _EMPTY_DIGEST
+        if name == _DATA_FILE:
+            if core_on_disk:
+                return {k: v for k, v in self.data.items() if k != "core_packages"}
+            return self.data
+        if name == _CORE_FILE:
+            return self.data.get("core_packages") if core_on_disk else None
+        return self.matrix
+
+
+def _signature(data_dir: Path) -> _Signature:
+    sig = []
+    for name in _FILES:
+        try:
+            st = (data_dir / name).stat()
+        except FileNotFoundError:
+            sig.append(None)
+            continue
+        sig.append((st.st_mtime_ns, st.st_size, st.st_ino))
+    return tuple(sig)
+
+
+def _version(digests: Tuple[str, ...]) -> str:
+    h = hashlib.sha256()
+    for name, digest in zip(_FILES, digests):
+        h.update(name.encode("utf-8"))
+        h.update(digest.encode("ascii"))
+    return h.hexdigest()
+
+
+def _read_snapshot(data_dir: Path, signature: _Signature) -> DataSnapshot:
+    data_json = data_dir / _DATA_FILE
+    if not data_json.exists():
+        raise RuntimeError(f"Не найден файл данных: {data_json}")
+
+    raw: Dict[str, bytes] = {}
+    for name in _FILES:
+        path = data_dir / name
+        raw[name] = path.read_bytes() if path.exists() else b""
+
+    digests = tuple(hashlib.sha256(raw[name]).hexdigest() for name in _FILES)
+    data = json.loads(raw[_DATA_FILE].decode("utf-8"))
+    if raw[_CORE_FILE]:
+        data["core_packages"] = json.loads(raw[_CORE_FILE].decode("utf-8"))
+    matrix = json.loads(raw[_MATRIX_FILE].decode("utf-8")) if raw[_MATRIX_FILE] else None
+    return DataSnapshot(
+        version=_version(digests),
+        data=data,
+        matrix=matrix,
+        signature=signature,
+        loaded_at=time.time(),
+        digests=digests,
+    )
+
+
+class DataSnapshotManager:
+    def __init__(self, data_dir: Path, check_interval: float):
+        self.data_dir = data_dir
+        self.check_interval = max(0.0, check_interval)
+        self._lock = threading.Lock()
+        self._snapshot: Optional[DataSnapshot] = None
+        self._next_check = 0.0
+        self._reloads = 0
+        self._last_error = ""
+
+    @classmethod
+    def from_env(cls) -> "DataSnapshotManager":
+        try:
+            interval = float(os.getenv("AURORA_DATA_CHECK_INTERVAL", "") or 1.0)
+        except ValueError:
+            interval = 1.0
+        return cls(DATA_DIR, interval)
+
+    def current(self) -> DataSnapshot:
+        snap = self._snapshot
+        if snap is not None and time.monotonic() < self._next_check:
+            return snap
+        return self.refresh()
+
+    def refresh(self, force: bool = False) -> DataSnapshot:
+        """Сверить файлы прямо сейчас и при изменении перечитать.
+
+        force=True — перечитать, даже если stat() не изменился (файл заменили
+        в ту же секунду и того же размера).
+        """
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            sig = _signature(self.data_dir)
+            old = self._snapshot
+            if old is not None and old.signature == sig and not force:
+                return old
+            try:
+                new = _read_snapshot(self.data_dir, sig)
+            except (OSError, ValueError, RuntimeError) as exc:
+                if old is None:
+                    raise
+                self._last_error = f"{type(exc).__name__}: {exc}"
+                log.error("data: не удалось перечитать данные, работаем на версии %s: %s", old.version[:12], exc)
+                return old
+            if old is not None and old.version == new.version:
+                # Файлы «потрогали», но содержимое то же — объект снимка не меняем.
+                new = DataSnapshot(old.version, old.data, old.matrix, sig, old.loaded_at, old.digests)
+            else:
+                self._reloads += 1
+                self._last_error = ""
+                if old is not None:
+                    log.info("data: новая версия данных %s (была %s)", new.version[:12], old.version[:12])
+            self._snapshot = new
+            return new
+
+    def install(self, name: str, raw: bytes, parsed: Dict[str, Any], base: DataSnapshot) -> DataSnapshot:
+        """Файл name только что записан этим процессом: raw — его байты, parsed — они же разобранные.
+
+        base — снимок, от которого считали правку. Если с тех пор поменялось
+        что-то ещё (другой файл, другой воркер) — обычный refresh().
+        """
+        with self._lock:
+            old = self._snapshot
+            sig = _signature(self.data_dir)
+            pos = _FILES.index(name)
+            others_same = all(a == b for i, (a, b) in enumerate(zip(sig, base.signature)) if i != pos)
+            if old is not base or not others_same:
+                stale = True
+            else:
+                stale = False
+                digests = list(old.digests)
+                digests[pos] = hashlib.sha256(raw).hexdigest()
+                if name == _DATA_FILE:
+                    data = dict(parsed)
+                    if digests[1] != _EMPTY_DIGEST:
+                        data["core_packages"] = old.data["core_packages"]
+                    matrix = old.matrix
+                elif name == _CORE_FILE:
+                    data = dict(old.data)
+                    data["core_packages"] = parsed
+                    matrix = old.matrix
+                else:
+                    data, matrix = old.data, parsed
+                version = _version(tuple(digests))
+                if version == old.version:
+                    new = DataSnapshot(old.version, old.data, old.matrix, sig, old.loaded_at, old.digests)
+                else:
+                    new = DataSnapshot(version, data, matrix, sig, time.time(), tuple(digests))
+                    self._reloads += 1
+                    log.info("data: новая версия данных %s (была %s)", new.version[:12], old.version[:12])
+                self._last_error = ""
+                self._snapshot = new
+                self._next_check = time.monotonic() + self.check_interval
+        return self.refresh() if stale else new
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self.current()
+        return {
+            "version": snap.version,
+            "loaded_at": snap.loaded_at,
+            "pid": os.getpid(),
+            "check_interval_s": self.check_interval,
+            "reloads": self._reloads,
+            "last_error": self._last_error,
+        }
+
+
+_manager: Optional[DataSnapshotManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_data_snapshots() -> DataSnapshotManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = DataSnapshotManager.from_env()
+        return _manager
 
 
-@lru_cache(maxsize=1)
 def load_data_from_frontend() -> Dict[str, Any]:
     """Берём DATA из фронта, чтобы бэкенд и UI считали одинаково.
 
@@ -15,16 +260,16 @@ def load_data_from_frontend() -> Dict[str, Any]:
     Почему так:
       - UI теперь разбит на несколько файлов и DATA больше не лежит в HTML
       - JSON удобно править без риска сломать разметку
+
+    Возвращается словарь из текущего снимка — его нельзя менять на месте.
     """
+    return get_data_snapshots().current().data
 
-    base_dir = Path(__file__).resolve().parents[2]  # .../backend/v5 -> project root
-    data_dir = base_dir / "frontend_shared" / "data"
-    data_json = data_dir / "data.json"
-    if not data_json.exists():
-        raise RuntimeError(f"Не найден файл данных: {data_json}")
 
-    data = json.loads(data_json.read_text(encoding="utf-8"))
-    core_json = data_dir / "core_packages.json"
-    if core_json.exists():
-        data["core_packages"] = json.loads(core_json.read_text(encoding="utf-8"))
-    return data
+def load_data_version() -> str:
+    """Версия данных: sha256 от data.json + core_packages.json + матрицы услуг.
+
+    Нужна как часть ключей кешей (готовые Word, память расчётов и т.п.):
+    поменяли цены — поменялась версия — старые записи кеша больше не совпадут.
+    """
+    return get_data_snapshots().current().version
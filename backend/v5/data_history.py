@@ -0,0 +1,258 @@
+"""backend/v5/data_history.py
+
+ИСТОРИЯ ПРАВОК ЦЕН ИЗ АДМИНКИ (хранилище по хешу содержимого)
+
+ЗАЧЕМ
+  Раньше каждое сохранение копировало data.json целиком в _backups/, потом
+  перебирало и сортировало по mtime всю папку и удаляло всё сверх 20 копий:
+  сохранение дорожало с ростом папки, а история дальше 20 правок терялась.
+
+КАК УСТРОЕНО
+  - objects/<2 символа>/<sha256>.json.gz — содержимое файла, сжатое gzip.
+    Имя — sha256 несжатых байт (тот же хеш, что в DataSnapshot.digests),
+    поэтому одинаковое содержимое хранится один раз (откат туда-обратно,
+    сохранение без изменений).
+  - index.jsonl — журнал, строка на сохранение: время, файл, хеш,
+    parent (хеш того, что лежало до записи), IP, действие (put / patch /
+    restore / initial). Только дописывается: строка короткая и пишется
+    одним write() в режиме append, так что воркеры uvicorn не мешают
+    друг другу.
+  - Сохранение = сжать новый файл + дописать строку: не зависит от того,
+    сколько истории накопилось.
+  - Содержимое «до» сохраняется, только если его ещё нет в хранилище
+    (первое сохранение после включения истории / ручная правка файла).
+  - Запись идёт под межпроцессной блокировкой lock() (файл .lock в папке
+    истории, см. file_lock.py): API держит её на всё сохранение — проверка
+    версии, запись файла данных, record().
+  - Ретеншн: не чаще раза в час записи старше AURORA_DATA_HISTORY_KEEP_DAYS
+    убираются из журнала (последние _KEEP_LAST версий каждого файла
+    остаются всегда), объекты, на которые больше никто не ссылается,
+    удаляются.
+
+НАСТРОЙКА
+  AURORA_DATA_HISTORY_DIR       — папка хранилища (<проект>/history).
+  AURORA_DATA_HISTORY_KEEP_DAYS — сколько дней хранить (365; 0 = всегда).
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Set
+
+from ..file_lock import file_lock
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DIR = Path(__file__).resolve().parents[2] / "history"
+
+_KEEP_LAST = 20
+_COMPACT_EVERY_S = 3600.0
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def content_hash(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _valid_hash(value: str) -> bool:
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+class DataHistory:
+    def __init__(self, root: Path, keep_days: int):
+        self.root = root
+        self.keep_days = max(0, keep_days)
+        self._lock = threading.Lock()
+        self._next_compact = 0.0
+        self._recorded = 0
+        self._removed = 0
+
+    @classmethod
+    def from_env(cls) -> "DataHistory":
+        return cls(
+            root=Path(os.getenv("AURORA_DATA_HISTORY_DIR") or DEFAULT_DIR),
+            keep_days=_env_int("AURORA_DATA_HISTORY_KEEP_DAYS", 365),
+        )
+
+    @property
+    def index_path(self) -> Path:
+        return self.root / "index.jsonl"
+
+    def lock(self) -> ContextManager[None]:
+        """Межпроцессная блокировка сохранений (record() и compact() зовутся под ней)."""
+        return file_lock(self.root / ".lock")
+
+    # --- объекты ---
+
+    def _object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / f"{digest}.json.gz"
+
+    def has(self, digest: str) -> bool:
+        return _valid_hash(digest) and self._object_path(digest).exists()
+
+    def put(self, raw: bytes) -> str:
+        """Положить содержимое (если его ещё нет) и вернуть его хеш."""
+        digest = content_hash(raw)
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+            tmp.write_bytes(gzip.compress(raw, compresslevel=6, mtime=0))
+            os.replace(tmp, path)
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        if not _valid_hash(digest):
+            return None
+        try:
+            return gzip.decompress(self._object_path(digest).read_bytes())
+        except FileNotFoundError:
+            return None
+
+    # --- журнал ---
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        line = (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def record(
+        self,
+        name: str,
+        raw: bytes,
+        parent: Optional[str],
+        ip: str,
+        action: str,
+        read_parent: Optional[Callable[[], Optional[bytes]]] = None,
+    ) -> Dict[str, Any]:
+        """Записать новое содержимое файла name (после успешного сохранения).
+
+        parent — хеш того, что лежало в файле до записи. Если такого
+        содержимого в хранилище ещё нет, read_parent() его отдаёт, и оно
+        попадает в журнал как "initial".
+        """
+        now = time.time()
+        if parent and read_parent is not None and not self.has(parent):
+            before = read_parent()
+            if before is not None:
+                parent = self.put(before)
+                self._append({"ts": now, "file": name, "hash": parent, "parent": None,
+                              "ip": "", "action": "initial", "size": len(before)})
+        entry = {"ts": now, "file": name, "hash": self.put(raw), "parent": parent,
+                 "ip": ip, "action": action, "size": len(raw)}
+        self._append(entry)
+        with self._lock:
+            self._recorded += 1
+            compact = now >= self._next_compact
+            if compact:
+                self._next_compact = now + _COMPACT_EVERY_S
+        if compact:
+            try:
+                self.compact(now)
+            except OSError:
+                log.exception("data_history: не удалось применить ретеншн")
+        return entry
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Весь журнал, от старых к новым (битые строки пропускаем)."""
+        try:
+            raw = self.index_path.read_bytes()
+        except FileNotFoundError:
+            return []
+        out: List[Dict[str, Any]] = []
+        for line in raw.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and entry.get("hash"):
+                out.append(entry)
+        return out
+
+    def history(self, name: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Последние записи (новые сверху), по одному файлу или по всем."""
+        items = [e for e in self.entries() if name is None or e.get("file") == name]
+        return items[::-1][:max(0, limit)]
+
+    def find(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Последняя запись журнала с этим содержимым."""
+        for entry in reversed(self.entries()):
+            if entry.get("hash") == digest:
+                return entry
+        return None
+
+    # --- ретеншн ---
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """Убрать из журнала записи старше keep_days и осиротевшие объекты. Возвращает число удалённых объектов."""
+        if not self.keep_days:
+            return 0
+        now = time.time() if now is None else now
+        cutoff = now - self.keep_days * 86400
+        with self._lock:
+            entries = self.entries()
+            per_file: Dict[str, int] = {}
+            kept: List[Dict[str, Any]] = []
+            for entry in reversed(entries):
+                name = str(entry.get("file") or "")
+                per_file[name] = per_file.get(name, 0) + 1
+                if per_file[name] <= _KEEP_LAST or float(entry.get("ts") or 0) >= cutoff:
+                    kept.append(entry)
+            if len(kept) == len(entries):
+                return 0
+            kept.reverse()
+            tmp = self.index_path.with_name(f"index.{uuid.uuid4().hex}.tmp")
+            tmp.write_text("".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n" for e in kept),
+                           encoding="utf-8")
+            os.replace(tmp, self.index_path)
+
+            referenced: Set[str] = {str(e.get("hash")) for e in kept}
+            removed = 0
+            for path in (self.root / "objects").glob("*/*.json.gz"):
+                if path.name[:-len(".json.gz")] not in referenced:
+                    try:
+                        path.unlink()
+                        removed += 1
+                    except OSError:
+                        pass
+            self._removed += removed
+        log.info("data_history: ретеншн убрал %d записей журнала и %d объектов", len(entries) - len(kept), removed)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "dir": str(self.root),
+            "keep_days": self.keep_days,
+            "recorded": self._recorded,
+            "objects_removed": self._removed,
+        }
+
+
+_history: Optional[DataHistory] = None
+_history_lock = threading.Lock()
+
+
+def get_data_history() -> DataHistory:
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = DataHistory.from_env()
+        return _history
@@ -0,0 +1,252 @@
+"""backend/v5/docx_cache.py
+
+КЕШ ГОТОВЫХ WORD-ДОКУМЕНТОВ (по содержимому)
+
+ЗАЧЕМ
+  Менеджеры жмут «Скачать» по нескольку раз на одном и том же чек-листе,
+  а при нестабильной локалке браузер повторяет запрос. Каждый раз заново
+  собирать DOCX незачем — результат полностью определяется входом.
+
+КЛЮЧ (sha256)
+  - канонический JSON V5Input (sort_keys, без пробелов);
+  - версия данных (load_data_version: data.json, core_packages.json, матрица);
+  - sha256 файла lt_template.docx (docx_template: сырые байты, без
+    python-docx — шаблон разбирают только процессы пула Word);
+  - дата документа (render_docx ставит её в шапку «Лист Требований № 1 от ...»).
+  Ключ же отдаётся как ETag.
+
+  Версию данных вызывающий берёт один раз и передаёт и в ключ, и в пул:
+  у процесса-воркера свой снимок данных, и если он собрал документ на
+  другой версии (файлы поменялись между проверками), в кеш под этим
+  ключом такой документ не кладём.
+
+УРОВНИ
+  1) Память: LRU, ограничен числом записей и суммарным размером.
+  2) Диск (необязательно): если задан AURORA_DOCX_CACHE_DIR — туда кладём
+     <ключ>.docx, при переполнении удаляем самые старые. Папку целиком не
+     обходим на каждую запись: держим счётчик байт и сканируем её, только
+     когда он перевалил за лимит, и раз в _DISK_RESCAN_EVERY записей —
+     папку могут делить несколько процессов, их файлы счётчик не видит.
+
+НАСТРОЙКА
+  AURORA_DOCX_CACHE_ITEMS    — записей в памяти (256; 0 = кеш выключен).
+  AURORA_DOCX_CACHE_MB       — мегабайт в памяти (64).
+  AURORA_DOCX_CACHE_DIR      — папка дискового кеша (по умолчанию выключен).
+  AURORA_DOCX_CACHE_DISK_MB  — лимит папки на диске (256).
+
+Админка при сохранении цен зовёт clear() (см. api_routes._pricing_changed).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from .docx_template import document_date, template_sha256
+from .docx_zip import DocxArchive, StoredDocx
+from .models import V5Input
+
+CachedDocx = Union[DocxArchive, StoredDocx]
+
+_DISK_RESCAN_EVERY = 64
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def docx_cache_key(inp: V5Input, data_version: str) -> str:
+    """data_version — версия данных, на которой ждём документ (load_data_version()).
+
+    Её же передают в пул (docx_pool.submit): кладут в кеш только документ,
+    собранный воркером именно на этой версии.
+    """
+    canonical = json.dumps(
+        inp.model_dump(mode="json"), ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    )
+    h = hashlib.sha256()
+    for part in (canonical, data_version, template_sha256(), document_date()):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class DocxCache:
+    def __init__(self, max_items: int, max_bytes: int, disk_dir: Optional[Path], disk_max_bytes: int):
+        self.max_items = max(0, max_items)
+        self.max_bytes = max(0, max_bytes)
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = max(0, disk_max_bytes)
+
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, CachedDocx]" = OrderedDict()
+        self._mem_bytes = 0
+        self._hits_mem = 0
+        self._hits_disk = 0
+        self._misses = 0
+        # Байт в папке на диске по нашему счёту; None — ещё не сканировали.
+        self._disk_bytes: Optional[int] = None
+        self._disk_writes = 0
+
+    @classmethod
+    def from_env(cls) -> "DocxCache":
+        disk = os.getenv("AURORA_DOCX_CACHE_DIR") or ""
+        return cls(
+            max_items=_env_int("AURORA_DOCX_CACHE_ITEMS", 256),
+            max_bytes=_env_int("AURORA_DOCX_CACHE_MB", 64) * 1024 * 1024,
+            disk_dir=Path(disk) if disk else None,
+            disk_max_bytes=_env_int("AURORA_DOCX_CACHE_DISK_MB", 256) * 1024 * 1024,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_items > 0
+
+    # --- чтение/запись ---
+
+    def get(self, key: str) -> Optional[CachedDocx]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            doc = self._mem.get(key)
+            if doc is not None:
+                self._mem.move_to_end(key)
+                self._hits_mem += 1
+                return doc
+
+        doc = self._disk_get(key)
+        with self._lock:
+            if doc is None:
+                self._misses += 1
+                return None
+            self._hits_disk += 1
+            self._mem_put(key, doc)
+        return doc
+
+    def put(self, key: str, doc: CachedDocx) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._mem_put(key, doc)
+        self._disk_put(key, doc)
+
+    def clear(self) -> None:
+        """Сброс обоих уровней (после сохранения цен в админке)."""
+        with self._lock:
+            self._mem.clear()
+            self._mem_bytes = 0
+        if self.disk_dir is not None and self.disk_dir.exists():
+            for path in self.disk_dir.glob("*.docx"):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            with self._lock:
+                self._disk_bytes = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "items": len(self._mem),
+                "bytes": self._mem_bytes,
+                "hits_memory": self._hits_mem,
+                "hits_disk": self._hits_disk,
+                "misses": self._misses,
+                "disk": str(self.disk_dir) if self.disk_dir else None,
+            }
+
+    # --- память ---
+
+    def _mem_put(self, key: str, doc: CachedDocx) -> None:
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= old.size
+        if doc.size > self.max_bytes:
+            return
+        self._mem[key] = doc
+        self._mem_bytes += doc.size
+        while self._mem and (len(self._mem) > self.max_items or self._mem_bytes > self.max_bytes):
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_bytes -= evicted.size
+
+    # --- диск ---
+
+    def _disk_path(self, key: str) -> Optional[Path]:
+        if self.disk_dir is None:
+            return None
+        return self.disk_dir / f"{key}.docx"
+
+    def _disk_get(self, key: str) -> Optional[StoredDocx]:
+        path = self._disk_path(key)
+        if path is None:
+            return None
+        try:
+            return StoredDocx(path.read_bytes())
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, doc: CachedDocx) -> None:
+        path = self._disk_path(key)
+        if path is None or path.exists():
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(doc.to_bytes())
+            tmp.replace(path)
+            with self._lock:
+                self._disk_writes += 1
+                if self._disk_bytes is None or self._disk_writes % _DISK_RESCAN_EVERY == 0:
+                    scan = True
+                else:
+                    self._disk_bytes += doc.size
+                    scan = self._disk_bytes > self.disk_max_bytes
+            if scan:
+                self._disk_prune()
+        except OSError:
+            # Диск — только ускорение: при ошибке просто работаем без него.
+            pass
+
+    def _disk_prune(self) -> None:
+        """Обойти папку: пересчитать счётчик байт и удалить самые старые сверх лимита."""
+        files = []
+        total = 0
+        for p in self.disk_dir.glob("*.docx"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+        if total > self.disk_max_bytes:
+            for _, size, p in sorted(files):
+                try:
+                    p.unlink()
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.disk_max_bytes:
+                    break
+        with self._lock:
+            self._disk_bytes = total
+
+
+_cache: Optional[DocxCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_docx_cache() -> DocxCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DocxCache.from_env()
+        return _cache
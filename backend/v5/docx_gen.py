@@ -15,7 +15,25 @@
   1) Открыть шаблон как основу документа (Document(template)).
   2) Точечно изменить значения в ячейках (не ломая рамки/мерджи/стили).
   3) В таблице задач: удалить старые строки задач и вставить свои,
-     клонируя XML строки, чтобы сохранить стиль.
+     клонируя XML строки, чтобы сохранить стиль. Строки собираются по
+     одному подготовленному образцу (_RowTemplate) и вставляются разом —
+     у крупных проектов производителей их сотни.
+
+СКОМПИЛИРОВАННЫЙ ШАБЛОН
+  Разбор lt_template.docx и поиск якорей (главная таблица, вложенная
+  таблица ЛТ, строки «Стоимость минимальная» / «Проверка заказчиком» /
+  «Итого», ячейки рядом с подписями) от входных данных не зависят.
+  Поэтому делаем это ОДИН раз (get_compiled_template) и запоминаем
+  позиции. На каждый запрос копируется только XML основного документа
+  (deepcopy), остальные части пакета (стили, колонтитулы, картинки)
+  общие и только читаются. Шаблон перечитывается, если файл изменился.
+
+  Шрифт Arial 8 для неизменного текста шаблона тоже проставляется один
+  раз; на запрос — только в run'ах, которые вставил генератор.
+
+  Неизменные части zip-архива тоже сжимаются один раз (см. docx_zip.py):
+  на запрос сериализуется и сжимается только word/document.xml, а
+  render_docx() отдаёт DocxArchive, который можно стримить кусками.
 
 ПРАВИЛА ДЛЯ ТАБЛИЦЫ ЗАДАЧ (по пожеланию пользователя)
   - min = max
@@ -28,90 +46,77 @@
 
 from __future__ import annotations
 
+import hashlib
+import threading
+import time
+import zipfile
 from copy import deepcopy
-from datetime import datetime
+from dataclasses import dataclass
 from io import BytesIO
-from pathlib import Path
-from typing import Optional
+from typing import Any, Optional, Sequence
 
 from docx import Document
 from docx.enum.text import WD_BREAK
+from docx.opc.oxml import serialize_part_xml
+from docx.oxml.ns import qn
+from docx.parts.document import DocumentPart
 from docx.shared import Pt
-from docx.table import Table
+from docx.table import Table, _Row
+from lxml import etree
 
+from ..metrics import record_span, span
+from .docx_template import TEMPLATE_PATH, document_date
+from .docx_zip import DocxArchive, ZipEntry, deflate_entry
 from .models import V5Input, V5Result
 
 
-TEMPLATE_PATH = Path(__file__).resolve().parent / "templates" / "lt_template.docx"
-
 # Фиксированная строка по требованию пользователя
 CUSTOMER_CHECK_RUB = 4950
 
 
-def _force_arial_8(doc: Document) -> None:
-    """Приводит весь документ к шрифту Arial 8.
+_FONT_NAME = "Arial"
+_FONT_SIZE = Pt(8)
+
+
+def _force_arial_8(roots) -> None:
+    """Проставляет Arial 8 во всех run'ах (<w:r>) внутри roots.
+
+    Требование: «весь шрифт Arial 8». Делаем одним проходом по lxml-дереву,
+    без обёрток python-docx (Paragraph/Run/Table/Cell) — они дорогие.
+
+    Неизменная часть шаблона (юридический текст и т.п.) приводится один раз
+    при компиляции (_normalize_template_fonts), поэтому на каждый запрос сюда
+    передаются только элементы, которые вставил/переписал генератор.
+    """
+
+    for root in roots:
+        for r in root.iter(qn("w:r")):
+            rPr = r.get_or_add_rPr()
+            rPr.rFonts_ascii = _FONT_NAME
+            rPr.rFonts_hAnsi = _FONT_NAME
+            rPr.sz_val = _FONT_SIZE
+
 
-    Требование: «весь шрифт Arial 8». В docx это означает:
-      1) Поменять базовый стиль Normal (на будущее).
-      2) Проставить Arial 8 во всех run'ах, включая таблицы и колонтитулы.
+def _normalize_template_fonts(doc: Document) -> None:
+    """Arial 8 для всего шаблона — один раз при компиляции.
 
-    Это чуть «в лоб», но зато надёжно и не зависит от того,
-    какие стили/шрифты были внутри шаблона.
+    1) Базовый стиль Normal (на будущее).
+    2) Весь основной текст, включая таблицы.
+    3) Колонтитулы (логотипы/подвалы тоже бывают таблицами).
     """
 
-    def set_run(run) -> None:
-        try:
-            run.font.name = "Arial"
-            run.font.size = Pt(8)
-        except Exception:
-            pass
-
-    def walk_paragraphs(paragraphs) -> None:
-        for p in paragraphs:
-            for r in p.runs:
-                set_run(r)
-
-    def walk_tables(tables) -> None:
-        for t in tables:
-            for row in t.rows:
-                for cell in row.cells:
-                    walk_paragraphs(cell.paragraphs)
-                    walk_tables(cell.tables)
-
-    # 1) Базовый стиль
     try:
         normal = doc.styles["Normal"]
-        normal.font.name = "Arial"
-        normal.font.size = Pt(8)
+        normal.font.name = _FONT_NAME
+        normal.font.size = _FONT_SIZE
     except Exception:
         pass
 
-    # 2) Основной текст
-    walk_paragraphs(doc.paragraphs)
-    walk_tables(doc.tables)
-
-    # 3) Колонтитулы (логотипы/подвалы тоже бывают таблицами)
+    roots = [doc.element.body]
     for s in doc.sections:
-        walk_paragraphs(s.header.paragraphs)
-        walk_tables(s.header.tables)
-        walk_paragraphs(s.footer.paragraphs)
-        walk_tables(s.footer.tables)
-
-
-def _safe_filename(name: str) -> str:
-    name = (name or "").strip() or "LT"
-    for ch in '<>:\\"/|?*':
-        name = name.replace(ch, "_")
-    return " ".join(name.split())[:80] or "LT"
-
-
-def suggest_filename(inp: V5Input) -> str:
-    c = inp.contacts
-    base = "Протокол_и_ЛТ"
-    if c and c.legal_name:
-        base = f"ЛТ_{_safe_filename(c.legal_name)}"
-    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    return f"{base}_{stamp}.docx"
+        roots.append(s.header._element)
+        roots.append(s.footer._element)
+    _force_arial_8(roots)
 
 
 # ---------------------------------------------------------------------------
@@ -159,22 +164,23 @@ def _find_nested_lt_table(main: Table) -> Table:
     raise RuntimeError("Не нашёл вложенную таблицу ЛТ (nested) — шаблон отличается")
 
 
-def _set_value_next_to_label(tbl: Table, label_substr: str, value: str) -> bool:
-    """Находит ячейку с label_substr и пишет value в следующую ячейку этой строки."""
+def _locate_value_next_to_label(tbl: Table, label_substr: str) -> Optional[tuple[int, int]]:
+    """Находит ячейку с label_substr и возвращает (строка, ячейка) для значения.
+
+    Значение пишется в следующую «не такую же» ячейку этой строки.
+    Если всё смерджено — прямо в ячейку с подписью (лучше так, чем никак).
+    """
     label_substr = _norm(label_substr)
-    for r in tbl.rows:
+    for ri, r in enumerate(tbl.rows):
         cells = r.cells
         for i, c in enumerate(cells):
             if label_substr in _norm(c.text):
                 # Ищем ближайшую "не такую же" ячейку справа.
                 for j in range(i + 1, len(cells)):
                     if _norm(cells[j].text) != _norm(c.text):
-                        cells[j].text = value
-                        return True
-                # Если всё смерджено — пишем прямо в эту же ячейку (лучше так, чем никак).
-                c.text = value
-                return True
-    return False
+                        return ri, j
+                return ri, i
+    return None
 
 
 def _cell_set_text_keep_style(cell, text: str) -> None:
@@ -279,19 +285,80 @@ def _find_row_index(tbl: Table, needle: str) -> int:
     raise RuntimeError(f"Не нашёл строку '{needle}' в вложенной таблице")
 
 
-def _remove_rows(tbl: Table, start: int, end_exclusive: int) -> None:
-    """Удаляет строки [start, end_exclusive)."""
-    for _ in range(end_exclusive - start):
-        tr = tbl.rows[start]._tr
-        tbl._tbl.remove(tr)
+def _row_cells(tbl: Table, tr) -> tuple:
+    """Ячейки одной строки (без пересборки сетки всей таблицы)."""
+    return _Row(tr, tbl).cells
+
+
+@dataclass(frozen=True)
+class _RowTemplate:
+    """Образец строки таблицы для вставки строк пачкой.
+
+    Раньше каждая строка вставлялась отдельно и заполнялась через обёртки
+    python-docx (_Row.cells / _Cell.text): на каждую строку — разбор сетки
+    строки и пересоздание абзацев. Здесь образец готовится ОДИН раз:
+    в ячейках, куда пишем, уже лежит пустой <w:p><w:r/></w:p> (ровно то, что
+    оставил бы _Cell.text), и позиции этих <w:tc> известны заранее.
+    На строку остаётся deepcopy образца + текст в готовый <w:r>.
 
+    slots[колонка сетки] — позиция <w:tc> внутри <w:tr> (объединённая по
+    горизонтали ячейка занимает несколько колонок — как в _Row.cells).
+    Вертикально объединённых ячеек в строках задач шаблона нет.
+    """
+
+    tr: Any
+    slots: tuple[int, ...]
 
-def _clone_row_xml(row) -> object:
-    return deepcopy(row._tr)
+    @classmethod
+    def from_sample(cls, sample_tr, columns: int) -> "_RowTemplate":
+        tr = deepcopy(sample_tr)
+        slots: list[int] = []
+        for tc in tr.tc_lst:
+            if tc.vMerge == "continue":
+                raise RuntimeError("Строка-образец таблицы задач с вертикальным объединением не поддерживается")
+            slots.extend([tr.index(tc)] * tc.grid_span)
+        slots = slots[:columns]
+        for pos in set(slots):
+            tc = tr[pos]
+            tc.clear_content()
+            tc.add_p().add_r()
+        return cls(tr=tr, slots=tuple(slots))
+
+    def render(self, values: Sequence[str]) -> Any:
+        """Новая строка <w:tr>; values — текст по колонкам сетки."""
+        tr = deepcopy(self.tr)
+        texts = {}
+        for col, text in enumerate(values):
+            texts[self.slots[col]] = text  # повтор колонки одной ячейки — побеждает последний
+        for pos, text in texts.items():
+            if text:
+                _set_run_text(tr[pos][-1][-1], text)  # <w:tc>/<w:p>/<w:r>
+        return tr
+
+
+_RUN_SPECIAL_CHARS = frozenset("\t\r\n")
+
+
+def _set_run_text(r, text: str) -> None:
+    """Текст в ПУСТОЙ <w:r> — тот же XML, что даёт CT_R.text, но без xpath.
+
+    Сеттер python-docx на каждый вызов чистит run через xpath — на сотнях
+    строк это основная стоимость. Табы/переносы — через него же (редкость).
+    """
+    if _RUN_SPECIAL_CHARS.intersection(text):
+        r.text = text
+        return
+    t = etree.SubElement(r, qn("w:t"))
+    t.text = text
+    if len(text.strip()) < len(text):
+        t.set(qn("xml:space"), "preserve")
 
 
-def _insert_row_before(tbl: Table, before_idx: int, tr_xml) -> None:
-    tbl._tbl.insert(before_idx, tr_xml)
+def _splice_rows_before(anchor_tr, rows: list) -> None:
+    """Вставить все строки перед anchor_tr одной операцией."""
+    parent = anchor_tr.getparent()
+    at = parent.index(anchor_tr)
+    parent[at:at] = rows
 
 
 def _fmt_rub(x: int) -> str:
@@ -389,26 +456,26 @@ def _collect_group_tasks(groups: list[dict]) -> list[tuple[str, int]]:
     return tasks
 
 
-def _fill_tasks_table(nested: Table, res: V5Result) -> None:
-    """Заполняет блок '8. Подробный список задач' во вложенной таблице."""
-    header_idx = _find_row_index(nested, "Стоимость минимальная")  # шапка
-    check_idx = _find_row_index(nested, "Проверка заказчиком")
-    total_idx = _find_row_index(nested, "Итого")
+def _fill_tasks_table(nested: Table, res: V5Result, tpl: "CompiledTemplate") -> list:
+    """Заполняет блок '8. Подробный список задач' во вложенной таблице.
 
-    # Вставлять будем строки задач между header и check
-    first_task_idx = header_idx + 1
+    Индексы строк (шапка / «Проверка заказчиком» / «Итого») берём из
+    скомпилированного шаблона — таблицу заново не сканируем.
+    Возвращает изменённые строки (<w:tr>) — для нормализации шрифта.
+    """
+    trs = nested._tbl.tr_lst
+    check_tr = trs[tpl.check_row]
+    total_tr = trs[tpl.total_row]
 
+    # Вставлять будем строки задач между header и check.
     # Шаблон строки для копирования: если в шаблоне есть хотя бы одна строка задач — берём её,
     # иначе клонируем строку проверки заказчиком.
-    sample_row = nested.rows[first_task_idx] if first_task_idx < check_idx else nested.rows[check_idx]
-    sample_tr = _clone_row_xml(sample_row)
+    template_task_trs = trs[tpl.header_row + 1 : tpl.check_row]
+    sample_tr = template_task_trs[0] if template_task_trs else check_tr
 
     # Удаляем существующие строки задач (между header и check)
-    if first_task_idx < check_idx:
-        _remove_rows(nested, first_task_idx, check_idx)
-        # после удаления индекс check сдвинулся
-        check_idx = _find_row_index(nested, "Проверка заказчиком")
-        total_idx = _find_row_index(nested, "Итого")
+    for tr in template_task_trs:
+        nested._tbl.remove(tr)
 
     # --- Собираем строки задач ---
     # Пользователь ожидает, что таблица задач отражает:
@@ -462,43 +529,168 @@ def _fill_tasks_table(nested: Table, res: V5Result) -> None:
         task_rows[-1] = (lbl, max(0, rub + delta))
 
     # --- Вставляем строки задач ---
-    insert_at = check_idx  # перед строкой "Проверка заказчиком"
-    for label, rub in task_rows:
-        tr = deepcopy(sample_tr)
-        _insert_row_before(nested, insert_at, tr)
-        # после вставки строка теперь доступна как nested.rows[insert_at]
-        r = nested.rows[insert_at].cells
-
-        # Колонки в шаблоне (6):
-        # 0-1: Задача (иногда 0 и 1 мерджены)
-        # 2: Стоимость минимальная
-        # 3: Стоимость максимальная
-        # 4: Длительность
-        # 5: Комментарий
-        r[0].text = label
-        r[1].text = label  # из-за мерджа Word часто дублирует — оставляем одинаково
-        r[2].text = _fmt_rub(rub)
-        r[3].text = _fmt_rub(rub)
-        r[4].text = ""  # длительность пустая
-        r[5].text = ""
-
-        insert_at += 1
+    # Колонки в шаблоне (6):
+    # 0-1: Задача (иногда 0 и 1 мерджены)
+    # 2: Стоимость минимальная
+    # 3: Стоимость максимальная
+    # 4: Длительность (пустая)
+    # 5: Комментарий
+    # Все строки собираются по одному образцу и вставляются разом — именно
+    # перед <w:tr> «Проверка заказчиком»: у <w:tbl> первыми детьми идут
+    # tblPr/tblGrid, поэтому индекс строки != индекс в XML.
+    row_tpl = _RowTemplate.from_sample(sample_tr, columns=6)
+    inserted = [
+        row_tpl.render((label, label, _fmt_rub(rub), _fmt_rub(rub), "", ""))
+        for label, rub in task_rows
+    ]
+    _splice_rows_before(check_tr, inserted)
 
     # --- Строка "Проверка заказчиком" ---
-    check_idx = _find_row_index(nested, "Проверка заказчиком")
-    check_cells = nested.rows[check_idx].cells
+    check_cells = _row_cells(nested, check_tr)
     check_cells[2].text = _fmt_rub(check_rub)
     check_cells[3].text = _fmt_rub(check_rub)
     # check_cells[4] (дни) НЕ трогаем (в шаблоне "3")
 
     # --- Строка "Итого" ---
-    total_idx = _find_row_index(nested, "Итого")
-    total_cells = nested.rows[total_idx].cells
+    total_cells = _row_cells(nested, total_tr)
     # В "Итого" цена обычно в столбцах 2 и 3
     total_cells[2].text = _fmt_rub(total)
     total_cells[3].text = _fmt_rub(total)
     # total_cells[4] (длительность 11-14) НЕ трогаем
 
+    return inserted + [check_tr, total_tr]
+
+
+# ---------------------------------------------------------------------------
+# Скомпилированный шаблон
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """Разобранный lt_template.docx и позиции якорей в нём.
+
+    document — общий для всех запросов, его НЕЛЬЗЯ менять: каждый запрос
+    получает свою копию XML основного документа через new_document().
+    Пути — индексы детей XML от <w:body> (main_path) и от главной
+    таблицы (nested_path); строки — индексы <w:tr> во вложенной таблице.
+    entries — сжатые части архива в исходном порядке; entries[document_entry]
+    (word/document.xml) на каждый запрос подменяется своим.
+    """
+
+    signature: tuple[int, int]
+    sha256: str
+    document: Document
+    entries: tuple[ZipEntry, ...]
+    document_entry: int
+    main_path: tuple[int, ...]
+    nested_path: tuple[int, ...]
+    header_row: int
+    check_row: int
+    total_row: int
+    label_cells: dict[str, Optional[tuple[int, int]]]
+
+    def new_document(self) -> Document:
+        """Документ для одного запроса: своя копия XML, общие стили/колонтитулы."""
+        src = self.document.part
+        part = DocumentPart(src.partname, src.content_type, deepcopy(src.element), src.package)
+        for rel in src.rels.values():
+            target = rel.target_ref if rel.is_external else rel.target_part
+            part.load_rel(rel.reltype, target, rel.rId, rel.is_external)
+        return part.document
+
+    def locate(self, doc: Document) -> tuple[Table, Table]:
+        """(главная таблица, вложенная таблица ЛТ) в документе из new_document()."""
+        main_el = _resolve_path(doc.element.body, self.main_path)
+        main = Table(main_el, doc._body)
+        nested = Table(_resolve_path(main_el, self.nested_path), main)
+        return main, nested
+
+
+# Подписи в главной таблице, рядом с которыми пишем значения.
+_MAIN_LABELS = ("Заказчик:", "Контактное лицо", "Стоимость, рубли")
+
+_template_lock = threading.Lock()
+_compiled_template: Optional[CompiledTemplate] = None
+
+
+def _element_path(el, root) -> tuple[int, ...]:
+    path: list[int] = []
+    while el is not root:
+        parent = el.getparent()
+        if parent is None:
+            raise RuntimeError("Элемент не лежит внутри ожидаемого контейнера шаблона")
+        path.append(parent.index(el))
+        el = parent
+    return tuple(reversed(path))
+
+
+def _resolve_path(root, path: tuple[int, ...]):
+    el = root
+    for i in path:
+        el = el[i]
+    return el
+
+
+def _compile_template(signature: tuple[int, int]) -> CompiledTemplate:
+    blob = TEMPLATE_PATH.read_bytes()
+    doc = Document(BytesIO(blob))
+    main = _find_main_table(doc)
+    nested = _find_nested_lt_table(main)
+
+    # Шрифты неизменной части шаблона (в т.ч. общих стилей и колонтитулов)
+    # нормализуем один раз — на запрос остаются только вставленные run'ы.
+    _normalize_template_fonts(doc)
+
+    # Сохраняем нормализованный шаблон и сжимаем каждую часть один раз.
+    bio = BytesIO()
+    doc.save(bio)
+    with zipfile.ZipFile(bio) as zf:
+        entries = tuple(deflate_entry(info.filename, zf.read(info)) for info in zf.infolist())
+    document_name = doc.part.partname.membername
+    document_entry = next(i for i, e in enumerate(entries) if e.name == document_name)
+
+    return CompiledTemplate(
+        signature=signature,
+        sha256=hashlib.sha256(blob).hexdigest(),
+        document=doc,
+        entries=entries,
+        document_entry=document_entry,
+        main_path=_element_path(main._tbl, doc.element.body),
+        nested_path=_element_path(nested._tbl, main._tbl),
+        header_row=_find_row_index(nested, "Стоимость минимальная"),
+        check_row=_find_row_index(nested, "Проверка заказчиком"),
+        total_row=_find_row_index(nested, "Итого"),
+        label_cells={label: _locate_value_next_to_label(main, label) for label in _MAIN_LABELS},
+    )
+
+
+def get_compiled_template() -> CompiledTemplate:
+    """Скомпилированный шаблон; перечитываем, только если файл изменился."""
+    global _compiled_template
+
+    try:
+        st = TEMPLATE_PATH.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Не найден шаблон: {TEMPLATE_PATH}") from None
+    signature = (st.st_mtime_ns, st.st_size)
+
+    tpl = _compiled_template
+    if tpl is not None and tpl.signature == signature:
+        return tpl
+    with _template_lock:
+        if _compiled_template is None or _compiled_template.signature != signature:
+            _compiled_template = _compile_template(signature)
+        return _compiled_template
+
+
+def _archive_document(doc: Document, tpl: CompiledTemplate) -> DocxArchive:
+    """Архив запроса: свой word/document.xml + заранее сжатые части шаблона."""
+    entries = list(tpl.entries)
+    name = entries[tpl.document_entry].name
+    entries[tpl.document_entry] = deflate_entry(name, serialize_part_xml(doc.element))
+    return DocxArchive(entries)
+
 
 # ---------------------------------------------------------------------------
 # Основная сборка
@@ -506,14 +698,32 @@ def _fill_tasks_table(nested: Table, res: V5Result) -> None:
 
 
 def build_docx_bytes(inp: V5Input, res: V5Result) -> bytes:
-    if not TEMPLATE_PATH.exists():
-        raise FileNotFoundError(f"Не найден шаблон: {TEMPLATE_PATH}")
+    """Готовый DOCX одним bytes (для совместимости; для отдачи — render_docx)."""
+    return render_docx(inp, res).to_bytes()
 
-    doc = Document(TEMPLATE_PATH)
+
+def render_docx(inp: V5Input, res: V5Result) -> DocxArchive:
+    # Этапы меряются span'ами (backend/metrics.py): видно в /metrics и Server-Timing.
+    with span("docx.template"):
+        tpl = get_compiled_template()
+        doc = tpl.new_document()
 
     # 1) Заполняем значения в ЛТ (в таблицах шаблона)
-    main = _find_main_table(doc)
-    nested = _find_nested_lt_table(main)
+    with span("docx.tables"):
+        main, nested = tpl.locate(doc)
+    fields_started = time.perf_counter()
+
+    # Всё, что вставляет/переписывает генератор — потом приведём к Arial 8.
+    generated: list = []
+
+    def set_cell_text(cell, text: str) -> None:
+        cell.text = text
+        generated.append(cell._tc)
+
+    def set_label_value(label: str, value: str) -> None:
+        pos = tpl.label_cells.get(label)
+        if pos:
+            set_cell_text(main.rows[pos[0]].cells[pos[1]], value)
 
     c = inp.contacts
     legal = c.legal_name if c and c.legal_name else "—"
@@ -522,15 +732,15 @@ def build_docx_bytes(inp: V5Input, res: V5Result) -> bytes:
     # Шапка: меняем номер/дату (в ячейке где "Лист Требований №")
     # Ищем строку/ячейку по подстроке.
     lt_num = "1"  # как в образце
-    lt_date = datetime.now().strftime("%d.%m.%Y")
+    lt_date = document_date()
     # В главной таблице обычно это первая строка/первая ячейка.
-    main.rows[0].cells[0].text = f"Лист Требований № {lt_num} от {lt_date}"
+    set_cell_text(main.rows[0].cells[0], f"Лист Требований № {lt_num} от {lt_date}")
 
-    _set_value_next_to_label(main, "Заказчик:", legal)
-    _set_value_next_to_label(main, "Контактное лицо", contact)
+    set_label_value("Заказчик:", legal)
+    set_label_value("Контактное лицо", contact)
 
     total = int(res.costs.total_rub or 0)
-    _set_value_next_to_label(main, "Стоимость, рубли", f"{total}-{total}")
+    set_label_value("Стоимость, рубли", f"{total}-{total}")
 
     # 2) Блоки 1–4 во вложенной таблице
     # Формируем текст из состояния (минимально полезный и короткий)
@@ -579,26 +789,32 @@ def build_docx_bytes(inp: V5Input, res: V5Result) -> bytes:
     def write_block(row_idx: int, text: str):
         row = nested.rows[row_idx]
         # Пишем в последний столбец (обычно это "поле" для текста)
-        row.cells[-1].text = text
+        set_cell_text(row.cells[-1], text)
 
     write_block(0, desc_need)
     write_block(1, products)
     write_block(2, requirement)
     write_block(3, realization)
 
+    record_span("docx.fields", time.perf_counter() - fields_started)
+
     # 3) Таблица задач (8-й блок) во вложенной таблице
-    _fill_tasks_table(nested, res)
+    with span("docx.fill_tasks"):
+        generated.extend(_fill_tasks_table(nested, res, tpl))
 
     # 4) Добавляем протокол ПЕРЕД ЛТ (в начало документа)
-    proto_elements = _build_protocol_at_end(doc, inp, res)
-    # Сейчас они в конце; вырежем и вставим в начало.
-    for el in proto_elements:
-        el.getparent().remove(el)
-    _insert_elements_at_start(doc, proto_elements)
-
-    # 5) Требование: весь документ — Arial 8 (включая колонтитулы)
-    _force_arial_8(doc)
-
-    bio = BytesIO()
-    doc.save(bio)
-    return bio.getvalue()
+    with span("docx.protocol"):
+        proto_elements = _build_protocol_at_end(doc, inp, res)
+        # Сейчас они в конце; вырежем и вставим в начало.
+        for el in proto_elements:
+            el.getparent().remove(el)
+        _insert_elements_at_start(doc, proto_elements)
+        generated.extend(proto_elements)
+
+    # 5) Требование: весь документ — Arial 8 (включая колонтитулы).
+    # Шаблон уже нормализован при компиляции — обрабатываем только вставленное.
+    with span("docx.fonts"):
+        _force_arial_8(generated)
+
+    with span("docx.save"):
+        return _archive_document(doc, tpl)
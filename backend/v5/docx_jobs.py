@@ -0,0 +1,414 @@
+"""backend/v5/docx_jobs.py
+
+ФОНОВЫЕ ВЫГРУЗКИ WORD (очередь заданий в SQLite)
+
+ЗАЧЕМ
+  POST /api/v5/docx держит соединение, пока собирается документ. Для
+  больших КП и пакетных прогонов (конец месяца) это лишние висящие
+  запросы и 503, когда пул занят. Здесь: поставили задание — сразу
+  получили id, статус и документ забираем потом.
+
+КАК УСТРОЕНО
+  - Задания лежат в SQLite (один файл, переживает перезапуск):
+      queued → running → done / failed.
+    Готовый документ хранится в той же строке (BLOB).
+  - AURORA_DOCX_JOBS_WORKERS потоков в каждом процессе uvicorn берут
+    задания из базы. Взятие атомарное (BEGIN IMMEDIATE), поэтому
+    несколько процессов делят одну очередь.
+  - Задание берётся «в аренду» (lease_until) с токеном исполнителя (owner).
+    Пока исполнитель ждёт пул и собирает документ, он продлевает аренду
+    каждые lease_s / 3 секунд. Процесс упал посреди сборки — аренда
+    истекает, и задание возьмёт кто-то другой (не больше _MAX_ATTEMPTS
+    раз, дальше — failed). Результат записывается только с тем же
+    owner: исполнитель, у которого задание уже забрали, ничего не пишет.
+  - Собирает документ тот же пул процессов, что и POST /api/v5/docx
+    (docx_pool), с тем же кешем готовых Word (docx_cache). Пул занят —
+    поток просто ждёт и пробует снова: всплеск заданий растягивается во
+    времени, а не превращается в 503.
+  - Копия в ./output — как у обычной выгрузки (output_writer).
+  - Готовые и упавшие задания старше AURORA_DOCX_JOBS_KEEP_HOURS удаляются.
+
+НАСТРОЙКА
+  AURORA_DOCX_JOBS_DB          — файл базы (<проект>/jobs/docx_jobs.sqlite3).
+  AURORA_DOCX_JOBS_WORKERS     — потоков-исполнителей в процессе (1;
+                                 0 = этот процесс задания только принимает).
+  AURORA_DOCX_JOBS_MAX_QUEUED  — сколько заданий может ждать (1000; больше — 503).
+  AURORA_DOCX_JOBS_LEASE_S     — аренда задания, секунд (300).
+  AURORA_DOCX_JOBS_KEEP_HOURS  — сколько хранить готовые задания (72).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..metrics import attach_spans
+from .data import load_data_version
+from .docx_cache import docx_cache_key, get_docx_cache
+from .docx_pool import DocxPoolBusy, get_docx_pool
+from .docx_template import suggest_filename
+from .models import V5Input
+from .output_writer import get_output_writer
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DB = Path(__file__).resolve().parents[2] / "jobs" / "docx_jobs.sqlite3"
+
+_MAX_ATTEMPTS = 3
+_POLL_S = 1.0
+_BUSY_RETRY_S = 0.5
+_CLEANUP_EVERY_S = 600.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docx_jobs (
+    id          TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    filename    TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    lease_until REAL,
+    owner       TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    error       TEXT NOT NULL DEFAULT '',
+    size        INTEGER,
+    etag        TEXT,
+    document    BLOB
+);
+CREATE INDEX IF NOT EXISTS docx_jobs_status ON docx_jobs (status, created_at);
+"""
+
+# Всё, кроме самого документа (он может быть большим).
+_INFO_COLUMNS = "id, status, filename, created_at, started_at, finished_at, attempts, error, size, etag"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+class DocxJobsFull(RuntimeError):
+    """Очередь заданий заполнена."""
+
+
+class _LeaseLost(RuntimeError):
+    """Аренду задания забрал другой исполнитель — результат писать нельзя."""
+
+
+class _Lease:
+    """Аренда взятого задания: keep() продлевает её не чаще раза в lease_s / 3."""
+
+    def __init__(self, queue: "DocxJobQueue", job_id: str, owner: str):
+        self.queue = queue
+        self.job_id = job_id
+        self.owner = owner
+        self.every_s = queue.lease_s / 3
+        self._next = time.monotonic() + self.every_s
+
+    def keep(self) -> None:
+        if time.monotonic() < self._next:
+            return
+        if not self.queue._renew(self.job_id, self.owner):
+            raise _LeaseLost(self.job_id)
+        self._next = time.monotonic() + self.every_s
+
+
+class DocxJobQueue:
+    def __init__(self, db_path: Path, workers: int, max_queued: int, lease_s: int, keep_hours: int):
+        self.db_path = db_path
+        self.workers = max(0, workers)
+        self.max_queued = max(1, max_queued)
+        self.lease_s = max(10, lease_s)
+        self.keep_hours = max(0, keep_hours)
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._schema_ready = False
+        self._next_cleanup = 0.0
+        self._completed = 0
+        self._failed = 0
+
+    @classmethod
+    def from_env(cls) -> "DocxJobQueue":
+        return cls(
+            db_path=Path(os.getenv("AURORA_DOCX_JOBS_DB") or DEFAULT_DB),
+            workers=_env_int("AURORA_DOCX_JOBS_WORKERS", 1),
+            max_queued=_env_int("AURORA_DOCX_JOBS_MAX_QUEUED", 1000),
+            lease_s=_env_int("AURORA_DOCX_JOBS_LEASE_S", 300),
+            keep_hours=_env_int("AURORA_DOCX_JOBS_KEEP_HOURS", 72),
+        )
+
+    # --- база ---
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Соединение на операцию: sqlite3 не любит делить его между потоками.
+        if not self._schema_ready:
+            with self._lock:
+                if not self._schema_ready:
+                    self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                    conn = sqlite3.connect(self.db_path, timeout=30)
+                    try:
+                        conn.execute("PRAGMA journal_mode=WAL")
+                        conn.executescript(_SCHEMA)
+                        columns = {r[1] for r in conn.execute("PRAGMA table_info(docx_jobs)")}
+                        if "owner" not in columns:  # база от версии без токена аренды
+                            conn.execute("ALTER TABLE docx_jobs ADD COLUMN owner TEXT")
+                    finally:
+                        conn.close()
+                    self._schema_ready = True
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # --- приём заданий (эндпоинты) ---
+
+    def submit(self, inp: V5Input) -> Dict[str, Any]:
+        """Поставить выгрузку в очередь; DocxJobsFull, если очередь заполнена."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                (queued,) = conn.execute("SELECT COUNT(*) FROM docx_jobs WHERE status = 'queued'").fetchone()
+                if queued >= self.max_queued:
+                    raise DocxJobsFull(f"{queued} заданий уже в очереди")
+                conn.execute(
+                    "INSERT INTO docx_jobs (id, status, payload, filename, created_at) VALUES (?, 'queued', ?, ?, ?)",
+                    (job_id, inp.model_dump_json(), suggest_filename(inp), now),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        self._wake.set()
+        return self.get(job_id) or {}
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Статус задания (без документа); None — нет такого."""
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {_INFO_COLUMNS} FROM docx_jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            info = dict(row)
+            if info["status"] == "queued":
+                (ahead,) = conn.execute(
+                    "SELECT COUNT(*) FROM docx_jobs WHERE status = 'queued' AND created_at < ?",
+                    (info["created_at"],),
+                ).fetchone()
+                info["queue_position"] = ahead + 1
+        return info
+
+    def document(self, job_id: str) -> Optional[Tuple[str, str, bytes]]:
+        """(имя файла, etag, байты) готового документа; None — не готов или нет такого."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT filename, etag, document FROM docx_jobs WHERE id = ? AND status = 'done'", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row["filename"], row["etag"], bytes(row["document"])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM docx_jobs GROUP BY status").fetchall())
+        return {
+            "db": str(self.db_path),
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "completed_here": self._completed,
+            "failed_here": self._failed,
+        }
+
+    # --- исполнители ---
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads or self.workers == 0:
+                return
+            self._stop.clear()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"docx-jobs-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def shutdown(self) -> None:
+        """Остановить исполнителей (текущие сборки дорабатывают)."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        self._stop.set()
+        self._wake.set()
+        for t in threads:
+            t.join(timeout=30)
+
+    def _claim(self) -> Optional[Tuple[sqlite3.Row, str]]:
+        """Взять задание: (строка, токен аренды) или None."""
+        now = time.time()
+        owner = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id, payload, filename, attempts FROM docx_jobs "
+                    "WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE docx_jobs SET status = 'running', started_at = ?, lease_until = ?, owner = ?, "
+                        "attempts = attempts + 1 WHERE id = ?",
+                        (now, now + self.lease_s, owner, row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return None if row is None else (row, owner)
+
+    def _renew(self, job_id: str, owner: str) -> bool:
+        """Продлить аренду; False — задание уже у другого исполнителя."""
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE docx_jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (time.time() + self.lease_s, job_id, owner),
+            ).rowcount == 1
+
+    def _update(self, job_id: str, owner: str, **fields: Any) -> bool:
+        """UPDATE задания, только если аренда всё ещё наша."""
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            return conn.execute(
+                f"UPDATE docx_jobs SET {assignments} WHERE id = ? AND owner = ? AND status = 'running'",
+                (*fields.values(), job_id, owner),
+            ).rowcount == 1
+
+    def _finish(self, job_id: str, owner: str, **fields: Any) -> bool:
+        return self._update(job_id, owner, finished_at=time.time(), lease_until=None, **fields)
+
+    def _requeue(self, job_id: str, owner: str, **fields: Any) -> bool:
+        return self._update(job_id, owner, status="queued", lease_until=None, owner=None, **fields)
+
+    def _render(self, inp: V5Input, lease: _Lease):
+        """Архив через кеш и пул (как POST /api/v5/docx); ждём, пока пул занят.
+
+        Пока ждём, продлеваем аренду; её забрали — _LeaseLost.
+        """
+        cache = get_docx_cache()
+        version = load_data_version()
+        key = docx_cache_key(inp, version)
+        archive = cache.get(key)
+        if archive is not None:
+            return key, archive
+        pool = get_docx_pool()
+        while True:
+            try:
+                future = pool.submit(inp.model_dump(), version)
+                break
+            except DocxPoolBusy:
+                if self._stop.wait(_BUSY_RETRY_S):
+                    raise
+                lease.keep()
+        while True:
+            try:
+                archive, spans, rendered = future.result(timeout=lease.every_s)
+                break
+            except FutureTimeout:
+                lease.keep()
+        attach_spans(spans)
+        if rendered != version:
+            # Собран на других данных — не в кеш (см. docx_cache).
+            return docx_cache_key(inp, rendered), archive
+        cache.put(key, archive)
+        return key, archive
+
+    def _process(self, row: sqlite3.Row, owner: str) -> None:
+        job_id = row["id"]
+        if row["attempts"] >= _MAX_ATTEMPTS:
+            # Процесс уже падал на этом задании — больше не пробуем.
+            if self._finish(job_id, owner, status="failed", error="слишком много попыток"):
+                self._failed += 1
+            return
+        try:
+            inp = V5Input.model_validate_json(row["payload"])
+            key, archive = self._render(inp, _Lease(self, job_id, owner))
+            body = archive.to_bytes()
+        except _LeaseLost:
+            log.warning("docx_jobs: задание %s забрал другой исполнитель (аренда истекла)", job_id)
+            return
+        except DocxPoolBusy:
+            # Процесс останавливается, а пул так и не освободился — вернём
+            # задание в очередь (попытка не считается).
+            self._requeue(job_id, owner, attempts=row["attempts"])
+            return
+        except Exception as exc:
+            log.exception("docx_jobs: задание %s упало", job_id)
+            if row["attempts"] + 1 >= _MAX_ATTEMPTS:
+                if self._finish(job_id, owner, status="failed", error=f"{type(exc).__name__}: {exc}"):
+                    self._failed += 1
+            else:
+                self._requeue(job_id, owner, error=f"{type(exc).__name__}: {exc}")
+            return
+        if not self._finish(job_id, owner, status="done", error="", size=len(body), etag=f'"{key}"', document=body):
+            log.warning("docx_jobs: задание %s уже у другого исполнителя — результат не записан", job_id)
+            return
+        get_output_writer().submit(row["filename"], archive)
+        self._completed += 1
+
+    def _cleanup(self) -> None:
+        if self.keep_hours == 0 or time.monotonic() < self._next_cleanup:
+            return
+        self._next_cleanup = time.monotonic() + _CLEANUP_EVERY_S
+        cutoff = time.time() - self.keep_hours * 3600
+        with self._connect() as conn:
+            deleted = conn.execute(
+                "DELETE FROM docx_jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,)
+            ).rowcount
+        if deleted:
+            log.info("docx_jobs: удалено старых заданий: %d", deleted)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._cleanup()
+                claimed = self._claim()
+            except sqlite3.Error:
+                log.exception("docx_jobs: ошибка базы заданий")
+                claimed = None
+            if claimed is None:
+                self._wake.wait(_POLL_S)
+                self._wake.clear()
+                continue
+            self._process(*claimed)
+
+
+_jobs: Optional[DocxJobQueue] = None
+_jobs_lock = threading.Lock()
+
+
+def get_docx_jobs() -> DocxJobQueue:
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = DocxJobQueue.from_env()
+        return _jobs
@@ -0,0 +1,287 @@
+"""backend/v5/docx_pool.py
+
+ПУЛ ПРОЦЕССОВ ДЛЯ WORD-ЭКСПОРТА (с ограничением очереди)
+
+ЗАЧЕМ
+  Сборка DOCX — тяжёлая по CPU. Если делать её прямо в эндпоинте, она
+  крутится в общем threadpool Starlette под GIL, и пачка выгрузок
+  подвешивает /api/v5/calculate и раздачу статики в том же воркере.
+
+КАК УСТРОЕНО
+  - Рендер (calculate_v5 + render_docx) идёт в отдельных процессах.
+    Каждый процесс при старте заранее грузит шаблон и data.json.
+  - Очередь ограничена: если уже занято max_pending мест (в работе +
+    ждут), submit() сразу бросает DocxPoolBusy — эндпоинт отвечает 503
+    с Retry-After, а не копит запросы бесконечно.
+  - stats() — глубина очереди и задержки (ожидание + рендер) для
+    /api/v5/docx/stats.
+  - Процесс-воркер умер (OOM, падение в lxml) — ProcessPoolExecutor
+    ломается насовсем (BrokenProcessPool). Такой пул выбрасываем и на
+    следующей задаче поднимаем новый; задачу, на которой это случилось,
+    повторяем один раз.
+
+НАСТРОЙКА (переменные окружения)
+  AURORA_DOCX_WORKERS      — сколько процессов (по умолчанию min(2, CPU)).
+                             0 = рендер в потоках текущего процесса (как раньше).
+  AURORA_DOCX_MAX_PENDING  — сколько выгрузок может быть «в работе + в очереди»
+                             одновременно (по умолчанию workers * 4).
+  AURORA_DOCX_RETRY_AFTER  — что отдать в Retry-After при 503, секунд (5).
+
+ДАННЫЕ
+  У процесса-воркера свой снимок данных (см. data.py), и файлы он сверяет
+  по своему таймеру — не одновременно с главным процессом. Поэтому вместе
+  с задачей уходит версия данных, которую ждёт вызывающий (та же, что в
+  ключе docx_cache). Снимок воркера другой версии — он перечитывает файлы
+  сразу (refresh(force=True)), а не ждёт интервала проверки. Назад
+  возвращается версия, на которой документ реально собран: если файлы
+  успели поменяться ещё раз, вызывающий увидит расхождение.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import BrokenExecutor, CancelledError, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from ..metrics import Spans, collect_spans, span
+from .docx_zip import DocxArchive
+
+log = logging.getLogger(__name__)
+
+_LATENCY_WINDOW = 512
+_THREAD_WORKERS = 2
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+class DocxPoolBusy(RuntimeError):
+    """Очередь выгрузок заполнена — клиенту стоит повторить позже."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("DOCX export queue is full")
+        self.retry_after = retry_after
+
+
+# ---------------------------------------------------------------------------
+# Код, который выполняется в процессе-воркере
+# ---------------------------------------------------------------------------
+
+def _worker_init() -> None:
+    """Прогрев процесса: шаблон и данные грузим до первой выгрузки."""
+    from .data import load_data_from_frontend
+    from .docx_gen import get_compiled_template
+
+    get_compiled_template()
+    load_data_from_frontend()
+
+
+def _worker_ping() -> int:
+    return os.getpid()
+
+
+def _worker_render(payload: Dict[str, Any], data_version: Optional[str]) -> Tuple[DocxArchive, float, Spans, str]:
+    from .calc import calculate_v5
+    from .data import get_data_snapshots
+    from .docx_gen import render_docx
+    from .models import V5Input
+
+    snapshots = get_data_snapshots()
+    version = snapshots.current().version
+    if data_version is not None and version != data_version:
+        version = snapshots.refresh(force=True).version
+
+    # Этапы (шаблон, таблицы, шрифты, расчёт…) возвращаем вместе с архивом:
+    # гистограммы и Server-Timing живут в главном процессе.
+    started = time.perf_counter()
+    with collect_spans() as spans:
+        with span("docx.validate"):
+            inp = V5Input.model_validate(payload)
+        archive = render_docx(inp, calculate_v5(inp))
+    if snapshots.current().version != version:
+        # Снимок сменился посреди рендера — на какой версии собран
+        # документ, сказать нельзя.
+        version = ""
+    return archive, time.perf_counter() - started, spans, version
+
+
+# ---------------------------------------------------------------------------
+# Пул (главный процесс)
+# ---------------------------------------------------------------------------
+
+
+class DocxRenderPool:
+    def __init__(self, workers: int, max_pending: int, retry_after: int):
+        self.workers = max(0, workers)
+        self.max_pending = max(1, max_pending)
+        self.retry_after = max(1, retry_after)
+
+        self._lock = threading.Lock()
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._restarts = 0
+        self._render_s: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self._total_s: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    @classmethod
+    def from_env(cls) -> "DocxRenderPool":
+        workers = _env_int("AURORA_DOCX_WORKERS", min(2, os.cpu_count() or 1))
+        max_pending = _env_int("AURORA_DOCX_MAX_PENDING", max(1, workers) * 4)
+        retry_after = _env_int("AURORA_DOCX_RETRY_AFTER", 5)
+        return cls(workers, max_pending, retry_after)
+
+    # --- жизненный цикл ---
+
+    def _ensure_executor(self) -> Executor:
+        if self._executor is None:
+            if self.workers > 0:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_worker_init)
+            else:
+                # Без процессов: рендерим в потоках, но очередь всё равно ограничена.
+                self._executor = ThreadPoolExecutor(max_workers=_THREAD_WORKERS, thread_name_prefix="docx")
+        return self._executor
+
+    def start(self) -> None:
+        """Поднимает процессы заранее (initializer грузит шаблон и данные)."""
+        with self._lock:
+            executor = self._ensure_executor()
+        if self.workers > 0:
+            for f in [executor.submit(_worker_ping) for _ in range(self.workers)]:
+                f.result()
+        else:
+            _worker_init()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _drop_executor(self, executor: Executor) -> None:
+        """Пул сломан (умер процесс-воркер) — выбросить; новый поднимет _ensure_executor()."""
+        with self._lock:
+            if self._executor is not executor:
+                return  # уже заменён другой задачей
+            self._executor = None
+            self._restarts += 1
+        log.error("docx_pool: процесс-воркер умер, пул будет пересоздан")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- работа ---
+
+    def submit(
+        self, payload: Dict[str, Any], data_version: Optional[str] = None
+    ) -> "Future[Tuple[DocxArchive, Spans, str]]":
+        """Ставит выгрузку в очередь или бросает DocxPoolBusy.
+
+        data_version — версия данных, на которой ждём документ (см. ДАННЫЕ).
+        Результат — (архив, этапы рендера в воркере для backend/metrics.py,
+        версия данных, на которой он собран; "" — не удалось определить).
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise DocxPoolBusy(self.retry_after)
+            self._pending += 1
+
+        submitted = time.perf_counter()
+        result: "Future[Tuple[DocxArchive, Spans, str]]" = Future()
+        result.set_running_or_notify_cancel()
+
+        def start(retry: bool) -> None:
+            with self._lock:
+                executor = self._ensure_executor()
+            try:
+                inner = executor.submit(_worker_render, payload, data_version)
+            except BrokenExecutor:
+                self._drop_executor(executor)
+                if not retry:
+                    raise
+                start(retry=False)
+                return
+            inner.add_done_callback(lambda f: done(f, executor, retry))
+
+        def done(f: Future, executor: Executor, retry: bool) -> None:
+            exc = CancelledError() if f.cancelled() else f.exception()
+            if isinstance(exc, BrokenExecutor):
+                self._drop_executor(executor)
+                if retry:
+                    try:
+                        start(retry=False)
+                        return
+                    except Exception as again:
+                        exc = again
+            with self._lock:
+                self._pending -= 1
+                if exc is None:
+                    archive, render_s, spans, version = f.result()
+                    self._completed += 1
+                    self._render_s.append(render_s)
+                    self._total_s.append(time.perf_counter() - submitted)
+                else:
+                    self._failed += 1
+            if exc is None:
+                result.set_result((archive, spans, version))
+            else:
+                result.set_exception(exc)
+
+        try:
+            start(retry=True)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+                self._failed += 1
+            raise
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            render = sorted(self._render_s)
+            total = sorted(self._total_s)
+            return {
+                "mode": "process" if self.workers > 0 else "thread",
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "queued": max(0, self._pending - (self.workers or _THREAD_WORKERS)),
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "restarts": self._restarts,
+                "render_ms": _percentiles(render),
+                "total_ms": _percentiles(total),
+            }
+
+
+def _percentiles(sorted_s: list[float]) -> Dict[str, float]:
+    if not sorted_s:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+
+    def pick(q: float) -> float:
+        idx = min(len(sorted_s) - 1, int(q * len(sorted_s)))
+        return round(sorted_s[idx] * 1000, 1)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "max": round(sorted_s[-1] * 1000, 1)}
+
+
+_pool: Optional[DocxRenderPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_docx_pool() -> DocxRenderPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DocxRenderPool.from_env()
+        return _pool
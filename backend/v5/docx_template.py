@@ -0,0 +1,73 @@
+"""backend/v5/docx_template.py
+
+ФАЙЛ ШАБЛОНА WORD БЕЗ python-docx
+
+ЗАЧЕМ
+  Ключ кеша готовых документов (docx_cache) зависит от шаблона и даты в
+  шапке ЛТ. Раньше за sha256 шаблона веб-процесс звал
+  get_compiled_template(): импорт python-docx/lxml и полный разбор
+  шаблона — хотя сам рендер идёт в процессах пула Word.
+
+КАК УСТРОЕНО
+  - TEMPLATE_PATH — путь к lt_template.docx (им же пользуется docx_gen).
+  - template_sha256() — sha256 сырых байт файла. Запоминаем вместе с
+    (mtime_ns, размер) и перечитываем файл, только если они изменились.
+  - document_date() — дата, которая попадает в шапку ЛТ;
+    suggest_filename() — имя файла выгрузки. Оба нужны веб-процессу на
+    каждой выгрузке, поэтому тоже живут здесь, а не в docx_gen.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .models import V5Input
+
+TEMPLATE_PATH = Path(__file__).resolve().parent / "templates" / "lt_template.docx"
+
+_sha_lock = threading.Lock()
+_sha: Optional[Tuple[Tuple[int, int], str]] = None
+
+
+def template_sha256() -> str:
+    """sha256 файла шаблона; файл читается заново, только если он изменился."""
+    global _sha
+
+    try:
+        st = TEMPLATE_PATH.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Не найден шаблон: {TEMPLATE_PATH}") from None
+    signature = (st.st_mtime_ns, st.st_size)
+
+    cached = _sha
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    with _sha_lock:
+        if _sha is None or _sha[0] != signature:
+            _sha = (signature, hashlib.sha256(TEMPLATE_PATH.read_bytes()).hexdigest())
+        return _sha[1]
+
+
+def document_date() -> str:
+    """Дата, которая попадает в шапку ЛТ (от неё зависит содержимое документа)."""
+    return datetime.now().strftime("%d.%m.%Y")
+
+
+def _safe_filename(name: str) -> str:
+    name = (name or "").strip() or "LT"
+    for ch in '<>:\\"/|?*':
+        name = name.replace(ch, "_")
+    return " ".join(name.split())[:80] or "LT"
+
+
+def suggest_filename(inp: V5Input) -> str:
+    c = inp.contacts
+    base = "Протокол_и_ЛТ"
+    if c and c.legal_name:
+        base = f"ЛТ_{_safe_filename(c.legal_name)}"
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{base}_{stamp}.docx"
@@ -0,0 +1,139 @@
+"""backend/v5/docx_zip.py
+
+МИНИМАЛЬНАЯ ZIP-СБОРКА ДЛЯ DOCX (без пересжатия неизменных частей)
+
+ЗАЧЕМ
+  DOCX — это zip. Из всего шаблона на каждый запрос меняется только
+  word/document.xml, а стили, тема, нумерация, колонтитулы, картинки и
+  шрифты — одни и те же. doc.save() каждый раз заново сжимает ВСЁ.
+
+КАК УСТРОЕНО
+  - ZipEntry — уже сжатая (raw deflate) часть архива + crc/размеры.
+    Неизменные части сжимаются один раз при компиляции шаблона.
+  - DocxArchive — упорядоченный список ZipEntry. Умеет:
+      * iter_chunks() — отдавать архив кусками (для StreamingResponse
+        и для записи копии на диск) без сборки целого bytes в памяти;
+      * size — точный размер архива (для Content-Length);
+      * to_bytes() — старое поведение «всё одним bytes».
+  - StoredDocx — уже собранный архив в bytes (например, из кеша на диске)
+    с тем же интерфейсом size / iter_chunks() / to_bytes().
+
+Формат — обычный zip (local header + data, central directory, EOCD),
+без zip64: DOCX заведомо меньше 4 ГБ.
+"""
+
+from __future__ import annotations
+
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Iterator, Sequence
+
+# 1980-01-01 00:00 — как у шаблона и у python-docx.
+_DOS_TIME = 0
+_DOS_DATE = (0 << 9) | (1 << 5) | 1
+
+_VERSION = 20
+_METHOD_DEFLATED = 8
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class ZipEntry:
+    name: str
+    crc: int
+    size: int
+    data: bytes  # raw deflate (без zlib-заголовка)
+
+    @property
+    def name_bytes(self) -> bytes:
+        return self.name.encode("utf-8")
+
+
+def deflate_entry(name: str, raw: bytes, level: int = 6) -> ZipEntry:
+    """Сжимает raw в запись архива (один раз — дальше переиспользуем)."""
+    comp = zlib.compressobj(level, zlib.DEFLATED, -15)
+    data = comp.compress(raw) + comp.flush()
+    return ZipEntry(name=name, crc=zlib.crc32(raw) & 0xFFFFFFFF, size=len(raw), data=data)
+
+
+def _flags(name: bytes) -> int:
+    # Бит 11 — имя в UTF-8 (в DOCX имена ASCII, но на всякий случай).
+    try:
+        name.decode("ascii")
+        return 0
+    except UnicodeDecodeError:
+        return 0x0800
+
+
+def _local_header(entry: ZipEntry) -> bytes:
+    name = entry.name_bytes
+    return _LOCAL_HEADER.pack(
+        0x04034B50, _VERSION, _flags(name), _METHOD_DEFLATED, _DOS_TIME, _DOS_DATE,
+        entry.crc, len(entry.data), entry.size, len(name), 0,
+    ) + name
+
+
+def _central_header(entry: ZipEntry, offset: int) -> bytes:
+    name = entry.name_bytes
+    return _CENTRAL_HEADER.pack(
+        0x02014B50, _VERSION, _VERSION, _flags(name), _METHOD_DEFLATED, _DOS_TIME, _DOS_DATE,
+        entry.crc, len(entry.data), entry.size, len(name), 0, 0, 0, 0, 0, offset,
+    ) + name
+
+
+class DocxArchive:
+    """Готовый к отдаче DOCX: упорядоченные сжатые части."""
+
+    def __init__(self, entries: Sequence[ZipEntry]):
+        self.entries = tuple(entries)
+
+    @property
+    def size(self) -> int:
+        total = _END_RECORD.size
+        for e in self.entries:
+            n = len(e.name_bytes)
+            total += _LOCAL_HEADER.size + n + len(e.data) + _CENTRAL_HEADER.size + n
+        return total
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        offset = 0
+        central: list[bytes] = []
+        for e in self.entries:
+            head = _local_header(e)
+            central.append(_central_header(e, offset))
+            yield head
+            for i in range(0, len(e.data), chunk_size):
+                yield e.data[i : i + chunk_size]
+            offset += len(head) + len(e.data)
+
+        cd = b"".join(central)
+        yield cd + _END_RECORD.pack(
+            0x06054B50, 0, 0, len(self.entries), len(self.entries), len(cd), offset, 0
+        )
+
+    def to_bytes(self) -> bytes:
+        return b"".join(self.iter_chunks())
+
+
+class StoredDocx:
+    """Готовый DOCX, уже собранный в bytes (тот же интерфейс, что у DocxArchive)."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        for i in range(0, len(self.data), chunk_size):
+            yield self.data[i : i + chunk_size]
+
+    def to_bytes(self) -> bytes:
+        return self.data
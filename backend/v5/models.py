@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List, Literal, Optional
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -88,6 +88,38 @@ class V5Input(BaseModel):
     product: Optional[ProductBlock] = None
 
 
+class ServicesEquipment(BaseModel):
+    """Оборудование из чек-листа менеджера — от него считаются «авто» услуги матрицы."""
+
+    regular_count: int = Field(default=0, ge=0, description="ККТ АТОЛ/Штрих")
+    smart_count: int = Field(default=0, ge=0, description="Смарт-терминалы")
+    other_count: int = Field(default=0, ge=0, description="Прочие ККТ")
+    scanners_count: int = Field(default=0, ge=0, description="Сканеры")
+    printers_count: int = Field(default=0, ge=0, description="Принтеры этикеток")
+
+
+class ServiceOverride(BaseModel):
+    """Ручная правка строки услуги (как serviceOverrides в UI)."""
+
+    qty: Optional[int] = Field(default=None, ge=0, description="Количество вместо рассчитанного")
+    unit_hours: Optional[float] = Field(default=None, ge=0, description="Часы за единицу вместо матрицы")
+
+
+class ServicesQuoteItem(BaseModel):
+    """Один пакет для расчёта услуг."""
+
+    package_id: str
+    equipment: ServicesEquipment = Field(default_factory=ServicesEquipment)
+    overrides: Dict[str, ServiceOverride] = Field(default_factory=dict, description="service_id -> правка")
+
+
+class ServicesQuoteInput(BaseModel):
+    """POST /api/v5/services-quote: несколько пакетов за один запрос (для сравнения)."""
+
+    items: List[ServicesQuoteItem] = Field(min_length=1, max_length=32)
+    services: bool = Field(default=True, description="Отдавать строки услуг (False — только группы и итоги)")
+
+
 class ServiceItem(BaseModel):
     label: str
     pts: int
@@ -133,3 +165,19 @@ class V5Result(BaseModel):
 
     # Для удобства UI
     kkt_confirmed: bool
+
+
+# Поля, которые UI и так знает из data.json/core_packages.json (дерево
+# групп и текст детализации пакета) — в compact-режиме их не отдаём.
+COMPACT_EXCLUDE = {"package": {"groups", "detail"}}
+
+
+def dump_v5_result(res: V5Result, fields: Optional[List[str]] = None, compact: bool = False) -> bytes:
+    """V5Result сразу в JSON-байты (pydantic-core), без повторной валидации.
+
+    fields  — оставить только эти поля верхнего уровня (package, calc, costs, ...).
+    compact — без package.groups и package.detail.
+    """
+    include = set(fields) if fields else None
+    exclude = COMPACT_EXCLUDE if compact else None
+    return res.model_dump_json(include=include, exclude=exclude).encode("utf-8")
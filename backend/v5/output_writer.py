@@ -0,0 +1,301 @@
+"""backend/v5/output_writer.py
+
+ФОНОВАЯ ЗАПИСЬ КОПИЙ WORD В ./output (с ретеншном)
+
+ЗАЧЕМ
+  Каждая выгрузка Word дополнительно сохраняется в ./output, чтобы ЛТ/КП
+  автоматически складывались в папку. Раньше запись шла прямо в запросе:
+  на сетевой шаре это тормозило выгрузку, папка росла бесконечно, а ошибки
+  глотались через `except Exception: pass`.
+
+КАК УСТРОЕНО
+  - submit() только кладёт документ в ограниченную очередь и сразу
+    возвращается. Если очередь полна — копия НЕ пишется (dropped += 1).
+  - Фоновый поток забирает пачку документов, пишет файлы и делает fsync
+    всей пачкой (плюс один fsync папки), а не по файлу на запрос.
+  - Ретеншн (по возрасту / количеству / суммарному размеру) — только если
+    задан хотя бы один лимит (по умолчанию выключен: ./output раньше
+    хранился вечно, и так и остаётся). Не чаще раза в минуту, удаляются
+    самые старые файлы. Трогает только копии, которые пишет этот модуль
+    (<YYYYmmdd_HHMMSS>__*.docx): AURORA_OUTPUT_DIR может указывать на
+    общую папку, чужие файлы в ней не удаляются.
+  - Счётчики written / dropped / failed и последняя ошибка видны в
+    /api/v5/docx/stats, ошибки пишутся в лог.
+
+НАСТРОЙКА (переменные окружения)
+  AURORA_OUTPUT_DIR        — папка (по умолчанию ./output в корне проекта).
+  AURORA_OUTPUT_ENABLED    — 0 = не сохранять копии вообще (по умолчанию 1).
+  AURORA_OUTPUT_QUEUE      — длина очереди (64).
+  AURORA_OUTPUT_KEEP_DAYS  — хранить не дольше N дней (0 = без лимита, по умолчанию).
+  AURORA_OUTPUT_KEEP_FILES — хранить не больше N файлов (0 = без лимита, по умолчанию).
+  AURORA_OUTPUT_KEEP_MB    — хранить не больше N МБ (0 = без лимита, по умолчанию).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .docx_zip import DocxArchive, StoredDocx
+
+log = logging.getLogger(__name__)
+
+_BATCH = 16
+_RETENTION_EVERY_S = 60.0
+_STOP = object()
+# Имена копий из submit(): штамп времени, "__", имя документа (+ _2, _3 из _open_new).
+_OWN_FILE = re.compile(r"^\d{8}_\d{6}__.+\.docx$")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _fsync_dir(path: Path) -> None:
+    # На Windows папку открыть для fsync нельзя — там это просто пропускаем.
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _open_new(path: Path):
+    # Две выгрузки одного клиента в одну секунду дают одинаковое имя —
+    # не затираем первую, а добавляем _2, _3, ...
+    candidate = path
+    for n in range(2, 1000):
+        try:
+            return candidate.open("xb")
+        except FileExistsError:
+            candidate = path.with_name(f"{path.stem}_{n}{path.suffix}")
+    return candidate.open("wb")
+
+
+class OutputArchiveWriter:
+    def __init__(
+        self,
+        out_dir: Path,
+        enabled: bool = True,
+        queue_size: int = 64,
+        keep_days: int = 0,
+        keep_files: int = 0,
+        keep_bytes: int = 0,
+    ):
+        self.out_dir = out_dir
+        self.enabled = enabled
+        self.keep_days = max(0, keep_days)
+        self.keep_files = max(0, keep_files)
+        self.keep_bytes = max(0, keep_bytes)
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, queue_size))
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._last_retention = 0.0
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._removed = 0
+        self._last_error = ""
+
+    @classmethod
+    def from_env(cls) -> "OutputArchiveWriter":
+        default_dir = Path(__file__).resolve().parents[2] / "output"
+        return cls(
+            out_dir=Path(os.getenv("AURORA_OUTPUT_DIR") or default_dir),
+            enabled=os.getenv("AURORA_OUTPUT_ENABLED", "1") not in ("0", "false", "no"),
+            queue_size=_env_int("AURORA_OUTPUT_QUEUE", 64),
+            keep_days=_env_int("AURORA_OUTPUT_KEEP_DAYS", 0),
+            keep_files=_env_int("AURORA_OUTPUT_KEEP_FILES", 0),
+            keep_bytes=_env_int("AURORA_OUTPUT_KEEP_MB", 0) * 1024 * 1024,
+        )
+
+    # --- API для запроса ---
+
+    def submit(self, filename: str, doc: Union[DocxArchive, StoredDocx]) -> bool:
+        """Ставит копию в очередь. False — очередь полна, копия отброшена."""
+        if not self.enabled:
+            return False
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_name = filename.replace("/", "_").replace("\\", "_")
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((f"{stamp}__{safe_name}", doc))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            log.warning("output: очередь копий переполнена, копия %s не сохранена", safe_name)
+            return False
+        return True
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Дописывает очередь и останавливает поток (при остановке сервера)."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "dir": str(self.out_dir),
+                "queued": self._queue.qsize(),
+                "written": self._written,
+                "dropped": self._dropped,
+                "failed": self._failed,
+                "removed_by_retention": self._removed,
+                "last_error": self._last_error,
+            }
+
+    # --- фоновый поток ---
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="aurora-output", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch: List[Tuple[str, Union[DocxArchive, StoredDocx]]] = []
+            stop = item is _STOP
+            if not stop:
+                batch.append(item)
+            while len(batch) < _BATCH and not stop:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            if batch:
+                self._write_batch(batch)
+            self._maybe_apply_retention(force=stop)
+            if stop:
+                return
+
+    def _write_batch(self, batch: List[Tuple[str, Union[DocxArchive, StoredDocx]]]) -> None:
+        try:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as exc:
+            self._record_failure(len(batch), f"mkdir {self.out_dir}: {exc}")
+            return
+
+        opened = []
+        for name, doc in batch:
+            path = self.out_dir / name
+            try:
+                f = _open_new(path)
+            except OSError as exc:
+                self._record_failure(1, f"{path}: {exc}")
+                continue
+            try:
+                for chunk in doc.iter_chunks():
+                    f.write(chunk)
+                f.flush()
+            except OSError as exc:
+                f.close()
+                self._record_failure(1, f"{path}: {exc}")
+                continue
+            opened.append((path, f))
+
+        # fsync пачкой: сначала пишем всё, потом синхронизируем.
+        written = 0
+        for path, f in opened:
+            try:
+                os.fsync(f.fileno())
+                written += 1
+            except OSError as exc:
+                self._record_failure(1, f"fsync {path}: {exc}")
+            finally:
+                f.close()
+        if opened:
+            try:
+                _fsync_dir(self.out_dir)
+            except OSError:
+                pass
+        with self._lock:
+            self._written += written
+
+    def _record_failure(self, count: int, message: str) -> None:
+        with self._lock:
+            self._failed += count
+            self._last_error = message
+        log.warning("output: не удалось сохранить копию: %s", message)
+
+    # --- ретеншн ---
+
+    def _maybe_apply_retention(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_retention < _RETENTION_EVERY_S:
+            return
+        self._last_retention = now
+        if not (self.keep_days or self.keep_files or self.keep_bytes):
+            return
+        try:
+            self._apply_retention()
+        except OSError as exc:
+            log.warning("output: ошибка ретеншна: %s", exc)
+
+    def _apply_retention(self) -> None:
+        if not self.out_dir.exists():
+            return
+        files = []
+        for path in self.out_dir.iterdir():
+            if not _OWN_FILE.match(path.name) or not path.is_file():
+                continue
+            st = path.stat()
+            files.append((st.st_mtime, st.st_size, path))
+        files.sort(reverse=True)  # новые первыми
+
+        cutoff = time.time() - self.keep_days * 86400 if self.keep_days else None
+        keep_total = 0
+        over_size = False
+        removed = 0
+        for idx, (mtime, size, path) in enumerate(files):
+            too_old = cutoff is not None and mtime < cutoff
+            too_many = bool(self.keep_files) and idx >= self.keep_files
+            # Как только вылезли за лимит размера — удаляем и всё, что старше.
+            over_size = over_size or (bool(self.keep_bytes) and keep_total + size > self.keep_bytes)
+            if too_old or too_many or over_size:
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError as exc:
+                    log.warning("output: не удалось удалить %s: %s", path, exc)
+                continue
+            keep_total += size
+        if removed:
+            with self._lock:
+                self._removed += removed
+
+
+_writer: Optional[OutputArchiveWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_output_writer() -> OutputArchiveWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = OutputArchiveWriter.from_env()
+        return _writer
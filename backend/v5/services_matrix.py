@@ -1,36 +1,111 @@
+"""backend/v5/services_matrix.py
+
+МАТРИЦА УСЛУГ МЕНЕДЖЕРА (manager_matrix_v5.json) И ПРЕСЕТЫ ПАКЕТОВ
+
+Менеджерский UI грузит матрицу на каждом экране, а ответ всегда один и
+тот же. Поэтому матрица «компилируется» один раз на снимок данных
+(см. data.py):
+  - услуги заранее сгруппированы по package_id;
+  - вся матрица и пресет каждого пакета уже сериализованы в JSON-байты
+    с ETag и сжатыми вариантами (PreparedBody из static_cache.py).
+Эндпоинты отдают эти байты как есть и отвечают 304 на If-None-Match.
+"""
+
 from __future__ import annotations
 
 import json
-from functools import lru_cache
-from pathlib import Path
-from typing import Any, Dict, List
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from ..static_cache import PreparedBody, prepare_body
+from .data import DATA_DIR, get_data_snapshots
 
 
-@lru_cache(maxsize=1)
 def load_services_matrix() -> Dict[str, Any]:
-    base_dir = Path(__file__).resolve().parents[2]
-    matrix_path = base_dir / "frontend_shared" / "data" / "manager_matrix_v5.json"
-    if not matrix_path.exists():
-        raise RuntimeError(f"Не найден файл матрицы услуг: {matrix_path}")
-    return json.loads(matrix_path.read_text(encoding="utf-8"))
+    """Матрица услуг из текущего снимка данных (см. data.py)."""
+    matrix = get_data_snapshots().current().matrix
+    if matrix is None:
+        raise RuntimeError(f"Не найден файл матрицы услуг: {DATA_DIR / 'manager_matrix_v5.json'}")
+    return matrix
 
 
-def get_package_preset(package_id: str) -> Dict[str, Any]:
-    matrix = load_services_matrix()
+def _to_json(payload: Any) -> PreparedBody:
+    # Так же, как сериализует FastAPI (JSONResponse): UTF-8 без пробелов.
+    raw = json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    return prepare_body(raw, "application/json")
+
+
+def _build_preset(matrix: Dict[str, Any], package_id: str, services: List[Dict[str, Any]]) -> Dict[str, Any]:
     packages = matrix.get("packages") or []
-    services = matrix.get("services") or []
-    groups = matrix.get("groups") or []
-    normalized = str(package_id or "").strip()
-    package = next((p for p in packages if str(p.get("id") or "") == normalized), None)
-    preset_services = [svc for svc in services if str(svc.get("package_id") or "") == normalized]
+    package = next((p for p in packages if str(p.get("id") or "") == package_id), None)
     return {
         "rate_per_hour": matrix.get("rate_per_hour", 4950),
         "package": package,
-        "groups": groups,
-        "services": preset_services,
+        "groups": matrix.get("groups") or [],
+        "services": services,
     }
 
 
+@dataclass(frozen=True)
+class CompiledMatrix:
+    source: Dict[str, Any]
+    full: PreparedBody
+    services_by_package: Dict[str, List[Dict[str, Any]]]
+    presets: Dict[str, PreparedBody]
+
+
+def _compile_matrix(matrix: Dict[str, Any]) -> CompiledMatrix:
+    services_by_package: Dict[str, List[Dict[str, Any]]] = {}
+    for svc in matrix.get("services") or []:
+        services_by_package.setdefault(str(svc.get("package_id") or ""), []).append(svc)
+
+    package_ids = {str(p.get("id") or "") for p in matrix.get("packages") or []}
+    presets = {
+        pid: _to_json(_build_preset(matrix, pid, services_by_package.get(pid, [])))
+        for pid in package_ids | set(services_by_package)
+    }
+    return CompiledMatrix(
+        source=matrix,
+        full=_to_json(matrix),
+        services_by_package=services_by_package,
+        presets=presets,
+    )
+
+
+_compiled: Optional[CompiledMatrix] = None
+_compiled_lock = threading.Lock()
+
+
+def get_compiled_matrix() -> CompiledMatrix:
+    """CompiledMatrix для текущего снимка (пересобирается при смене версии данных)."""
+    global _compiled
+    matrix = load_services_matrix()
+    compiled = _compiled
+    if compiled is not None and compiled.source is matrix:
+        return compiled
+    with _compiled_lock:
+        if _compiled is None or _compiled.source is not matrix:
+            _compiled = _compile_matrix(matrix)
+        return _compiled
+
+
+def get_package_preset(package_id: str) -> Dict[str, Any]:
+    normalized = str(package_id or "").strip()
+    compiled = get_compiled_matrix()
+    return _build_preset(compiled.source, normalized, compiled.services_by_package.get(normalized, []))
+
+
+def get_package_preset_body(package_id: str) -> PreparedBody:
+    """Пресет пакета готовыми JSON-байтами (неизвестный id — пустой пресет, как раньше)."""
+    normalized = str(package_id or "").strip()
+    compiled = get_compiled_matrix()
+    body = compiled.presets.get(normalized)
+    if body is None:
+        body = _to_json(_build_preset(compiled.source, normalized, []))
+    return body
+
+
 def list_packages() -> List[Dict[str, Any]]:
     matrix = load_services_matrix()
     return matrix.get("packages") or []
@@ -0,0 +1,250 @@
+"""backend/v5/services_quote.py
+
+РАСЧЁТ УСЛУГ МЕНЕДЖЕРА ПО МАТРИЦЕ (POST /api/v5/services-quote)
+
+services_matrix.py только отдаёт manager_matrix_v5.json, а часы × ставку
+считал браузер — каждый раз заново по всей матрице. Здесь тот же расчёт
+на сервере, чтобы слабым ноутбукам менеджеров не пересчитывать матрицу на
+каждое изменение, а выгрузка Word могла брать цифры из того же места.
+
+КАК УСТРОЕНО
+  - Матрица «компилируется» один раз на снимок данных (см. data.py) в
+    таблицы по package_id: строки услуг уже разложены по группам в порядке
+    matrix.groups, часы приведены к float, источник авто-количества
+    (auto_dep.source) уже сопоставлен с функцией от оборудования.
+  - На запрос: по оборудованию из чек-листа один раз считаем значения
+    источников (kkt_total, scanner_total, ...), дальше по строкам
+    qty = qty_default + int(источник × multiplier), часы = qty × unit_hours,
+    рубли = round(часы × rate_per_hour) по строке (как recalc в
+    managerV5Calc.js), суммы по группам и итог.
+  - Несколько пакетов за один запрос — для сравнения карточек пакетов.
+
+ИСТОЧНИКИ АВТО-КОЛИЧЕСТВА (auto_dep.source)
+  kkt_total / kkt_physical — касс всего (обычные + смарт + прочие);
+  kkt_work_units           — «рабочих единиц»: смарт и прочие считаются за 2;
+  scanner_total / scanners — сканеры;  printer_total / printers — принтеры.
+  Неизвестный источник считается как 0 и попадает в warnings пакета.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from ..metrics import span
+from .data import get_data_snapshots
+from .models import ServicesEquipment, ServicesQuoteInput, ServicesQuoteItem
+
+DEFAULT_RATE_PER_HOUR = 4950
+
+
+class ServicesQuoteError(ValueError):
+    pass
+
+
+def _kkt_physical(eq: ServicesEquipment) -> int:
+    return eq.regular_count + eq.smart_count + eq.other_count
+
+
+def _kkt_work_units(eq: ServicesEquipment) -> int:
+    return eq.regular_count + 2 * (eq.smart_count + eq.other_count)
+
+
+_DRIVERS: Dict[str, Callable[[ServicesEquipment], int]] = {
+    "kkt_total": _kkt_physical,
+    "kkt_physical": _kkt_physical,
+    "kkt_work_units": _kkt_work_units,
+    "scanner_total": lambda eq: eq.scanners_count,
+    "scanners": lambda eq: eq.scanners_count,
+    "printer_total": lambda eq: eq.printers_count,
+    "printers": lambda eq: eq.printers_count,
+}
+
+
+@dataclass(frozen=True)
+class _Line:
+    service_id: str
+    title: str
+    unit_hours: float
+    qty_default: int
+    driver: str  # "" — количество из пресета
+    multiplier: float
+
+
+@dataclass(frozen=True)
+class _Group:
+    id: str
+    title: str
+    lines: Tuple[_Line, ...]
+
+
+@dataclass(frozen=True)
+class _PackageTable:
+    package_id: str
+    title: str
+    groups: Tuple[_Group, ...]
+    drivers: FrozenSet[str]
+    warnings: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class CompiledQuotes:
+    source: Dict[str, Any]
+    rate_per_hour: float
+    packages: Dict[str, _PackageTable]
+
+
+def _number(value: Any, default: float = 0.0) -> float:
+    try:
+        num = float(value)
+    except (TypeError, ValueError):
+        return default
+    return num if math.isfinite(num) and num >= 0 else default
+
+
+def _compile_package(package_id: str, title: str, services: List[Dict[str, Any]], group_titles: Dict[str, str]) -> _PackageTable:
+    by_group: Dict[str, List[_Line]] = {}
+    warnings: List[str] = []
+    for svc in services:
+        service_id = str(svc.get("service_id") or "")
+        driver = ""
+        multiplier = 1.0
+        if svc.get("qty_mode") == "auto":
+            dep = svc.get("auto_dep") or {}
+            driver = str(dep.get("source") or "")
+            multiplier = _number(dep.get("multiplier"), 1.0)
+            if driver not in _DRIVERS:
+                warnings.append(f"{service_id}: неизвестный источник количества {driver!r}")
+        by_group.setdefault(str(svc.get("group_id") or ""), []).append(_Line(
+            service_id=service_id,
+            title=str(svc.get("title") or service_id),
+            unit_hours=_number(svc.get("unit_hours")),
+            qty_default=int(_number(svc.get("qty_default"))),
+            driver=driver,
+            multiplier=multiplier,
+        ))
+
+    # Порядок групп — как в matrix.groups, незнакомые группы — в конце.
+    order = [gid for gid in group_titles if gid in by_group] + [gid for gid in by_group if gid not in group_titles]
+    groups = tuple(_Group(gid, group_titles.get(gid, gid), tuple(by_group[gid])) for gid in order)
+    drivers = frozenset(line.driver for g in groups for line in g.lines if line.driver in _DRIVERS)
+    return _PackageTable(package_id, title, groups, drivers, tuple(warnings))
+
+
+def _compile_quotes(matrix: Dict[str, Any]) -> CompiledQuotes:
+    group_titles = {str(g.get("id") or ""): str(g.get("title") or g.get("id") or "") for g in matrix.get("groups") or []}
+    services_by_package: Dict[str, List[Dict[str, Any]]] = {}
+    for svc in matrix.get("services") or []:
+        services_by_package.setdefault(str(svc.get("package_id") or ""), []).append(svc)
+
+    titles = {str(p.get("id") or ""): str(p.get("title") or p.get("id") or "") for p in matrix.get("packages") or []}
+    packages = {
+        pid: _compile_package(pid, titles.get(pid, pid), services_by_package.get(pid, []), group_titles)
+        for pid in list(titles) + [pid for pid in services_by_package if pid not in titles]
+    }
+    rate = _number(matrix.get("rate_per_hour"), DEFAULT_RATE_PER_HOUR) or DEFAULT_RATE_PER_HOUR
+    if rate.is_integer():
+        rate = int(rate)
+    return CompiledQuotes(source=matrix, rate_per_hour=rate, packages=packages)
+
+
+_compiled: Optional[CompiledQuotes] = None
+_compiled_lock = threading.Lock()
+
+
+def get_compiled_quotes(matrix: Dict[str, Any]) -> CompiledQuotes:
+    """CompiledQuotes для матрицы из снимка (пересобирается при смене версии данных)."""
+    global _compiled
+    compiled = _compiled
+    if compiled is not None and compiled.source is matrix:
+        return compiled
+    with _compiled_lock:
+        if _compiled is None or _compiled.source is not matrix:
+            _compiled = _compile_quotes(matrix)
+        return _compiled
+
+
+def _round_rub(value: float) -> int:
+    # Math.round из JS (половина — вверх), а не банковское округление round().
+    return int(math.floor(value + 0.5))
+
+
+def _quote_package(table: _PackageTable, item: ServicesQuoteItem, rate: float, with_services: bool) -> Dict[str, Any]:
+    eq = item.equipment
+    drivers = {name: _DRIVERS[name](eq) for name in table.drivers}
+    overrides = item.overrides
+
+    groups_out: List[Dict[str, Any]] = []
+    services_out: List[Dict[str, Any]] = []
+    total_hours = 0.0
+    total_rub = 0
+    for group in table.groups:
+        group_hours = 0.0
+        group_rub = 0
+        for line in group.lines:
+            if line.driver:
+                qty = max(0, line.qty_default + int(drivers.get(line.driver, 0) * line.multiplier))
+                source = "auto"
+            else:
+                qty = line.qty_default
+                source = "preset"
+            unit_hours = line.unit_hours
+            override = overrides.get(line.service_id)
+            if override is not None:
+                if override.qty is not None:
+                    qty = override.qty
+                    source = "override"
+                if override.unit_hours is not None:
+                    unit_hours = override.unit_hours
+                    source = "override"
+            hours = qty * unit_hours
+            rub = _round_rub(hours * rate)
+            group_hours += hours
+            group_rub += rub
+            if with_services:
+                services_out.append({
+                    "service_id": line.service_id,
+                    "title": line.title,
+                    "group_id": group.id,
+                    "qty": qty,
+                    "unit_hours": unit_hours,
+                    "hours": hours,
+                    "rub": rub,
+                    "qty_source": source,
+                })
+        groups_out.append({"id": group.id, "title": group.title, "hours": group_hours, "rub": group_rub})
+        total_hours += group_hours
+        total_rub += group_rub
+
+    quote: Dict[str, Any] = {
+        "package_id": table.package_id,
+        "title": table.title,
+        "drivers": drivers,
+        "groups": groups_out,
+        "total_hours": total_hours,
+        "total_rub": total_rub,
+    }
+    if with_services:
+        quote["services"] = services_out
+    if table.warnings:
+        quote["warnings"] = list(table.warnings)
+    return quote
+
+
+def quote_services(inp: ServicesQuoteInput) -> Dict[str, Any]:
+    """Часы и рубли услуг по группам для каждого пакета из inp.items (в том же порядке)."""
+    snap = get_data_snapshots().current()
+    if snap.matrix is None:
+        raise RuntimeError("Не найден файл матрицы услуг manager_matrix_v5.json")
+    with span("services.quote"):
+        compiled = get_compiled_quotes(snap.matrix)
+        unknown = sorted({item.package_id for item in inp.items if item.package_id not in compiled.packages})
+        if unknown:
+            raise ServicesQuoteError(f"неизвестный package_id: {', '.join(unknown)}")
+        quotes = [
+            _quote_package(compiled.packages[item.package_id], item, compiled.rate_per_hour, inp.services)
+            for item in inp.items
+        ]
+    return {"version": snap.version, "rate_per_hour": compiled.rate_per_hour, "quotes": quotes}
@@ -0,0 +1,190 @@
+# ФАЙЛ: backend/warmup.py
+# ЗАЧЕМ НУЖЕН:
+#   Прогрев при старте сервера и его статус для GET /ready.
+#   Раньше data.json, матрица услуг и шаблон Word грузились на первом
+#   запросе пользователя — он и был медленным. Теперь это делает lifespan
+#   (см. main.py). python-docx/lxml веб-процессу нужны, только если Word
+#   собирается в нём самом (AURORA_DOCX_WORKERS=0).
+#
+# ШАГИ (AURORA_WARMUP, через запятую, по порядку):
+#   data      — снимок данных (v5/data.py) и скомпилированные цены калькулятора;
+#   matrix    — матрица услуг менеджера и таблицы расчёта услуг;
+#   static    — статика: ETag и сжатые копии (static_cache.py);
+#   template  — разобранный шаблон Word (python-docx) в этом процессе;
+#   docx_pool — процессы пула Word (каждый сам грузит шаблон и данные).
+#   По умолчанию все, кроме template, если у пула есть процессы
+#   (AURORA_DOCX_WORKERS>0): шаблон разбирают они сами в _worker_init,
+#   веб-процессу он не нужен. "none" — ничего не прогревать.
+#
+# ПРОФИЛЬ СТАРТА (AURORA_STARTUP):
+#   fast (по умолчанию) — прогрев идёт в фоновом потоке, запросы
+#          принимаются сразу: каждый воркер uvicorn не держит старт,
+#          пока поднимает пул и сжимает статику. Пока прогрев не
+#          закончился, /ready отвечает 503 — балансировщик не пустит на
+#          процесс трафик раньше времени; запрос, пришедший напрямую,
+#          просто догрузит нужное сам, как до прогрева.
+#   full — сервер начинает принимать запросы только после прогрева
+#          (когда перед сервером нет ничего, что смотрит на /ready).
+#
+# СОСТОЯНИЕ ДЛЯ /ready: warming — идёт прогрев; ready — все шаги прошли;
+#   degraded — прогрев закончен, но какой-то шаг упал (битый шаблон, пул
+#   Word не поднялся). degraded — тоже 503: такой процесс не должен
+#   получать трафик.
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+
+def _warm_data() -> None:
+    from .v5.calc import get_compiled_pricing
+    from .v5.data import get_data_snapshots
+
+    get_data_snapshots().current()
+    get_compiled_pricing()
+
+
+def _warm_matrix() -> None:
+    from .v5.data import get_data_snapshots
+    from .v5.services_matrix import get_compiled_matrix
+    from .v5.services_quote import get_compiled_quotes
+
+    get_compiled_matrix()
+    matrix = get_data_snapshots().current().matrix
+    if matrix is not None:
+        get_compiled_quotes(matrix)
+
+
+def _warm_static() -> None:
+    from .static_cache import warm_static
+
+    warm_static()
+
+
+def _warm_template() -> None:
+    from .v5.docx_gen import get_compiled_template
+
+    get_compiled_template()
+
+
+def _warm_docx_pool() -> None:
+    from .v5.docx_pool import get_docx_pool
+
+    get_docx_pool().start()
+
+
+STEPS: Dict[str, Callable[[], None]] = {
+    "data": _warm_data,
+    "matrix": _warm_matrix,
+    "static": _warm_static,
+    "template": _warm_template,
+    "docx_pool": _warm_docx_pool,
+}
+
+
+class Warmup:
+    def __init__(self, steps: List[str], background: bool):
+        self.steps = steps
+        self.background = background
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, Any]] = {name: {"state": "pending"} for name in steps}
+        self._thread: Optional[threading.Thread] = None
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+
+    @classmethod
+    def from_env(cls) -> "Warmup":
+        raw = (os.getenv("AURORA_WARMUP") or "").strip()
+        if raw.lower() == "none":
+            steps: List[str] = []
+        elif raw:
+            steps = [s.strip() for s in raw.split(",") if s.strip()]
+            unknown = [s for s in steps if s not in STEPS]
+            if unknown:
+                log.warning("warmup: неизвестные шаги %s (есть: %s)", unknown, ", ".join(STEPS))
+            steps = [s for s in steps if s in STEPS]
+        else:
+            from .v5.docx_pool import get_docx_pool
+
+            pooled = get_docx_pool().workers > 0
+            steps = [s for s in STEPS if not (s == "template" and pooled)]
+        profile = (os.getenv("AURORA_STARTUP") or "fast").strip().lower()
+        return cls(steps, background=profile != "full")
+
+    def run(self) -> None:
+        """Выполнить шаги по очереди. Упавший шаг не останавливает остальные."""
+        with self._lock:
+            self._started_at = time.time()
+        for name in self.steps:
+            with self._lock:
+                self._state[name] = {"state": "running"}
+            started = time.perf_counter()
+            try:
+                STEPS[name]()
+            except Exception as exc:
+                log.exception("warmup: шаг %s не выполнен", name)
+                result = {"state": "error", "error": f"{type(exc).__name__}: {exc}"}
+            else:
+                result = {"state": "done"}
+            result["seconds"] = round(time.perf_counter() - started, 3)
+            with self._lock:
+                self._state[name] = result
+        with self._lock:
+            self._finished_at = time.time()
+        log.info("warmup: готово за %.2f с", self._finished_at - (self._started_at or self._finished_at))
+
+    def start(self) -> None:
+        """full — прогреть сейчас; fast — в фоновом потоке и сразу вернуться."""
+        if not self.background:
+            self.run()
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.run, name="aurora-warmup", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    @property
+    def ready(self) -> bool:
+        return self.status()["ready"]
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = {name: dict(state) for name, state in self._state.items()}
+            finished = self._finished_at is not None or not self.steps
+            seconds = None
+            if self._started_at is not None:
+                seconds = round((self._finished_at or time.time()) - self._started_at, 3)
+        errors = [name for name, s in steps.items() if s["state"] == "error"]
+        state = "warming" if not finished else ("degraded" if errors else "ready")
+        return {
+            "ready": state == "ready",
+            "state": state,
+            "profile": "fast" if self.background else "full",
+            "seconds": seconds,
+            "errors": errors,
+            "steps": steps,
+        }
+
+
+_warmup: Optional[Warmup] = None
+_warmup_lock = threading.Lock()
+
+
+def get_warmup() -> Warmup:
+    global _warmup
+    with _warmup_lock:
+        if _warmup is None:
+            _warmup = Warmup.from_env()
+        return _warmup
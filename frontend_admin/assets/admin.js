@@ -48,6 +48,10 @@ function toast(title, body = '', kind = 'ok', ms = 2800) {
 
 let currentData = null;
 let currentCore = null;
+// То, что сейчас лежит на сервере (последняя загрузка/сохранение): от него
+// считаем JSON Patch, чтобы отправлять только правки, а не файл целиком.
+let savedData = null;
+let savedCore = null;
 const CORE_PRICE_PER_POINT = 4950;
 
 // Короткие пояснения к полям points_model (чтобы было понятно «что за что отвечает»)
@@ -597,20 +601,76 @@ function saveToken() {
   setMsg('Токен сохранён в браузере.');
 }
 
+// ETag последней загруженной/сохранённой версии файла (по адресу API).
+// Сохранение отправляет его в If-Match: если файл успел поменять кто-то
+// другой, сервер ответит 412, а не затрёт чужую правку.
+const etags = {};
+
 async function api(path, opts = {}) {
   const token = getToken();
   const headers = { ...(opts.headers || {}) };
   if (token) headers['X-Aurora-Admin'] = token;
+  const method = (opts.method || 'GET').toUpperCase();
+  if (method !== 'GET' && etags[path]) headers['If-Match'] = etags[path];
   const r = await fetch(path, { ...opts, headers });
   const text = await r.text();
   let data;
   try { data = text ? JSON.parse(text) : null; } catch { data = text; }
+  if (r.status === 412) {
+    throw new Error('Файл уже изменили в другой вкладке или другим пользователем. Загрузите данные заново и повторите правку.');
+  }
   if (!r.ok) {
     throw new Error(typeof data === 'string' ? data : (data?.detail || `HTTP ${r.status}`));
   }
+  const etag = r.headers.get('ETag');
+  if (etag) etags[path] = etag;
   return data;
 }
 
+// JSON Pointer (RFC 6901): "/" и "~" внутри ключа экранируются.
+function jsonPointer(path, key) {
+  return path + '/' + String(key).replace(/~/g, '~0').replace(/\//g, '~1');
+}
+
+// Список операций JSON Patch (RFC 6902), превращающий from в to.
+// Объекты сравниваем по ключам, списки одной длины — по элементам;
+// список другой длины заменяем целиком (проще и всё равно короче файла).
+function jsonDiff(from, to, path = '', ops = []) {
+  const isObj = v => v && typeof v === 'object' && !Array.isArray(v);
+  if (Array.isArray(from) && Array.isArray(to) && from.length === to.length) {
+    from.forEach((v, i) => jsonDiff(v, to[i], jsonPointer(path, i), ops));
+  } else if (isObj(from) && isObj(to)) {
+    Object.keys(from).forEach(k => {
+      if (!(k in to)) ops.push({ op: 'remove', path: jsonPointer(path, k) });
+    });
+    Object.keys(to).forEach(k => {
+      if (k in from) jsonDiff(from[k], to[k], jsonPointer(path, k), ops);
+      else ops.push({ op: 'add', path: jsonPointer(path, k), value: to[k] });
+    });
+  } else if (JSON.stringify(from) !== JSON.stringify(to)) {
+    ops.push({ op: 'replace', path, value: to });
+  }
+  return ops;
+}
+
+const clone = v => JSON.parse(JSON.stringify(v));
+
+// PATCH, если знаем, что лежит на сервере; иначе — PUT целиком.
+async function saveJson(path, saved, obj) {
+  if (!saved) {
+    return api(path, {
+      method: 'PUT',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(obj),
+    });
+  }
+  return api(path, {
+    method: 'PATCH',
+    headers: { 'Content-Type': 'application/json-patch+json' },
+    body: JSON.stringify(jsonDiff(saved, obj)),
+  });
+}
+
 async function loadData() {
   const [data, core] = await Promise.all([
     api('/api/admin/data'),
@@ -618,6 +678,8 @@ async function loadData() {
   ]);
   currentData = data;
   currentCore = core;
+  savedData = clone(data);
+  savedCore = clone(core);
   syncJsonFromData();
   renderQuick(currentData);
   setMsg('Данные загружены. Можно править в «Быстрых настройках» или прямо в JSON.');
@@ -648,13 +710,11 @@ async function saveData() {
   currentData = obj;
   renderQuick(currentData);
 
-  const res = await api('/api/admin/data', {
-    method: 'PUT',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify(obj),
-  });
-  if (res?.ok) setMsg('Сохранено. Расчёт уже работает с новыми ценами.');
-  else setMsg('Не удалось сохранить: ' + JSON.stringify(res), 'err');
+  const res = await saveJson('/api/admin/data', savedData, obj);
+  if (res?.ok) {
+    savedData = clone(obj);
+    setMsg('Сохранено. Расчёт уже работает с новыми ценами.');
+  } else setMsg('Не удалось сохранить: ' + JSON.stringify(res), 'err');
 }
 
 function validateCorePackages(obj) {
@@ -696,12 +756,9 @@ async function saveCorePackages() {
   if (warnings.length) {
     setMsg('Core пакеты: сохраню, но есть предупреждения:<br><ul style="margin:6px 0 0 18px">' + warnings.map(p => `<li>${p}</li>`).join('') + '</ul>');
   }
-  const res = await api('/api/admin/core-packages', {
-    method: 'PUT',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify(core),
-  });
+  const res = await saveJson('/api/admin/core-packages', savedCore, core);
   if (res?.ok) {
+    savedCore = clone(core);
     if (!warnings.length) setMsg('Core пакеты сохранены.');
   } else {
     setMsg('Не удалось сохранить core пакеты: ' + JSON.stringify(res), 'err');
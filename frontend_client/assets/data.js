@@ -6,19 +6,24 @@
 // КАК ПРАВИТЬ ДАННЫЕ:
 //   Открой файл: frontend_shared/data/data.json
 //   Там всё в одном месте: пакеты, цены, коэффициенты.
+//
+// КЕШ:
+//   cache: 'no-cache' — браузер хранит копию, но каждый раз сверяет ETag
+//   с сервером (обычно 304 без тела). После сохранения в админке ETag
+//   меняется, и приходит новый файл.
 // ------------------------------------------------------------
 
 let _DATA = null;
 
 export async function loadData() {
   if (_DATA) return _DATA;
-  const res = await fetch('/data/data.json', { cache: 'no-store' });
+  const res = await fetch('/data/data.json', { cache: 'no-cache' });
   if (!res.ok) {
     throw new Error('Не удалось загрузить /data/data.json');
   }
   _DATA = await res.json();
   try {
-    const coreRes = await fetch('/data/core_packages.json', { cache: 'no-store' });
+    const coreRes = await fetch('/data/core_packages.json', { cache: 'no-cache' });
     if (coreRes.ok) {
       _DATA.core_packages = await coreRes.json();
     }
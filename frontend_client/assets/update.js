@@ -55,7 +55,8 @@ export async function update() {
 
   const my = ++_reqSeq;
   try {
-    const r = await fetch('/api/v5/calculate', {
+    // fast=1 — тот же JSON, но сервер сериализует его сразу, без повторной проверки модели.
+    const r = await fetch('/api/v5/calculate?fast=1', {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({
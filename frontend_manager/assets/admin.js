@@ -396,17 +396,29 @@ function saveToken() {
   setMsg('Токен сохранён в браузере.');
 }
 
+// ETag последней загруженной/сохранённой версии файла (по адресу API).
+// Сохранение отправляет его в If-Match: если файл успел поменять кто-то
+// другой, сервер ответит 412, а не затрёт чужую правку.
+const etags = {};
+
 async function api(path, opts = {}) {
   const token = getToken();
   const headers = { ...(opts.headers || {}) };
   if (token) headers['X-Aurora-Admin'] = token;
+  const method = (opts.method || 'GET').toUpperCase();
+  if (method !== 'GET' && etags[path]) headers['If-Match'] = etags[path];
   const r = await fetch(path, { ...opts, headers });
   const text = await r.text();
   let data;
   try { data = text ? JSON.parse(text) : null; } catch { data = text; }
+  if (r.status === 412) {
+    throw new Error('Файл уже изменили в другой вкладке или другим пользователем. Загрузите данные заново и повторите правку.');
+  }
   if (!r.ok) {
     throw new Error(typeof data === 'string' ? data : (data?.detail || `HTTP ${r.status}`));
   }
+  const etag = r.headers.get('ETag');
+  if (etag) etags[path] = etag;
   return data;
 }
 
@@ -22,7 +22,7 @@ import { initDropdownGlobalClose } from './components/dropdown.js';
 import { initInfoModal } from './components/info_modal.js';
 import { initServiceGraphModal } from './ui/service_graph.js';
 import { el } from './dom.js';
-import { validatePackagePresets } from './services.js';
+import { loadPackagePresetQuotes, validatePackagePresets } from './services.js';
 
 async function init() {
   window.__AURORA_APP_BOOTED = true;
@@ -30,6 +30,7 @@ async function init() {
   // 1) Данные
   await loadData();
   validatePackagePresets();
+  await loadPackagePresetQuotes();
 
   // 2) Глобальные «мелочи»
   initDropdownGlobalClose();
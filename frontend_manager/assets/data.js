@@ -6,6 +6,11 @@
 // КАК ПРАВИТЬ ДАННЫЕ:
 //   Открой файл: frontend_shared/data/data.json
 //   Там всё в одном месте: пакеты, цены, коэффициенты.
+//
+// КЕШ:
+//   cache: 'no-cache' — браузер хранит копию, но каждый раз сверяет ETag
+//   с сервером (обычно 304 без тела). После сохранения в админке ETag
+//   меняется, и приходит новый файл.
 // ------------------------------------------------------------
 
 let _DATA = null;
@@ -17,7 +22,7 @@ const MANAGER_MATRIX_FALLBACK_URL = '/data/manager_matrix_v5.json';
 export async function loadData() {
   if (_DATA) return _DATA;
   try {
-    const res = await fetch(DATA_URL, { cache: 'no-store' });
+    const res = await fetch(DATA_URL, { cache: 'no-cache' });
     if (!res.ok) {
       console.error('[Aurora][manager_v5] Data fetch failed', {
         url: DATA_URL,
@@ -37,7 +42,7 @@ export async function loadData() {
     return _DATA;
   }
   try {
-    const coreRes = await fetch(CORE_PACKAGES_URL, { cache: 'no-store' });
+    const coreRes = await fetch(CORE_PACKAGES_URL, { cache: 'no-cache' });
     if (coreRes.ok) {
       _DATA.core_packages = await coreRes.json();
     } else {
@@ -55,7 +60,7 @@ export async function loadData() {
     });
   }
   try {
-    const matrixRes = await fetch(MANAGER_MATRIX_URL, { cache: 'no-store' });
+    const matrixRes = await fetch(MANAGER_MATRIX_URL, { cache: 'no-cache' });
     if (matrixRes.ok) {
       _DATA.manager_matrix_v5 = await matrixRes.json();
       _DATA.__matrixError = '';
@@ -76,7 +81,7 @@ export async function loadData() {
   }
   if (_DATA.__matrixError) {
     try {
-      const fallbackRes = await fetch(MANAGER_MATRIX_FALLBACK_URL, { cache: 'no-store' });
+      const fallbackRes = await fetch(MANAGER_MATRIX_FALLBACK_URL, { cache: 'no-cache' });
       if (fallbackRes.ok) {
         _DATA.manager_matrix_v5 = await fallbackRes.json();
         _DATA.__matrixError = '';
@@ -18,6 +18,7 @@ import {
   isEquipmentAvailable,
   isKktAvailable,
   isScannerAvailable,
+  loadPackagePresetQuotes,
   validatePackagePresets,
 } from './services_calc.js';
 
@@ -32,6 +33,7 @@ export {
   isEquipmentAvailable,
   isKktAvailable,
   isScannerAvailable,
+  loadPackagePresetQuotes,
   validatePackagePresets,
   getEquipmentDefaults,
 };
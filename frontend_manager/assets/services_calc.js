@@ -287,7 +287,47 @@ export function applyAutoFromEquipment(services, equipment) { return applyEquipm
 export function computeTotals(services, rateOverride) { return calcServiceTotalsFromServices(services, rateOverride); }
 export const calcServiceTotals = computeTotals;
 
+// Итоги пресетов с сервера (POST /api/v5/services-quote): package_id -> { totalHours, totalRub }.
+// Карточки пакетов берут их отсюда, а не пересчитывают матрицу при каждой перерисовке.
+let _presetQuotes = null;
+
+export async function loadPackagePresetQuotes() {
+  const items = PACKAGE_IDS.map((packageId) => {
+    const defaults = getEquipmentDefaults(packageId);
+    return {
+      package_id: packageId,
+      equipment: {
+        regular_count: defaults.kkt.regularCount,
+        smart_count: defaults.kkt.smartCount,
+        other_count: defaults.kkt.otherCount,
+        scanners_count: defaults.scannersCount,
+        printers_count: defaults.printersCount,
+      },
+    };
+  });
+  try {
+    const res = await fetch('/api/v5/services-quote', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ items, services: false }),
+    });
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    const { quotes } = await res.json();
+    _presetQuotes = {};
+    quotes.forEach((q) => {
+      _presetQuotes[q.package_id] = { totalHours: Number(q.total_hours || 0), totalRub: Number(q.total_rub || 0) };
+    });
+  } catch (err) {
+    // Нет сервера (старая версия, file://) — считаем локально, как раньше.
+    _presetQuotes = null;
+    console.warn('[Aurora][manager_v5] services-quote недоступен, итоги пакетов считаются в браузере', err);
+  }
+  return _presetQuotes;
+}
+
 export function getPackagePresetTotals(packageId, detailed = false) {
+  const quoted = _presetQuotes?.[String(packageId || '')];
+  if (quoted) return { ...quoted };
   const { services } = getPackagePreset(packageId, detailed);
   const defaults = getEquipmentDefaults(packageId);
   applyEquipmentToServices(services, {
@@ -0,0 +1,14 @@
+import pytest
+
+from backend.v5.batch import BatchInputError, resolve_pricing
+
+
+@pytest.mark.parametrize("override", [
+    {"segments": [1]},
+    {"segments": {"Опт": "x"}},
+    {"segments": {"Опт": [1]}},
+    {"points_model": 5},
+])
+def test_malformed_pricing_override_is_input_error(override):
+    with pytest.raises(BatchInputError):
+        resolve_pricing(override)
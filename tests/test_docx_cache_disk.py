@@ -0,0 +1,41 @@
+from backend.v5 import docx_cache
+from backend.v5.docx_cache import DocxCache
+from backend.v5.docx_zip import StoredDocx
+
+
+def _cache(tmp_path, disk_max_bytes):
+    return DocxCache(max_items=64, max_bytes=1 << 20, disk_dir=tmp_path, disk_max_bytes=disk_max_bytes)
+
+
+def _count_prunes(monkeypatch, cache):
+    calls = []
+    prune = cache._disk_prune
+
+    def counted():
+        calls.append(1)
+        prune()
+
+    monkeypatch.setattr(cache, "_disk_prune", counted)
+    return calls
+
+
+def test_disk_put_scans_folder_only_on_first_write_and_overflow(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, disk_max_bytes=1000)
+    calls = _count_prunes(monkeypatch, cache)
+    for i in range(9):
+        cache.put(f"k{i}", StoredDocx(b"x" * 100))
+    assert len(calls) == 1  # первая запись: узнать, сколько уже лежит в папке
+
+    cache.put("k9", StoredDocx(b"x" * 100))
+    cache.put("k10", StoredDocx(b"x" * 100))  # 1100 байт > лимита
+    assert len(calls) == 2
+    assert sum(p.stat().st_size for p in tmp_path.glob("*.docx")) <= 1000
+
+
+def test_disk_put_rescans_periodically(tmp_path, monkeypatch):
+    monkeypatch.setattr(docx_cache, "_DISK_RESCAN_EVERY", 4)
+    cache = _cache(tmp_path, disk_max_bytes=1 << 20)
+    calls = _count_prunes(monkeypatch, cache)
+    for i in range(8):
+        cache.put(f"k{i}", StoredDocx(b"x" * 10))
+    assert len(calls) == 3  # 1-я, 4-я и 8-я запись
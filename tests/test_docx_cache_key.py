@@ -0,0 +1,29 @@
+import subprocess
+import sys
+from pathlib import Path
+
+_ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_cache_key_does_not_import_python_docx():
+    code = (
+        "import sys\n"
+        "from backend import main\n"
+        "from backend.v5.docx_cache import docx_cache_key\n"
+        "from backend.v5.docx_template import suggest_filename\n"
+        "from backend.v5.models import V5Input\n"
+        "inp = V5Input.model_validate({'segments': ['Опт']})\n"
+        "docx_cache_key(inp, 'v'); suggest_filename(inp)\n"
+        "assert 'docx' not in sys.modules, 'python-docx imported'\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=_ROOT, check=True)
+
+
+def test_template_hash_is_sha256_of_file_bytes():
+    import hashlib
+
+    from backend.v5.docx_gen import get_compiled_template
+    from backend.v5.docx_template import TEMPLATE_PATH, template_sha256
+
+    assert template_sha256() == hashlib.sha256(TEMPLATE_PATH.read_bytes()).hexdigest()
+    assert template_sha256() == get_compiled_template().sha256
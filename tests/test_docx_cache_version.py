@@ -0,0 +1,54 @@
+from fastapi.testclient import TestClient
+
+from backend import api_routes, main
+from backend.v5 import docx_pool
+from backend.v5.docx_cache import DocxCache, docx_cache_key
+from backend.v5.docx_zip import StoredDocx
+from backend.v5.models import V5Input
+
+_PAYLOAD = {"segments": ["Опт"]}
+
+
+class _NoOutput:
+    def submit(self, filename, archive):
+        pass
+
+
+def _setup(monkeypatch, rendered_version):
+    cache = DocxCache(max_items=8, max_bytes=1 << 20, disk_dir=None, disk_max_bytes=0)
+    pool = docx_pool.DocxRenderPool(workers=0, max_pending=4, retry_after=1)
+
+    def render(payload, data_version):
+        version = data_version if rendered_version is None else rendered_version
+        return StoredDocx(b"PK-" + version.encode()), 0.0, {}, version
+
+    monkeypatch.setattr(docx_pool, "_worker_render", render)
+    monkeypatch.setattr(api_routes, "get_docx_cache", lambda: cache)
+    monkeypatch.setattr(api_routes, "get_docx_pool", lambda: pool)
+    monkeypatch.setattr(api_routes, "get_output_writer", lambda: _NoOutput())
+    monkeypatch.setattr(api_routes, "load_data_version", lambda: "v-key")
+    return cache, pool
+
+
+def test_docx_rendered_on_other_data_version_is_not_cached(monkeypatch):
+    cache, pool = _setup(monkeypatch, rendered_version="v-worker")
+    try:
+        r = TestClient(main.app).post("/api/v5/docx", json=_PAYLOAD)
+    finally:
+        pool.shutdown()
+    assert r.status_code == 200
+    inp = V5Input.model_validate(_PAYLOAD)
+    assert cache.stats()["items"] == 0
+    assert r.headers["etag"] == f'"{docx_cache_key(inp, "v-worker")}"'
+
+
+def test_docx_rendered_on_key_version_is_cached(monkeypatch):
+    cache, pool = _setup(monkeypatch, rendered_version=None)
+    try:
+        r = TestClient(main.app).post("/api/v5/docx", json=_PAYLOAD)
+    finally:
+        pool.shutdown()
+    assert r.status_code == 200
+    key = docx_cache_key(V5Input.model_validate(_PAYLOAD), "v-key")
+    assert r.headers["etag"] == f'"{key}"'
+    assert cache.get(key) is not None
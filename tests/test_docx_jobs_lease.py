@@ -0,0 +1,24 @@
+from backend.v5.docx_jobs import DocxJobQueue
+from backend.v5.models import V5Input
+
+
+def _queue(tmp_path):
+    return DocxJobQueue(tmp_path / "jobs.sqlite3", workers=0, max_queued=10, lease_s=60, keep_hours=0)
+
+
+def test_worker_whose_lease_was_taken_over_cannot_write_result(tmp_path):
+    q = _queue(tmp_path)
+    job_id = q.submit(V5Input.model_validate({"segments": ["Опт"]}))["id"]
+
+    row_a, owner_a = q._claim()
+    assert q._renew(job_id, owner_a)
+    with q._connect() as conn:  # аренда A истекла
+        conn.execute("UPDATE docx_jobs SET lease_until = 0 WHERE id = ?", (job_id,))
+
+    row_b, owner_b = q._claim()
+    assert row_b["id"] == job_id and owner_b != owner_a
+
+    assert not q._renew(job_id, owner_a)
+    assert not q._finish(job_id, owner_a, status="done", error="", size=1, etag='"a"', document=b"a")
+    assert q._finish(job_id, owner_b, status="done", error="", size=1, etag='"b"', document=b"b")
+    assert q.document(job_id)[1:] == ('"b"', b"b")
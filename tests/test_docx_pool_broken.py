@@ -0,0 +1,29 @@
+import os
+import signal
+
+from backend.v5.docx_pool import DocxRenderPool
+
+_PAYLOAD = {"segments": ["Опт"]}
+
+
+def _kill_workers(pool):
+    for pid in list(pool._executor._processes):
+        os.kill(pid, signal.SIGKILL)
+
+
+def test_pool_recovers_after_worker_death():
+    pool = DocxRenderPool(workers=1, max_pending=4, retry_after=1)
+    pool.start()
+    try:
+        broken = pool._executor
+        _kill_workers(pool)
+        archive, _spans, _version = pool.submit(_PAYLOAD).result(timeout=120)
+        assert archive.to_bytes()[:2] == b"PK"
+        assert pool._executor is not broken
+        assert pool.stats()["restarts"] == 1
+        # и следующие выгрузки идут на новом пуле
+        archive, _spans, _version = pool.submit(_PAYLOAD).result(timeout=120)
+        assert archive.to_bytes()[:2] == b"PK"
+        assert pool.stats()["pending"] == 0
+    finally:
+        pool.shutdown()
@@ -0,0 +1,27 @@
+import json
+import shutil
+
+from backend.v5 import data as data_module
+from backend.v5.data import DATA_DIR, DataSnapshotManager
+from backend.v5.docx_pool import _worker_render
+
+_PAYLOAD = {"segments": ["Опт"]}
+
+
+def test_worker_rereads_data_when_expected_version_differs(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    shutil.copytree(DATA_DIR, data_dir)
+    # Свой снимок у «воркера» и таймер проверки, который сам не сработает.
+    worker = DataSnapshotManager(data_dir, check_interval=3600)
+    monkeypatch.setattr(data_module, "_manager", worker)
+    old = worker.current().version
+
+    core = data_dir / "core_packages.json"
+    core.write_text(json.dumps(json.loads(core.read_text(encoding="utf-8")), ensure_ascii=False), encoding="utf-8")
+    new = DataSnapshotManager(data_dir, check_interval=0).current().version
+    assert new != old and worker.current().version == old
+
+    archive, _render_s, _spans, version = _worker_render(_PAYLOAD, new)
+    assert version == new
+    assert archive.to_bytes()[:2] == b"PK"
+    assert worker.current().version == new
@@ -0,0 +1,22 @@
+from backend.json_patch import apply_patch
+
+
+def test_copy_of_owned_container_is_independent():
+    doc = {"a": {"x": 1}}
+    out = apply_patch(doc, [
+        {"op": "replace", "path": "/a/x", "value": 2},
+        {"op": "copy", "from": "/a", "path": "/b"},
+        {"op": "replace", "path": "/b/x", "value": 99},
+    ])
+    assert out == {"a": {"x": 2}, "b": {"x": 99}}
+    assert doc == {"a": {"x": 1}}
+
+
+def test_copy_does_not_touch_source_document():
+    doc = {"d": {"e": 1}}
+    out = apply_patch(doc, [
+        {"op": "copy", "from": "/d", "path": "/f"},
+        {"op": "add", "path": "/f/x", "value": 1},
+    ])
+    assert out == {"d": {"e": 1}, "f": {"e": 1, "x": 1}}
+    assert doc == {"d": {"e": 1}}
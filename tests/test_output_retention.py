@@ -0,0 +1,25 @@
+import os
+import time
+
+from backend.v5.output_writer import OutputArchiveWriter
+
+
+def test_retention_is_off_by_default(monkeypatch, tmp_path):
+    for name in ("AURORA_OUTPUT_KEEP_DAYS", "AURORA_OUTPUT_KEEP_FILES", "AURORA_OUTPUT_KEEP_MB"):
+        monkeypatch.delenv(name, raising=False)
+    w = OutputArchiveWriter.from_env()
+    assert (w.keep_days, w.keep_files, w.keep_bytes) == (0, 0, 0)
+
+
+def test_retention_removes_only_own_copies(tmp_path):
+    old = time.time() - 10 * 86400
+    own = [tmp_path / "20260101_120000__ЛТ_Клиент.docx", tmp_path / "20260101_120000__ЛТ_Клиент_2.docx"]
+    foreign = [tmp_path / "отчёт.docx", tmp_path / "notes.txt", tmp_path / "20260101_120000__x.xlsx"]
+    for path in own + foreign:
+        path.write_bytes(b"x")
+        os.utime(path, (old, old))
+
+    OutputArchiveWriter(tmp_path, keep_days=1)._apply_retention()
+
+    assert not any(p.exists() for p in own)
+    assert all(p.exists() for p in foreign)
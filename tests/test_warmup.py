@@ -0,0 +1,43 @@
+from fastapi.testclient import TestClient
+
+from backend import main, warmup
+from backend.v5 import docx_pool
+
+
+def _fail():
+    raise RuntimeError("шаблон битый")
+
+
+def test_ready_is_503_when_a_step_failed(monkeypatch):
+    monkeypatch.setitem(warmup.STEPS, "template", _fail)
+    w = warmup.Warmup(["data", "template"], background=False)
+    w.run()
+    monkeypatch.setattr(main, "get_warmup", lambda: w)
+
+    r = TestClient(main.app).get("/ready")
+    assert r.status_code == 503
+    assert r.json()["state"] == "degraded"
+    assert r.json()["errors"] == ["template"]
+    assert not w.ready
+
+
+def test_ready_is_200_when_all_steps_done(monkeypatch):
+    w = warmup.Warmup(["data"], background=False)
+    w.run()
+    monkeypatch.setattr(main, "get_warmup", lambda: w)
+
+    r = TestClient(main.app).get("/ready")
+    assert r.status_code == 200
+    assert r.json()["state"] == "ready"
+
+
+def test_default_steps_skip_template_when_pool_has_processes(monkeypatch):
+    monkeypatch.delenv("AURORA_WARMUP", raising=False)
+    monkeypatch.delenv("AURORA_STARTUP", raising=False)
+    monkeypatch.setattr(docx_pool, "_pool", docx_pool.DocxRenderPool(workers=2, max_pending=8, retry_after=1))
+    w = warmup.Warmup.from_env()
+    assert "template" not in w.steps and "docx_pool" in w.steps
+    assert w.background
+
+    monkeypatch.setattr(docx_pool, "_pool", docx_pool.DocxRenderPool(workers=0, max_pending=8, retry_after=1))
+    assert "template" in warmup.Warmup.from_env().steps
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Микробенчмарки сборки Word (backend/v5/docx_gen.py).
+
+Usage:
+  python tools/bench_docx.py fonts [--repeat 50]
+  python tools/bench_docx.py tasks [--repeat 20] [--rows 10 100 1000]
+
+fonts — нормализация шрифта Arial 8:
+  before: старый обход всего документа через обёртки python-docx
+          (Paragraph/Run/Table/Cell), как было в _force_arial_8 раньше;
+  after:  один lxml-проход по <w:r> всего тела (верхняя граница — на запрос
+          теперь обрабатываются только вставленные генератором элементы);
+  render: полная сборка render_docx() для справки.
+
+tasks — вставка N строк в таблицу задач:
+  before: по строке: deepcopy образца, addprevious, _Row.cells и
+          _Cell.text на каждую ячейку (как было в _fill_tasks_table);
+  after:  _RowTemplate (образец готовится один раз, текст — прямо в <w:r>)
+          + _splice_rows_before (все строки одной вставкой).
+  Копия документа (new_document) в замер не входит.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from copy import deepcopy
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from docx.shared import Pt  # noqa: E402
+from docx.table import _Row  # noqa: E402
+
+from backend.v5 import docx_gen  # noqa: E402
+from backend.v5.calc import calculate_v5  # noqa: E402
+from backend.v5.models import V5Input  # noqa: E402
+
+SAMPLE_INPUT = {
+    "segments": ["Опт", "Розница"],
+    "kkt": [{"vendor": "АТОЛ", "model": "11Ф"}] * 3,
+    "devices": [{"type": "scanner"}, {"type": "tsd"}, {"type": "tsd"}],
+    "tsd_collective": True,
+    "has_edo": False,
+    "needs_aggregation": True,
+    "contacts": {"legal_name": "ООО Ромашка", "contact_name": "Иван"},
+}
+
+
+def _timeit(fn: Callable[[], object], repeat: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def _legacy_force_arial_8(doc) -> None:
+    def walk_paragraphs(paragraphs) -> None:
+        for p in paragraphs:
+            for r in p.runs:
+                r.font.name = "Arial"
+                r.font.size = Pt(8)
+
+    def walk_tables(tables) -> None:
+        for t in tables:
+            for row in t.rows:
+                for cell in row.cells:
+                    walk_paragraphs(cell.paragraphs)
+                    walk_tables(cell.tables)
+
+    walk_paragraphs(doc.paragraphs)
+    walk_tables(doc.tables)
+
+
+def bench_fonts(repeat: int) -> None:
+    inp = V5Input(**SAMPLE_INPUT)
+    res = calculate_v5(inp)
+    tpl = docx_gen.get_compiled_template()
+    doc = tpl.new_document()
+
+    before = _timeit(lambda: _legacy_force_arial_8(doc), repeat)
+    after = _timeit(lambda: docx_gen._force_arial_8([doc.element.body]), repeat)
+    render = _timeit(lambda: docx_gen.render_docx(inp, res), repeat)
+
+    print(f"fonts before (python-docx walk): {before:8.2f} ms")
+    print(f"fonts after  (lxml pass, body):  {after:8.2f} ms  (x{before / after:.1f})")
+    print(f"render_docx total:               {render:8.2f} ms")
+
+
+def _legacy_insert_rows(nested, check_tr, sample_tr, rows) -> None:
+    for label, rub in rows:
+        tr = deepcopy(sample_tr)
+        check_tr.addprevious(tr)
+        r = _Row(tr, nested).cells
+        r[0].text = label
+        r[1].text = label
+        r[2].text = str(rub)
+        r[3].text = str(rub)
+        r[4].text = ""
+        r[5].text = ""
+
+
+def _bulk_insert_rows(nested, check_tr, sample_tr, rows) -> None:
+    row_tpl = docx_gen._RowTemplate.from_sample(sample_tr, columns=6)
+    docx_gen._splice_rows_before(
+        check_tr, [row_tpl.render((label, label, str(rub), str(rub), "", "")) for label, rub in rows]
+    )
+
+
+def bench_tasks(repeat: int, counts: list[int]) -> None:
+    tpl = docx_gen.get_compiled_template()
+
+    def measure(insert: Callable, rows: list) -> float:
+        spent = 0.0
+        for i in range(repeat + 1):
+            # Копия документа — вне замера: меряем только вставку строк.
+            doc = tpl.new_document()
+            _, nested = tpl.locate(doc)
+            trs = nested._tbl.tr_lst
+            started = time.perf_counter()
+            insert(nested, trs[tpl.check_row], trs[tpl.header_row + 1], rows)
+            if i > 0:  # первый прогон — прогрев
+                spent += time.perf_counter() - started
+        return spent / repeat * 1000
+
+    for n in counts:
+        rows = [(f"Задача {i}", 1000 + i) for i in range(n)]
+        before = measure(_legacy_insert_rows, rows)
+        after = measure(_bulk_insert_rows, rows)
+        print(f"rows={n:5}  before: {before:8.2f} ms   after: {after:8.2f} ms  (x{before / after:.1f})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Микробенчмарки сборки Word")
+    parser.add_argument("bench", choices=["fonts", "tasks"], help="Что измерять")
+    parser.add_argument("--repeat", type=int, default=None, help="Сколько повторов (fonts: 50, tasks: 20)")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000], help="tasks: сколько строк")
+    args = parser.parse_args()
+
+    if args.bench == "fonts":
+        bench_fonts(args.repeat or 50)
+    elif args.bench == "tasks":
+        bench_tasks(args.repeat or 20, args.rows)
+
+
+if __name__ == "__main__":
+    main()
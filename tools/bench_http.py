@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Пропускная способность HTTP-слоя (middleware) без сети.
+
+Usage:
+  python tools/bench_http.py [--requests 2000] [--concurrency 16]
+
+Запросы идут прямо в ASGI-приложение (без uvicorn и сокетов), поэтому
+разница между вариантами — это именно стоимость middleware:
+  before: два слоя @app.middleware("http") (BaseHTTPMiddleware), как было
+          раньше: BasicAuth с разбором заголовка на каждом запросе +
+          no_cache_static;
+  after:  один чистый ASGI AuroraMiddleware (backend/asgi_middleware.py).
+Оба варианта оборачивают один и тот же роутер приложения, BasicAuth включён.
+
+Маршруты: GET /data/data.json и POST /api/v5/calculate.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import secrets
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.middleware.asyncexitstack import AsyncExitStackMiddleware  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+from starlette.types import ASGIApp  # noqa: E402
+
+from backend.asgi_middleware import AuroraMiddleware  # noqa: E402
+from backend.main import app  # noqa: E402
+
+USER, PASS = "bench", "bench-password"
+AUTH = b"Basic " + base64.b64encode(f"{USER}:{PASS}".encode("utf-8"))
+
+CALC_BODY = json.dumps({
+    "segments": ["Опт", "Розница"],
+    "kkt": [{"vendor": "АТОЛ", "model": "11Ф"}] * 3,
+    "devices": [{"type": "scanner"}, {"type": "tsd"}],
+    "needs_aggregation": True,
+}, ensure_ascii=False).encode("utf-8")
+
+
+def _legacy_stack(inner: ASGIApp) -> ASGIApp:
+    def check(request: Request) -> bool:
+        hdr = request.headers.get("authorization") or ""
+        if not hdr.lower().startswith("basic "):
+            return False
+        try:
+            user, pwd = base64.b64decode(hdr.split(" ", 1)[1]).decode("utf-8").split(":", 1)
+        except Exception:
+            return False
+        return secrets.compare_digest(user, USER) and secrets.compare_digest(pwd, PASS)
+
+    async def basic_auth(request: Request, call_next):
+        if request.url.path == "/health":
+            return await call_next(request)
+        if not check(request):
+            return JSONResponse(status_code=401, content={"detail": "Unauthorized"},
+                                headers={"WWW-Authenticate": "Basic"})
+        return await call_next(request)
+
+    async def no_cache_static(request: Request, call_next):
+        response = await call_next(request)
+        p = request.url.path
+        if p.startswith("/data/") or "/assets/" in p or p.endswith(".html"):
+            response.headers["Cache-Control"] = "no-store, max-age=0"
+        return response
+
+    # Порядок как у декораторов: последний зарегистрированный — снаружи.
+    return BaseHTTPMiddleware(BaseHTTPMiddleware(inner, dispatch=basic_auth), dispatch=no_cache_static)
+
+
+async def _request(asgi: ASGIApp, method: str, path: str, body: bytes) -> int:
+    headers: List[Tuple[bytes, bytes]] = [(b"host", b"bench"), (b"authorization", AUTH)]
+    if body:
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": headers,
+        "client": ("127.0.0.1", 1), "server": ("bench", 80), "state": {},
+    }
+    sent = False
+    status = 0
+
+    async def receive() -> Dict:
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message: Dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await asgi(scope, receive, send)
+    return status
+
+
+async def _run(asgi: ASGIApp, method: str, path: str, body: bytes, total: int, concurrency: int) -> float:
+    status = await _request(asgi, method, path, body)
+    if status != 200:
+        raise SystemExit(f"{method} {path}: HTTP {status}")
+    remaining = total
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await _request(asgi, method, path, body)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    # Тот же внутренний слой, что FastAPI ставит под пользовательскими middleware.
+    inner = AsyncExitStackMiddleware(app.router)
+    variants: Dict[str, Callable[[], ASGIApp]] = {
+        "before": lambda: _legacy_stack(inner),
+        "after": lambda: AuroraMiddleware(inner, user=USER, password=PASS),
+    }
+    routes = [("GET", "/data/data.json", b""), ("POST", "/api/v5/calculate", CALC_BODY)]
+
+    print(f"pid={os.getpid()} requests={args.requests} concurrency={args.concurrency}")
+    for method, path, body in routes:
+        for name, build in variants.items():
+            rps = asyncio.run(_run(build(), method, path, body, args.requests, args.concurrency))
+            print(f"{method:4} {path:22} {name:6} {rps:9.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,53 @@
 
 Usage:
   python tools/import_core_packages_xlsx.py 3123131.xlsx --sheet "Лист1" --out frontend_shared/data/core_packages.json
+  python tools/import_core_packages_xlsx.py regions/*.xlsx --all-sheets --jobs 8
+  python tools/import_core_packages_xlsx.py regions/*.xlsx --all-sheets --dry-run --diff-json diff.json
+
+Несколько файлов и листов:
+  - пакеты всех листов собираются в один core_packages.json в порядке
+    файлов и листов; пакет с тем же id из более позднего листа заменяет
+    ранний (в stderr — предупреждение);
+  - листы читаются параллельно в отдельных процессах (--jobs, по умолчанию
+    по числу ядер), openpyxl — в потоковом режиме read_only: в памяти
+    только текущая строка, без стилей.
+
+Повторный импорт:
+  - у каждого листа считается хеш содержимого прямо по xlsx как zip-архиву
+    (XML листа + общие строки книги), без openpyxl;
+  - лист с тем же хешем, что в прошлый раз, не читается — пакеты берутся из
+    кеша (--cache, по умолчанию tools/.import_cache/core_packages_xlsx.json;
+    --no-cache — читать всё заново).
+
+Перед записью печатается структурный diff с текущим --out: какие пакеты
+добавились/удалились, какие поля, группы и детализации поменялись.
+--dry-run — только показать diff, --diff-json — сохранить его в файл.
+Если ничего не поменялось, файл не перезаписывается.
 """
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
+import os
+import posixpath
+import sys
+import uuid
+import xml.etree.ElementTree as ET
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import openpyxl  # type: ignore
 
 RUB_PER_POINT = 4950
 
+# Меняется вместе с логикой разбора: старый кеш с другой версией не используется.
+PARSER_VERSION = 2
+
+DEFAULT_CACHE = Path(__file__).resolve().parent / ".import_cache" / "core_packages_xlsx.json"
+
 SEGMENT_MAP = {
     "Только розница": ("retail_only", "Только розница"),
     "Только опт": ("wholesale_only", "Только опт"),
@@ -24,6 +59,10 @@ SEGMENT_MAP = {
     "Производитель + розница": ("producer_retail", "Производитель + розница"),
 }
 
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
 
 def _to_int(value: Any) -> Optional[int]:
     if value is None or value == "":
@@ -56,20 +95,16 @@ def _ensure_group(groups: List[Dict[str, Any]], index: Dict[str, Dict[str, Any]]
     return group
 
 
-def parse_xlsx(path: Path, sheet: str) -> Dict[str, Any]:
-    wb = openpyxl.load_workbook(path)
-    if sheet not in wb.sheetnames:
-        raise SystemExit(f"Лист {sheet!r} не найден. Доступно: {wb.sheetnames}")
-
-    ws = wb[sheet]
+def parse_rows(rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Пакеты из строк листа (значения ячеек A..F)."""
     packages: List[Dict[str, Any]] = []
 
     current: Optional[Dict[str, Any]] = None
     groups: List[Dict[str, Any]] = []
     group_index: Dict[str, Dict[str, Any]] = {}
 
-    for row in ws.iter_rows(values_only=True):
-        a, b, c, d, e, f = (row + (None,) * 6)[:6]
+    for row in rows:
+        a, b, c, d, e, f = (tuple(row) + (None,) * 6)[:6]
         if a:
             seg = _normalize_segment(str(a))
             if seg:
@@ -120,20 +155,305 @@ def parse_xlsx(path: Path, sheet: str) -> Dict[str, Any]:
         if not pkg.get("price_rub"):
             pkg["price_rub"] = total_points * RUB_PER_POINT
 
-    return {"packages": packages}
+    return packages
+
+
+def parse_xlsx(path: Path, sheet: str) -> Dict[str, Any]:
+    # read_only — потоковое чтение строк; data_only — значения формул
+    # (как их сохранил Excel), а не текст "=СУММ(...)".
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet not in wb.sheetnames:
+            raise SystemExit(f"{path}: лист {sheet!r} не найден. Доступно: {wb.sheetnames}")
+        ws = wb[sheet]
+        return {"packages": parse_rows(ws.iter_rows(max_col=6, values_only=True))}
+    finally:
+        wb.close()
+
+
+# --- хеши листов (xlsx — zip с XML внутри) ---
+
+def _rels(zf: zipfile.ZipFile, part: str) -> Dict[str, Tuple[str, str]]:
+    """Связи части part: Id -> (тип, путь внутри архива)."""
+    folder, name = posixpath.split(part)
+    rels_path = posixpath.join(folder, "_rels", name + ".rels")
+    try:
+        root = ET.fromstring(zf.read(rels_path))
+    except KeyError:
+        return {}
+    out: Dict[str, Tuple[str, str]] = {}
+    for rel in root.iter(f"{_NS_PKG_REL}Relationship"):
+        target = rel.get("Target") or ""
+        target = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(folder, target))
+        out[rel.get("Id") or ""] = (rel.get("Type") or "", target)
+    return out
+
+
+def sheet_digests(path: Path) -> Dict[str, str]:
+    """Имя листа -> sha256 его содержимого (в порядке листов книги).
+
+    Значения ячеек листа целиком определяются XML листа и таблицей общих
+    строк книги — их и хешируем. Правка другого листа может поменять общие
+    строки, тогда лист перечитается лишний раз; пропустить изменение так
+    нельзя.
+    """
+    with zipfile.ZipFile(path) as zf:
+        book = next((t for typ, t in _rels(zf, "").values() if typ.endswith("/officeDocument")), "xl/workbook.xml")
+        book_rels = _rels(zf, book)
+        shared = b""
+        for typ, target in book_rels.values():
+            if typ.endswith("/sharedStrings"):
+                shared = zf.read(target)
+        shared_hash = hashlib.sha256(shared).digest()
+
+        out: Dict[str, str] = {}
+        for sheet in ET.fromstring(zf.read(book)).iter(f"{_NS_MAIN}sheet"):
+            rel = book_rels.get(sheet.get(f"{_NS_REL}id") or "")
+            if rel is None or not rel[0].endswith("/worksheet"):
+                continue  # листы-диаграммы и т.п.
+            h = hashlib.sha256(shared_hash)
+            h.update(zf.read(rel[1]))
+            out[sheet.get("name") or ""] = h.hexdigest()
+        return out
+
+
+# --- кеш прошлого импорта ---
+
+def _cache_key(path: Path, sheet: str) -> str:
+    return f"{path.resolve()}::{sheet}"
+
+
+def load_cache(path: Optional[Path]) -> Dict[str, Any]:
+    if path is None:
+        return {}
+    try:
+        cache = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("parser_version") != PARSER_VERSION:
+        return {}
+    sheets = cache.get("sheets")
+    return sheets if isinstance(sheets, dict) else {}
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    try:
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def save_cache(path: Optional[Path], sheets: Dict[str, Any]) -> None:
+    if path is not None:
+        _write_atomic(path, json.dumps({"parser_version": PARSER_VERSION, "sheets": sheets}, ensure_ascii=False))
+
+
+# --- импорт ---
+
+def _parse_task(task: Tuple[str, str]) -> List[Dict[str, Any]]:
+    path, sheet = task
+    return parse_xlsx(Path(path), sheet)["packages"]
+
+
+def import_sheets(
+    files: Sequence[Path],
+    sheets: Optional[Sequence[str]],
+    jobs: int,
+    cache: Dict[str, Any],
+) -> Tuple[List[Tuple[Path, str, List[Dict[str, Any]]]], Dict[str, Any], int]:
+    """Прочитать листы (None — все листы каждого файла).
+
+    Возвращает [(файл, лист, пакеты)] в порядке файлов и листов, новый кеш и
+    сколько листов пришлось читать (остальные — из кеша).
+    """
+    plan: List[Tuple[Path, str, str]] = []  # файл, лист, хеш
+    for path in files:
+        digests = sheet_digests(path)
+        names = list(digests) if sheets is None else list(sheets)
+        for name in names:
+            if name not in digests:
+                raise SystemExit(f"{path}: лист {name!r} не найден. Доступно: {list(digests)}")
+            plan.append((path, name, digests[name]))
+
+    results: Dict[int, List[Dict[str, Any]]] = {}
+    todo: List[int] = []
+    for i, (path, name, digest) in enumerate(plan):
+        hit = cache.get(_cache_key(path, name))
+        if isinstance(hit, dict) and hit.get("digest") == digest and isinstance(hit.get("packages"), list):
+            results[i] = hit["packages"]
+        else:
+            todo.append(i)
+
+    tasks = [(str(plan[i][0]), plan[i][1]) for i in todo]
+    workers = max(1, min(jobs, len(tasks)))
+    if workers == 1:
+        parsed = [_parse_task(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(_parse_task, tasks))
+    results.update(zip(todo, parsed))
+
+    new_cache = {
+        _cache_key(path, name): {"digest": digest, "packages": results[i]}
+        for i, (path, name, digest) in enumerate(plan)
+    }
+    return [(path, name, results[i]) for i, (path, name, _d) in enumerate(plan)], new_cache, len(todo)
+
+
+def merge_packages(parts: Sequence[Tuple[Path, str, List[Dict[str, Any]]]]) -> Dict[str, Any]:
+    by_id: Dict[str, Dict[str, Any]] = {}
+    source: Dict[str, str] = {}
+    for path, sheet, packages in parts:
+        where = f"{path.name}:{sheet}"
+        for pkg in packages:
+            pid = str(pkg.get("id"))
+            if pid in by_id:
+                print(f"ВНИМАНИЕ: пакет {pid!r} из {where} заменяет пакет из {source[pid]}", file=sys.stderr)
+            by_id[pid] = pkg
+            source[pid] = where
+    return {"packages": list(by_id.values())}
+
+
+# --- diff ---
+
+_PACKAGE_FIELDS = ("title", "segment_key", "total_points", "price_rub")
+_DETAILS_SHOWN = 20
+
+
+def _diff_group(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    changes: List[Dict[str, Any]] = []
+    for field in ("points", "note"):
+        if old.get(field) != new.get(field):
+            changes.append({"field": field, "old": old.get(field), "new": new.get(field)})
+    old_details = [(d.get("text"), d.get("points")) for d in old.get("details") or []]
+    new_details = [(d.get("text"), d.get("points")) for d in new.get("details") or []]
+    if old_details != new_details:
+        old_set, new_set = set(old_details), set(new_details)
+        changes.append({
+            "field": "details",
+            "removed": [{"text": t, "points": p} for t, p in old_details if (t, p) not in new_set],
+            "added": [{"text": t, "points": p} for t, p in new_details if (t, p) not in old_set],
+        })
+    return changes
+
+
+def _diff_package(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    changes: List[Dict[str, Any]] = [
+        {"field": field, "old": old.get(field), "new": new.get(field)}
+        for field in _PACKAGE_FIELDS
+        if old.get(field) != new.get(field)
+    ]
+    old_groups = {str(g.get("name")): g for g in old.get("groups") or []}
+    new_groups = {str(g.get("name")): g for g in new.get("groups") or []}
+    for name in old_groups:
+        if name not in new_groups:
+            changes.append({"group": name, "change": "removed"})
+    for name, group in new_groups.items():
+        if name not in old_groups:
+            changes.append({"group": name, "change": "added", "points": group.get("points")})
+        else:
+            group_changes = _diff_group(old_groups[name], group)
+            if group_changes:
+                changes.append({"group": name, "change": "changed", "changes": group_changes})
+    if [g for g in old_groups if g in new_groups] != [g for g in new_groups if g in old_groups]:
+        changes.append({"field": "groups_order", "old": list(old_groups), "new": list(new_groups)})
+    return changes
+
+
+def diff_core_packages(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Структурный diff двух core_packages.json (по id пакетов)."""
+    old_pkgs = {str(p.get("id")): p for p in old.get("packages") or []}
+    new_pkgs = {str(p.get("id")): p for p in new.get("packages") or []}
+    diff: List[Dict[str, Any]] = []
+    for pid, pkg in old_pkgs.items():
+        if pid not in new_pkgs:
+            diff.append({"id": pid, "change": "removed", "title": pkg.get("title")})
+    for pid, pkg in new_pkgs.items():
+        if pid not in old_pkgs:
+            diff.append({"id": pid, "change": "added", "title": pkg.get("title"),
+                         "total_points": pkg.get("total_points"), "price_rub": pkg.get("price_rub")})
+        else:
+            changes = _diff_package(old_pkgs[pid], pkg)
+            if changes:
+                diff.append({"id": pid, "change": "changed", "changes": changes})
+    return diff
+
+
+def format_diff(diff: Sequence[Dict[str, Any]]) -> str:
+    if not diff:
+        return "Изменений нет."
+    lines: List[str] = []
+    for item in diff:
+        pid = item["id"]
+        if item["change"] == "added":
+            lines.append(f"+ {pid} ({item.get('title')}): {item.get('total_points')} баллов, {item.get('price_rub')} ₽")
+        elif item["change"] == "removed":
+            lines.append(f"- {pid} ({item.get('title')})")
+        else:
+            lines.append(f"~ {pid}")
+            for ch in item["changes"]:
+                if "group" not in ch:
+                    lines.append(f"    {ch['field']}: {ch['old']!r} -> {ch['new']!r}")
+                elif ch["change"] == "added":
+                    lines.append(f"    + группа {ch['group']!r} ({ch.get('points')} баллов)")
+                elif ch["change"] == "removed":
+                    lines.append(f"    - группа {ch['group']!r}")
+                else:
+                    lines.append(f"    ~ группа {ch['group']!r}")
+                    for g in ch["changes"]:
+                        if g["field"] == "details":
+                            shown = [("-", d) for d in g["removed"]] + [("+", d) for d in g["added"]]
+                            for sign, d in shown[:_DETAILS_SHOWN]:
+                                lines.append(f"        {sign} {d['text']!r} ({d['points']})")
+                            if len(shown) > _DETAILS_SHOWN:
+                                lines.append(f"        ... ещё {len(shown) - _DETAILS_SHOWN} строк детализации (полностью — в --diff-json)")
+                        else:
+                            lines.append(f"        {g['field']}: {g['old']!r} -> {g['new']!r}")
+    return "\n".join(lines)
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Импорт пакетов из Excel в core_packages.json")
-    parser.add_argument("xlsx", type=Path, help="Путь к .xlsx")
-    parser.add_argument("--sheet", default="Лист1", help="Имя листа")
+    parser.add_argument("xlsx", type=Path, nargs="+", help="Путь к .xlsx (можно несколько)")
+    parser.add_argument("--sheet", action="append", help="Имя листа (можно несколько; по умолчанию Лист1)")
+    parser.add_argument("--all-sheets", action="store_true", help="Все листы каждого файла")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Сколько листов читать параллельно")
     parser.add_argument("--out", type=Path, default=Path("frontend_shared/data/core_packages.json"), help="Куда сохранить JSON")
+    parser.add_argument("--cache", type=Path, default=DEFAULT_CACHE, help="Кеш хешей и пакетов прошлого импорта")
+    parser.add_argument("--no-cache", action="store_true", help="Читать все листы заново")
+    parser.add_argument("--dry-run", action="store_true", help="Только показать diff, ничего не записывать")
+    parser.add_argument("--diff-json", type=Path, help="Сохранить diff в JSON")
     args = parser.parse_args()
+    if args.all_sheets and args.sheet:
+        parser.error("--sheet и --all-sheets вместе не используются")
+    sheets = None if args.all_sheets else (args.sheet or ["Лист1"])
+
+    cache_path = None if args.no_cache else args.cache
+    parts, new_cache, parsed = import_sheets(args.xlsx, sheets, args.jobs, load_cache(cache_path))
+    print(f"Листов: {len(parts)}, прочитано: {parsed}, без изменений (из кеша): {len(parts) - parsed}")
+    data = merge_packages(parts)
+
+    try:
+        old = json.loads(args.out.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        old = {"packages": []}
+    diff = diff_core_packages(old, data)
+    print(format_diff(diff))
+    if args.diff_json:
+        _write_atomic(args.diff_json, json.dumps(diff, ensure_ascii=False, indent=2))
 
-    data = parse_xlsx(args.xlsx, args.sheet)
-    args.out.parent.mkdir(parents=True, exist_ok=True)
-    args.out.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-    print(f"Сохранено: {args.out}")
+    if args.dry_run:
+        return
+    if diff or old != data:
+        _write_atomic(args.out, json.dumps(data, ensure_ascii=False, indent=2))
+        print(f"Сохранено: {args.out}")
+    else:
+        print(f"{args.out} не изменён.")
+    save_cache(cache_path, new_cache)
 
 
 if __name__ == "__main__":
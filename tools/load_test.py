@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Нагрузочный тест API с контролем регрессий задержек.
+
+Usage:
+  python tools/load_test.py [--duration 10] [--concurrency 8]
+  python tools/load_test.py --url http://127.0.0.1:8000 --user admin --password secret
+  python tools/load_test.py --save-baseline tools/load_baseline.json
+  python tools/load_test.py --baseline tools/load_baseline.json --threshold 0.2
+
+Что делает:
+  --concurrency «менеджеров» одновременно шлют запросы вперемешку (доли —
+  --mix) на:
+    calculate — POST /api/v5/calculate (кейсы из docs/TESTCASES.md; часть
+                запросов — «набор текста» в контактах, как шлёт UI);
+    docx      — POST /api/v5/docx (те же кейсы, разные юрлица);
+    matrix    — GET /api/v5/services-matrix/{id} (пакеты из
+                docs/manager_v5_cases.md);
+    data      — GET /data/*.json.
+  Печатает по каждому эндпоинту: запросов в секунду, p50/p95/p99 (мс) и
+  коды ответов.
+
+Режимы:
+  без --url — приложение backend.main:app запускается в этом же процессе
+              (со своим lifespan: пул Word и т.д.), без сети. Копии Word в
+              ./output при этом не пишутся (AURORA_OUTPUT_ENABLED=0).
+  --url     — против уже запущенного uvicorn.
+
+Базовая линия:
+  --save-baseline PATH — сохранить результат прогона как эталон.
+  --baseline PATH      — сравнить с эталоном; если у какого-то эндпоинта
+                         запросов в секунду стало меньше или p50/p95/p99
+                         больше, чем на --threshold (0.2 = 20%), скрипт
+                         завершится с кодом 1. Разницу задержек меньше
+                         --min-delta-ms (1 мс) не считаем — это шум.
+  Эталон имеет смысл только на той же машине и с теми же параметрами.
+  Ошибки (любой код, кроме 2xx и 503 «очередь Word занята») — код 2.
+
+Нужен пакет httpx (pip install httpx).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    raise SystemExit("Нужен пакет httpx: pip install httpx")
+
+ENDPOINTS = ("calculate", "docx", "matrix", "data")
+DEFAULT_MIX = "calculate=60,data=20,matrix=15,docx=5"
+
+# Кейсы из docs/TESTCASES.md (номера — в комментариях).
+CASES: Dict[str, Dict[str, Any]] = {
+    # TC-01: розница, без ККТ, одно юрлицо, без устройств
+    "tc01_retail": {"segments": ["Розница"]},
+    # TC-02: розница + ККТ
+    "tc02_retail_kkt": {
+        "segments": ["Розница"],
+        "kkt": [{"vendor": "АТОЛ", "model": "11Ф"}, {"vendor": "Эвотор", "model": "7.2"}],
+    },
+    # TC-03: несколько юрлиц
+    "tc03_orgs": {"segments": ["Опт"], "multi_orgs": True, "org_count": 3},
+    # TC-04: ТСД + Клеверенс (коллективная работа)
+    "tc04_tsd": {"segments": ["Розница"], "devices": [{"type": "tsd"}], "tsd_collective": True},
+    # TC-05: производитель, товарные группы ЧЗ
+    "tc05_producer": {
+        "segments": ["Производитель/Импортёр"],
+        "producer_codes": True,
+        "product": {"categories": ["Молочная продукция", "Вода", "Пиво"]},
+    },
+    # TC-08: 1С
+    "tc08_onec": {"segments": ["Опт"], "onec": {"config": "УТ 11", "actual": False}},
+    # TC-10: опт, 3 юрлица, 2 сканера, 1 ТСД, без ЭДО
+    "tc10_rules": {
+        "segments": ["Опт"],
+        "multi_orgs": True,
+        "org_count": 3,
+        "devices": [{"type": "scanner"}, {"type": "scanner"}, {"type": "tsd"}],
+        "has_edo": False,
+    },
+    # Мультисегмент (как producer_retail из docs/manager_v5_cases.md)
+    "producer_retail": {
+        "segments": ["Производитель/Импортёр", "Розница"],
+        "kkt": [{"vendor": "АТОЛ", "model": "30Ф"}],
+        "needs_aggregation": True,
+    },
+}
+
+# Пакеты из docs/manager_v5_cases.md
+MATRIX_PACKAGES = ("retail_only", "wholesale_only", "producer_only", "producer_retail")
+DATA_FILES = ("data.json", "core_packages.json", "manager_matrix_v5.json")
+LEGAL_NAMES = ("ООО Ромашка", "ИП Иванов", "АО Север", "ООО Вектор", "ООО Лето")
+
+
+@dataclass
+class EndpointStats:
+    latencies_ms: List[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+
+    def summary(self, wall_s: float) -> Dict[str, Any]:
+        lat = sorted(self.latencies_ms)
+        return {
+            "requests": len(lat),
+            "rps": round(len(lat) / wall_s, 1) if wall_s else 0.0,
+            "p50": round(_percentile(lat, 50), 2),
+            "p95": round(_percentile(lat, 95), 2),
+            "p99": round(_percentile(lat, 99), 2),
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+        }
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentile по «ближайшему рангу» (без интерполяции)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _parse_mix(text: str) -> Dict[str, int]:
+    mix: Dict[str, int] = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"--mix: неизвестный эндпоинт {name!r} (есть: {', '.join(ENDPOINTS)})")
+        mix[name] = int(weight or 0)
+    if not any(mix.values()):
+        raise SystemExit("--mix: все доли нулевые")
+    return mix
+
+
+class RequestMix:
+    """Генератор запросов: случайный эндпоинт по долям + реалистичное тело."""
+
+    def __init__(self, mix: Dict[str, int], seed: int):
+        self.rng = random.Random(seed)
+        self.names = [n for n, w in mix.items() if w > 0]
+        self.weights = [mix[n] for n in self.names]
+        self.cases = list(CASES.values())
+
+    def _state(self, typing: bool) -> Dict[str, Any]:
+        state = copy.deepcopy(self.rng.choice(self.cases))
+        state["contacts"] = {"legal_name": self.rng.choice(LEGAL_NAMES)}
+        if typing:
+            # UI шлёт state на каждую букву в контактах — цена от них не зависит.
+            state["contacts"]["desired_result"] = "Запуск маркировки"[: self.rng.randint(1, 17)]
+        return state
+
+    def next(self) -> Tuple[str, str, str, Optional[Dict[str, Any]]]:
+        name = self.rng.choices(self.names, self.weights)[0]
+        if name == "calculate":
+            return name, "POST", "/api/v5/calculate", self._state(typing=self.rng.random() < 0.5)
+        if name == "docx":
+            return name, "POST", "/api/v5/docx", self._state(typing=False)
+        if name == "matrix":
+            return name, "GET", f"/api/v5/services-matrix/{self.rng.choice(MATRIX_PACKAGES)}", None
+        return name, "GET", f"/data/{self.rng.choice(DATA_FILES)}", None
+
+
+async def _drive(
+    client: "httpx.AsyncClient",
+    mix: RequestMix,
+    concurrency: int,
+    duration_s: float,
+    stats: Optional[Dict[str, EndpointStats]],
+) -> float:
+    deadline = time.perf_counter() + duration_s
+
+    async def manager() -> None:
+        while time.perf_counter() < deadline:
+            name, method, path, body = mix.next()
+            started = time.perf_counter()
+            resp = await client.request(method, path, json=body)
+            await resp.aread()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if stats is not None:
+                stats[name].latencies_ms.append(elapsed_ms)
+                stats[name].statuses[resp.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(manager() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+async def run_load(args: argparse.Namespace) -> Tuple[Dict[str, Dict[str, Any]], float]:
+    mix = RequestMix(_parse_mix(args.mix), args.seed)
+    auth = (args.user, args.password) if args.user else None
+    timeout = httpx.Timeout(60.0)
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async def measure(client: "httpx.AsyncClient") -> Tuple[Dict[str, Dict[str, Any]], float]:
+        if args.warmup > 0:
+            await _drive(client, mix, args.concurrency, args.warmup, None)
+        stats = {name: EndpointStats() for name in ENDPOINTS}
+        wall = await _drive(client, mix, args.concurrency, args.duration, stats)
+        return {n: s.summary(wall) for n, s in stats.items() if s.latencies_ms}, wall
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, auth=auth, timeout=timeout, limits=limits) as client:
+            return await measure(client)
+
+    os.environ.setdefault("AURORA_OUTPUT_ENABLED", "0")
+    from backend.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://aurora", auth=auth, timeout=timeout) as client:
+            return await measure(client)
+
+
+def compare(
+    current: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float,
+    min_delta_ms: float,
+) -> List[str]:
+    """Список регрессий относительно эталона (пустой — всё в порядке)."""
+    problems: List[str] = []
+    for name, base in baseline.items():
+        cur = current.get(name)
+        if cur is None:
+            continue
+        if base["rps"] and cur["rps"] < base["rps"] * (1 - threshold):
+            problems.append(f"{name}: rps {cur['rps']} < {base['rps']} (-{1 - cur['rps'] / base['rps']:.0%})")
+        for key in ("p50", "p95", "p99"):
+            limit = max(base[key] * (1 + threshold), base[key] + min_delta_ms)
+            if cur[key] > limit:
+                problems.append(f"{name}: {key} {cur[key]} мс > {base[key]} мс")
+    return problems
+
+
+def _print_table(results: Dict[str, Dict[str, Any]], wall: float) -> None:
+    total = sum(r["requests"] for r in results.values())
+    print(f"{'endpoint':10} {'req':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    for name, r in results.items():
+        statuses = " ".join(f"{k}:{v}" for k, v in r["statuses"].items())
+        print(f"{name:10} {r['requests']:7} {r['rps']:8.1f} {r['p50']:8.2f} {r['p95']:8.2f} {r['p99']:8.2f}  {statuses}")
+    print(f"{'total':10} {total:7} {total / wall:8.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="адрес запущенного сервера (по умолчанию — приложение в этом процессе)")
+    parser.add_argument("--user", help="логин BasicAuth")
+    parser.add_argument("--password", default="", help="пароль BasicAuth")
+    parser.add_argument("--duration", type=float, default=10.0, help="секунд замера (10)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="секунд прогрева перед замером (2)")
+    parser.add_argument("--concurrency", type=int, default=8, help="одновременных «менеджеров» (8)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"доли эндпоинтов ({DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", help="JSON с эталоном для сравнения")
+    parser.add_argument("--save-baseline", help="сохранить результат как эталон")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимое ухудшение (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="разница задержек, которую считаем шумом")
+    args = parser.parse_args()
+
+    results, wall = asyncio.run(run_load(args))
+    _print_table(results, wall)
+
+    if args.save_baseline:
+        payload = {
+            "meta": {
+                "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "url": args.url or "in-process",
+                "concurrency": args.concurrency,
+                "duration": args.duration,
+                "mix": args.mix,
+            },
+            "endpoints": results,
+        }
+        Path(args.save_baseline).write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"эталон сохранён: {args.save_baseline}")
+
+    errors = {
+        name: {k: v for k, v in r["statuses"].items() if not k.startswith("2") and k != "503"}
+        for name, r in results.items()
+    }
+    errors = {name: e for name, e in errors.items() if e}
+    if errors:
+        print(f"ОШИБКИ: {errors}")
+        sys.exit(2)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        problems = compare(results, baseline["endpoints"], args.threshold, args.min_delta_ms)
+        if problems:
+            print(f"РЕГРЕССИЯ (порог {args.threshold:.0%}):")
+            for p in problems:
+                print(f"  {p}")
+            sys.exit(1)
+        print(f"регрессий нет (порог {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()